@@ -23,6 +23,10 @@ from api.routers import system, listenbrainz, search, downloads, playlists, spot
 from api.clients import tidal_client
 from api.utils.logging import log_warning, log_info
 from download_state import download_state_manager
+from progress_bus import progress_bus
+from http_sessions import http_sessions
+from file_workers import file_workers
+from api.services.files import cleanup_staging
 from scheduler import PlaylistScheduler
 from queue_manager import queue_manager, QUEUE_AUTO_PROCESS
 from contextlib import asynccontextmanager
@@ -30,8 +34,12 @@ from contextlib import asynccontextmanager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    await http_sessions.start()
+    tidal_client.start_endpoint_refresh()
     tidal_client.cleanup_old_status_cache()
     download_state_manager._cleanup_old_entries()
+    await file_workers.run(cleanup_staging, queue_manager.resumable_track_ids())
+    await file_workers.run(tidal_client.cache.prune_disk)
     
     # Initialize queue manager and start processing if auto mode is enabled
     log_info(f"Queue manager initialized: auto_process={QUEUE_AUTO_PROCESS}")
@@ -49,6 +57,11 @@ async def lifespan(app: FastAPI):
     # Shutdown
     await queue_manager.stop_processing()
     scheduler.shutdown()
+    progress_bus.flush()
+    download_state_manager.flush()
+    await tidal_client.close()
+    await http_sessions.close()
+    file_workers.shutdown()
 
 app = FastAPI(title="Tidaloader API", lifespan=lifespan)
 
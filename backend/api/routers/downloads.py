@@ -14,9 +14,13 @@ from api.state import active_downloads
 from api.clients import tidal_client
 from download_state import download_state_manager
 from api.utils.logging import log_info, log_error, log_warning, log_success, log_step
-from api.utils.extraction import extract_stream_url
-from api.services.files import sanitize_path_component
+from api.utils.extraction import extract_dash_manifest, extract_stream_url
+from api.services.files import sanitize_path_component, staging_path
 from api.services.download import download_file_async
+from api.services.playback import get_source_quality, take_prefetched
+from http_sessions import http_sessions
+from pipeline import pipeline
+from file_workers import file_workers
 from queue_manager import queue_manager, QueueItem, QUEUE_AUTO_PROCESS, MAX_CONCURRENT_DOWNLOADS
 
 router = APIRouter()
@@ -37,7 +41,7 @@ async def get_stream_url(
     try:
         log_info(f"Getting stream URL for track {track_id} at {quality} quality...")
         
-        track_data = tidal_client.get_track(track_id, quality)
+        track_data = await tidal_client.get_track(track_id, quality)
         
         if not track_data:
             raise HTTPException(status_code=404, detail="Track not found")
@@ -224,7 +228,7 @@ async def download_track_server_side(
         is_opus_request = requested_quality in OPUS_QUALITY_MAP
         source_quality = 'LOSSLESS' if is_mp3_request or is_opus_request else requested_quality
         
-        track_info = tidal_client.get_track(request.track_id, source_quality)
+        track_info = await tidal_client.get_track(request.track_id, source_quality)
         if not track_info:
             del active_downloads[request.track_id]
             raise HTTPException(status_code=404, detail="Track not found")
@@ -272,7 +276,7 @@ async def download_track_server_side(
             if not metadata['date']:
                  log_info(f"Date missing, fetching extended metadata for track {request.track_id}...")
                  try:
-                     extended_data = tidal_client.get_track_metadata(request.track_id)
+                     extended_data = await tidal_client.get_track_metadata(request.track_id)
                      if extended_data:
                          if extended_data.get('streamStartDate'):
                              metadata['date'] = extended_data.get('streamStartDate').split('T')[0]
@@ -324,12 +328,16 @@ async def download_track_server_side(
             log_info(f"Album: {metadata.get('album')}")
         
         log_step("2/4", f"Getting stream URL ({source_quality})...")
-        stream_url = extract_stream_url(track_info)
-        if not stream_url:
+        dash_manifest = extract_dash_manifest(track_info)
+        stream_url = None if dash_manifest else extract_stream_url(track_info)
+        if not stream_url and not dash_manifest:
             del active_downloads[request.track_id]
             raise HTTPException(status_code=404, detail="Stream URL not found")
         
-        log_success(f"Stream URL: {stream_url[:60]}...")
+        if dash_manifest:
+            log_success(f"DASH manifest: {len(dash_manifest.segment_urls)} segments")
+        else:
+            log_success(f"Stream URL: {stream_url[:60]}...")
         
         download_ext = '.m4a' if source_quality in ['LOW', 'HIGH'] else '.flac'
         if is_mp3_request:
@@ -343,7 +351,6 @@ async def download_track_server_side(
         
         temp_download_name = f"{request.artist} - {request.title}{download_ext}"
         temp_download_name = re.sub(r'[<>:"/\\|?*]', '_', temp_download_name)
-        temp_filepath = DOWNLOAD_DIR / temp_download_name
         
         artist = metadata.get('album_artist') or metadata.get('artist', 'Unknown Artist')
         album = metadata.get('album', 'Unknown Album')
@@ -379,6 +386,9 @@ async def download_track_server_side(
             'status': 'downloading'
         }
         
+        # Claimed only once the download is certain to start; download_file_async releases it
+        temp_filepath = await file_workers.run(staging_path, request.track_id, temp_download_name)
+        
         background_tasks.add_task(
             download_file_async,
             request.track_id,
@@ -389,7 +399,8 @@ async def download_track_server_side(
             request.organization_template,
             request.group_compilations,
             request.run_beets,
-            request.embed_lyrics
+            request.embed_lyrics,
+            dash_manifest=dash_manifest
         )
         
         return {
@@ -593,19 +604,19 @@ async def validate_stream_url(stream_url: str) -> bool:
     
     try:
         timeout = aiohttp.ClientTimeout(total=15, connect=10)
-        async with aiohttp.ClientSession() as session:
-            async with session.head(stream_url, timeout=timeout, allow_redirects=True) as response:
-                if response.status != 200:
-                    return False
-                content_type = response.headers.get('content-type', '').lower()
-                # Valid audio content types
-                if any(t in content_type for t in ['audio/', 'application/octet-stream', 'binary']):
-                    return True
-                # XML or text = error response
-                if 'xml' in content_type or 'text' in content_type:
-                    return False
-                # Unknown content type - assume valid if not explicitly bad
+        session = http_sessions.session("cdn")
+        async with session.head(stream_url, timeout=timeout, allow_redirects=True) as response:
+            if response.status != 200:
+                return False
+            content_type = response.headers.get('content-type', '').lower()
+            # Valid audio content types
+            if any(t in content_type for t in ['audio/', 'application/octet-stream', 'binary']):
                 return True
+            # XML or text = error response
+            if 'xml' in content_type or 'text' in content_type:
+                return False
+            # Unknown content type - assume valid if not explicitly bad
+            return True
     except Exception:
         # If HEAD fails, try anyway (some servers don't support HEAD)
         return True
@@ -627,40 +638,48 @@ async def process_queue_item(item: QueueItem):
         
         is_mp3_request = requested_quality in MP3_QUALITY_MAP
         is_opus_request = requested_quality in OPUS_QUALITY_MAP
-        source_quality = 'LOSSLESS' if is_mp3_request or is_opus_request else requested_quality
+        source_quality = get_source_quality(requested_quality)
         
-        # Get track playback info (stream URL, manifest) from API
-        track_info = tidal_client.get_track(track_id, source_quality)
-        if not track_info:
-            raise Exception("Track not found (Playback Info)")
+        # Get track playback info (stream URL, manifest), prefetched in bulk when possible
+        async with pipeline.stage("resolve"):
+            prefetched = take_prefetched(track_id, source_quality)
+            if prefetched:
+                track_info = prefetched['track_info']
+            else:
+                track_info = await tidal_client.get_track(track_id, source_quality)
+            if not track_info:
+                raise Exception("Track not found (Playback Info)")
 
-        if isinstance(track_info, list) and len(track_info) > 0:
-            track_data = track_info[0]
-        else:
-            track_data = track_info 
-
-        # Get stream URL with quality fallback for HI_RES/HI_RES_LOSSLESS
-        stream_url = extract_stream_url(track_info)
-        
-        # Validate the stream URL returns actual audio content (not XML error)
-        # This catches cases where API returns a URL but the quality isn't actually available
-        if stream_url and source_quality in ('HI_RES', 'HI_RES_LOSSLESS'):
-            is_valid = await validate_stream_url(stream_url)
-            if not is_valid:
-                log_warning(f"[Queue] {source_quality} stream returns invalid content for {item.title}, falling back to LOSSLESS")
-                stream_url = None  # Trigger fallback below
-        
-        # Fallback: If HI_RES or HI_RES_LOSSLESS requested but no stream URL found (or invalid), try LOSSLESS
-        if not stream_url and source_quality in ('HI_RES', 'HI_RES_LOSSLESS'):
-            log_warning(f"[Queue] {source_quality} not available for {item.title}, falling back to LOSSLESS")
-            source_quality = 'LOSSLESS'
-            track_info = tidal_client.get_track(track_id, source_quality)
-            if track_info:
-                if isinstance(track_info, list) and len(track_info) > 0:
-                    track_data = track_info[0]
-                else:
-                    track_data = track_info
-                stream_url = extract_stream_url(track_info)
+            if isinstance(track_info, list) and len(track_info) > 0:
+                track_data = track_info[0]
+            else:
+                track_data = track_info 
+
+            # Get stream URL with quality fallback for HI_RES/HI_RES_LOSSLESS.
+            # Hi-res streams are often DASH manifests, which are fetched segment by segment.
+            dash_manifest = extract_dash_manifest(track_info)
+            stream_url = None if dash_manifest else extract_stream_url(track_info)
+        
+            # Validate the stream URL returns actual audio content (not XML error)
+            # This catches cases where API returns a URL but the quality isn't actually available
+            if stream_url and source_quality in ('HI_RES', 'HI_RES_LOSSLESS'):
+                is_valid = await validate_stream_url(stream_url)
+                if not is_valid:
+                    log_warning(f"[Queue] {source_quality} stream returns invalid content for {item.title}, falling back to LOSSLESS")
+                    stream_url = None  # Trigger fallback below
+        
+            # Fallback: If HI_RES or HI_RES_LOSSLESS requested but no stream URL found (or invalid), try LOSSLESS
+            if not stream_url and not dash_manifest and source_quality in ('HI_RES', 'HI_RES_LOSSLESS'):
+                log_warning(f"[Queue] {source_quality} not available for {item.title}, falling back to LOSSLESS")
+                source_quality = 'LOSSLESS'
+                track_info = await tidal_client.get_track(track_id, source_quality)
+                if track_info:
+                    if isinstance(track_info, list) and len(track_info) > 0:
+                        track_data = track_info[0]
+                    else:
+                        track_data = track_info
+                    dash_manifest = extract_dash_manifest(track_info)
+                    stream_url = None if dash_manifest else extract_stream_url(track_info)
 
         metadata = {
             'quality': requested_quality,
@@ -703,7 +722,7 @@ async def process_queue_item(item: QueueItem):
             # Second fallback: Fetch extended metadata (Issue #38 persistent)
             if not metadata['date']:
                  try:
-                     extended_data = tidal_client.get_track_metadata(track_id)
+                     extended_data = await tidal_client.get_track_metadata(track_id)
                      if extended_data:
                          if extended_data.get('streamStartDate'):
                              metadata['date'] = extended_data.get('streamStartDate').split('T')[0]
@@ -745,7 +764,7 @@ async def process_queue_item(item: QueueItem):
         log_info(f"  From Queue Item: {bool(item.tidal_artist_id)}")
         
         # Verify stream URL was found (after potential fallback)
-        if not stream_url:
+        if not stream_url and not dash_manifest:
             raise Exception("Stream URL not found")
         
         # Prepare file paths
@@ -761,7 +780,6 @@ async def process_queue_item(item: QueueItem):
         
         temp_download_name = f"{item.artist} - {item.title}{download_ext}"
         temp_download_name = re.sub(r'[<>:"/\\|?*]', '_', temp_download_name)
-        temp_filepath = DOWNLOAD_DIR / temp_download_name
         
         artist = metadata.get('album_artist') or metadata.get('artist', 'Unknown Artist')
         album = metadata.get('album', 'Unknown Album')
@@ -804,9 +822,14 @@ async def process_queue_item(item: QueueItem):
         # Update status and start download
         queue_manager.update_active_progress(track_id, 0, 'downloading')
         active_downloads[track_id] = {'progress': 0, 'status': 'downloading'}
+        temp_filepath = await file_workers.run(staging_path, track_id, temp_download_name)
         
 
-        await download_file_async(
+        async def resolve_fresh_url():
+            fresh_info = await tidal_client.get_track(track_id, source_quality)
+            return extract_stream_url(fresh_info) if fresh_info else None
+        
+        succeeded = await download_file_async(
             track_id,
             stream_url,
             temp_filepath,
@@ -816,8 +839,13 @@ async def process_queue_item(item: QueueItem):
             item.group_compilations,
             item.run_beets,
             item.embed_lyrics,
-            item.use_musicbrainz
+            item.use_musicbrainz,
+            resolve_url=resolve_fresh_url,
+            dash_manifest=dash_manifest
         )
+        if not succeeded:
+            failure = download_state_manager.get_download_state(track_id) or {}
+            raise Exception(failure.get('error') or "Download failed")
         
         # Mark as completed in queue manager
         queue_manager.mark_completed(track_id, final_filename, metadata)
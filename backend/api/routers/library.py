@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import FileResponse
 from api.auth import require_auth
 from api.services.library import library_service
+from file_workers import file_workers
 from api.utils.logging import log_info, log_error
 
 router = APIRouter()
@@ -13,7 +14,7 @@ router = APIRouter()
 async def scan_library(force: bool = False, username: str = Depends(require_auth)):
     try:
         log_info(f"Library scan requested (force={force})")
-        data = library_service.scan_library(force=force)
+        data = await file_workers.run(library_service.scan_library, force=force)
         return {"status": "success", "artist_count": len(data)}
     except Exception as e:
         log_error(f"Error scanning library: {e}")
@@ -22,7 +23,7 @@ async def scan_library(force: bool = False, username: str = Depends(require_auth
 @router.get("/api/library/artists")
 async def get_library_artists(username: str = Depends(require_auth)):
     try:
-        return library_service.get_artists()
+        return await file_workers.run(library_service.get_artists)
     except Exception as e:
         log_error(f"Error getting library artists: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -30,7 +31,7 @@ async def get_library_artists(username: str = Depends(require_auth)):
 @router.get("/api/library/artist/{artist_name}")
 async def get_library_artist(artist_name: str, username: str = Depends(require_auth)):
     try:
-        artist = library_service.get_artist(artist_name)
+        artist = await file_workers.run(library_service.get_artist, artist_name)
         if not artist:
             raise HTTPException(status_code=404, detail="Artist not found")
         return artist
@@ -52,7 +53,7 @@ async def update_artist_metadata(
     username: str = Depends(require_auth)
 ):
     try:
-        success = library_service.update_artist_metadata(artist_name, picture=metadata.picture)
+        success = await file_workers.run(library_service.update_artist_metadata, artist_name, picture=metadata.picture)
         if not success:
             raise HTTPException(status_code=404, detail="Artist not found")
         return {"status": "success"}
@@ -33,7 +33,7 @@ async def search_playlists_proxy(
     """Proxy to Tidal search for playlists"""
     try:
         # Using tidal_client native search method
-        results = tidal_client.search_playlists(query) 
+        results = await tidal_client.search_playlists(query) 
         return results
     except Exception as e:
         logger.error(f"Search failed: {e}")
@@ -11,7 +11,7 @@ router = APIRouter()
 async def search_tracks(q: str, username: str = Depends(require_auth)):
     try:
         log_info(f"Search tracks request for query: {q}")
-        result = tidal_client.search_tracks(q)
+        result = await tidal_client.search_tracks(q)
         
         if not result:
             return {"items": []}
@@ -51,7 +51,7 @@ async def search_tracks(q: str, username: str = Depends(require_auth)):
 async def search_albums(q: str, username: str = Depends(require_auth)):
     try:
         log_info(f"Searching albums: {q}")
-        result = tidal_client.search_albums(q)
+        result = await tidal_client.search_albums(q)
         
         if not result:
             log_info("No ALBUM results from API")
@@ -71,7 +71,7 @@ async def search_albums(q: str, username: str = Depends(require_auth)):
 async def search_artists(q: str, username: str = Depends(require_auth)):
     try:
         log_info(f"Searching for artist: {q}")
-        result = tidal_client.search_artists(q)
+        result = await tidal_client.search_artists(q)
         
         if not result:
             log_info("No results from API")
@@ -96,7 +96,7 @@ async def search_artists(q: str, username: str = Depends(require_auth)):
 async def search_playlists(q: str, username: str = Depends(require_auth)):
     try:
         log_info(f"Searching playlists: {q}")
-        result = tidal_client.search_playlists(q)
+        result = await tidal_client.search_playlists(q)
         
         if not result:
             log_info("No PLAYLIST results from API")
@@ -172,7 +172,7 @@ async def search_playlists(q: str, username: str = Depends(require_auth)):
 async def get_album_tracks(album_id: int, username: str = Depends(require_auth)):
     try:
         log_info(f"Getting tracks for album: {album_id}")
-        result = tidal_client.get_album_tracks(album_id)
+        result = await tidal_client.get_album_tracks(album_id)
         
         if not result:
             return {"items": []}
@@ -231,7 +231,7 @@ async def get_album_tracks(album_id: int, username: str = Depends(require_auth))
 async def get_playlist_tracks(playlist_id: str, username: str = Depends(require_auth)):
     try:
         log_info(f"Getting tracks for playlist: {playlist_id}")
-        result = tidal_client.get_playlist_tracks(playlist_id)
+        result = await tidal_client.get_playlist_tracks(playlist_id)
         
         if not result:
             return {"items": [], "playlist": None}
@@ -366,7 +366,7 @@ async def get_artist(artist_id: int, username: str = Depends(require_auth)):
     try:
         log_info(f"Getting info for artist: {artist_id}")
         
-        artist_info = tidal_client.get_artist(artist_id)
+        artist_info = await tidal_client.get_artist(artist_id)
         
         if not artist_info:
             return {"info": None, "top_tracks": [], "albums": []}
@@ -454,7 +454,7 @@ async def get_artist(artist_id: int, username: str = Depends(require_auth)):
         
         if not albums:
             log_info("No albums found in artist page, trying direct albums endpoint")
-            direct_albums = tidal_client.get_artist_albums(artist_id)
+            direct_albums = await tidal_client.get_artist_albums(artist_id)
             if direct_albums:
                 # Direct endpoint usually returns {'items': [...]}
                 raw_items = direct_albums.get('items', []) if isinstance(direct_albums, dict) else direct_albums
@@ -1,9 +1,20 @@
 from pathlib import Path
 import json
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
+from api.auth import require_auth
 from api.settings import settings, DOWNLOAD_DIR
+from api.utils.logging import log_warning
+from api.clients import tidal_client
 from scheduler import PlaylistScheduler
+from progress_bus import progress_bus
+from http_sessions import http_sessions
+from cover_cache import cover_cache
+from pipeline import pipeline
+from file_workers import file_workers
+from transcode_workers import transcode_workers
+from bandwidth import bandwidth, parse_schedule
+from download_state import download_state_manager
 
 from typing import Optional
 from api.clients.jellyfin_client import jellyfin_client
@@ -19,6 +30,9 @@ class SystemSettings(BaseModel):
     use_musicbrainz: bool = True
     run_beets: bool = False
     embed_lyrics: bool = False
+    # Left unchanged when omitted
+    bandwidth_limit_mbps: Optional[float] = None
+    bandwidth_schedule: Optional[str] = None
     
     jellyfin_url: Optional[str] = None
     jellyfin_api_key: Optional[str] = None
@@ -38,13 +52,24 @@ def load_persistent_settings():
                 settings.use_musicbrainz = data.get('use_musicbrainz', settings.use_musicbrainz)
                 settings.run_beets = data.get('run_beets', settings.run_beets)
                 settings.embed_lyrics = data.get('embed_lyrics', settings.embed_lyrics)
+                settings.bandwidth_limit_mbps = data.get('bandwidth_limit_mbps', settings.bandwidth_limit_mbps)
+                settings.bandwidth_schedule = data.get('bandwidth_schedule', settings.bandwidth_schedule)
                 settings.jellyfin_url = data.get('jellyfin_url', settings.jellyfin_url)
                 settings.jellyfin_api_key = data.get('jellyfin_api_key', settings.jellyfin_api_key)
         except Exception:
             pass
 
+def apply_bandwidth_settings():
+    try:
+        schedule = parse_schedule(settings.bandwidth_schedule)
+    except ValueError as e:
+        log_warning(f"Ignoring bandwidth schedule: {e}")
+        schedule = []
+    bandwidth.configure(settings.bandwidth_limit_mbps, schedule)
+
 # Load on module import (or startup)
 load_persistent_settings()
+apply_bandwidth_settings()
 
 @router.get("/api")
 async def api_root():
@@ -54,6 +79,58 @@ async def api_root():
 async def health_check():
     return {"status": "healthy"}
 
+@router.get("/api/system/endpoints")
+async def get_endpoint_health(username: str = Depends(require_auth)):
+    """Health scores, circuit state and last routing decision per hifi endpoint"""
+    return tidal_client.get_endpoint_health()
+
+@router.get("/api/system/cache")
+async def get_cache_stats(username: str = Depends(require_auth)):
+    return {
+        "responses": tidal_client.cache.stats(),
+        "coalescing": tidal_client.single_flight.stats(),
+        "entities": tidal_client.entities.stats(),
+        "covers": cover_cache.stats()
+    }
+
+@router.get("/api/system/progress")
+async def get_progress_stats(username: str = Depends(require_auth)):
+    """How much per-chunk progress reporting is coalesced before it reaches disk"""
+    return {
+        "bus": progress_bus.stats(),
+        "state_file_saves": download_state_manager.saves
+    }
+
+@router.get("/api/system/http")
+async def get_http_pool_stats(username: str = Depends(require_auth)):
+    """Requests per shared session pool and how many reused a pooled connection"""
+    return http_sessions.stats()
+
+@router.get("/api/system/pipeline")
+async def get_pipeline_stats(username: str = Depends(require_auth)):
+    """Concurrency, running and queued tracks per download stage"""
+    return pipeline.stats()
+
+@router.get("/api/system/workers")
+async def get_file_worker_stats(username: str = Depends(require_auth)):
+    """Queue wait and run time of blocking file work (tagging, moves, library scans)"""
+    return file_workers.stats()
+
+@router.get("/api/system/transcode")
+async def get_transcode_stats(username: str = Depends(require_auth)):
+    """FFmpeg queue depth, wait and encode times per kind of job, and recent jobs"""
+    return transcode_workers.stats()
+
+@router.get("/api/system/bandwidth")
+async def get_bandwidth_stats(username: str = Depends(require_auth)):
+    """Download bandwidth cap in force and each active download's share of it"""
+    return bandwidth.stats()
+
+@router.delete("/api/system/cache")
+async def clear_cache(username: str = Depends(require_auth)):
+    cleared = await tidal_client.cache.clear()
+    return {"status": "cleared", "entries": cleared}
+
 @router.get("/api/system/settings")
 async def get_settings():
     return {
@@ -63,12 +140,22 @@ async def get_settings():
         "use_musicbrainz": settings.use_musicbrainz,
         "run_beets": settings.run_beets,
         "embed_lyrics": settings.embed_lyrics,
+        "bandwidth_limit_mbps": settings.bandwidth_limit_mbps,
+        "bandwidth_schedule": settings.bandwidth_schedule,
         "jellyfin_url": settings.jellyfin_url,
         "jellyfin_api_key": settings.jellyfin_api_key
     }
 
 @router.post("/api/system/settings")
 async def update_settings(new_settings: SystemSettings):
+    if new_settings.bandwidth_limit_mbps is not None and new_settings.bandwidth_limit_mbps < 0:
+        return {"status": "error", "message": "bandwidth_limit_mbps cannot be negative"}
+    if new_settings.bandwidth_schedule is not None:
+        try:
+            parse_schedule(new_settings.bandwidth_schedule)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+
     settings.sync_time = new_settings.sync_time
     settings.organization_template = new_settings.organization_template
     settings.active_downloads = new_settings.active_downloads
@@ -77,6 +164,12 @@ async def update_settings(new_settings: SystemSettings):
     settings.embed_lyrics = new_settings.embed_lyrics
     settings.jellyfin_url = new_settings.jellyfin_url
     settings.jellyfin_api_key = new_settings.jellyfin_api_key
+    if new_settings.bandwidth_limit_mbps is not None:
+        settings.bandwidth_limit_mbps = new_settings.bandwidth_limit_mbps
+    if new_settings.bandwidth_schedule is not None:
+        settings.bandwidth_schedule = new_settings.bandwidth_schedule
+    # Takes effect on the next chunk of every running download
+    apply_bandwidth_settings()
     
     # Persist
     try:
@@ -91,6 +184,8 @@ async def update_settings(new_settings: SystemSettings):
         data['use_musicbrainz'] = new_settings.use_musicbrainz
         data['run_beets'] = new_settings.run_beets
         data['embed_lyrics'] = new_settings.embed_lyrics
+        data['bandwidth_limit_mbps'] = settings.bandwidth_limit_mbps
+        data['bandwidth_schedule'] = settings.bandwidth_schedule
         data['jellyfin_url'] = new_settings.jellyfin_url
         data['jellyfin_api_key'] = new_settings.jellyfin_api_key
         
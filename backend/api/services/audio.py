@@ -1,126 +1,55 @@
-import platform
-import asyncio
 from pathlib import Path
-import aiohttp
 
 from mutagen.flac import FLAC, Picture
 from mutagen.mp4 import MP4, MP4Cover
 from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC, ID3NoHeaderError, Encoding
-from mutagen.easyid3 import EasyID3
+from mutagen.id3 import ID3, APIC, TALB, TCON, TDRC, TIT2, TPE1, TPE2, TPOS, TPUB, TRCK, TSRC, TXXX
 from mutagen.oggopus import OggOpus
 
 from api.utils.logging import log_info, log_success, log_warning
-from api.services.lyrics import fetch_and_store_lyrics
+from api.services.lyrics import fetch_lyrics, store_lyrics
+from api.services.enrichment import get_cover
+from file_workers import file_workers
+from transcode_workers import transcode_workers
 
 async def transcode_to_mp3(source_path: Path, target_path: Path, bitrate_kbps: int):
-    try:
-        if platform.system() == "Windows":
-            import subprocess
-            result = subprocess.run(
-                [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    str(source_path),
-                    "-vn",
-                    "-codec:a",
-                    "libmp3lame",
-                    "-b:a",
-                    f"{bitrate_kbps}k",
-                    str(target_path),
-                ],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode != 0:
-                error_output = result.stderr if result.stderr else "Unknown error"
-                raise Exception(f"FFmpeg failed: {error_output}")
-        else:
-            process = await asyncio.create_subprocess_exec(
-                "ffmpeg",
-                "-y",
-                "-i",
-                str(source_path),
-                "-vn",
-                "-codec:a",
-                "libmp3lame",
-                "-b:a",
-                f"{bitrate_kbps}k",
-                str(target_path),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_output = stderr.decode() if stderr else "Unknown error"
-                raise Exception(f"FFmpeg failed: {error_output}")
-                
-    except FileNotFoundError:
-        raise Exception("ffmpeg not found. Please install ffmpeg and ensure it is on the PATH.")
-    except Exception as e:
-        raise Exception(f"Failed to transcode to MP3: {e}")
+    await _transcode(source_path, target_path, "MP3", [
+        "-codec:a",
+        "libmp3lame",
+        "-b:a",
+        f"{bitrate_kbps}k",
+    ])
 
 async def transcode_to_opus(source_path: Path, target_path: Path, bitrate_kbps: int):
-  try:
-    if platform.system() == "Windows":
-      import subprocess
-      result = subprocess.run(
-        [
-          "ffmpeg",
-          "-y",
-          "-i",
-          str(source_path),
-          "-vn",
-          "-codec:a",
-          "libopus",
-          "-b:a",
-          f"{bitrate_kbps}k",
-          "-map_metadata",
-          "0",
-          str(target_path),
-        ],
-        capture_output=True,
-        text=True
-      )
-      
-      if result.returncode != 0:
-        error_output = result.stderr if result.stderr else "Unknown error"
-        raise Exception(f"FFmpeg failed: {error_output}")
-    else:
-      process = await asyncio.create_subprocess_exec(
-        "ffmpeg",
-        "-y",
-        "-i",
-        str(source_path),
-        "-vn",
+    await _transcode(source_path, target_path, "Opus", [
         "-codec:a",
         "libopus",
         "-b:a",
         f"{bitrate_kbps}k",
         "-map_metadata",
         "0",
-        str(target_path),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-      )
-      stdout, stderr = await process.communicate()
+    ])
 
-      if process.returncode != 0:
-        error_output = stderr.decode() if stderr else "Unknown error"
-        raise Exception(f"FFmpeg failed: {error_output}")
-        
-  except FileNotFoundError:
-    raise Exception("ffmpeg not found. Please install ffmpeg and ensure it is on the PATH.")
-  except Exception as e:
-    raise Exception(f"Failed to transcode to Opus: {e}")
+async def _transcode(source_path: Path, target_path: Path, label: str, codec_args: list):
+    """Encode on the transcode pool, behind other FFmpeg jobs and below the API in priority"""
+    command = ["ffmpeg", "-y", "-i", str(source_path), "-vn", *codec_args, str(target_path)]
+    try:
+        returncode, stderr = await transcode_workers.run(command, label.lower(), source_path, target_path)
+    except FileNotFoundError:
+        raise Exception("ffmpeg not found. Please install ffmpeg and ensure it is on the PATH.")
+    except Exception as e:
+        raise Exception(f"Failed to transcode to {label}: {e}")
+
+    if returncode != 0:
+        raise Exception(f"Failed to transcode to {label}: FFmpeg failed: {stderr or 'Unknown error'}")
+
+def _read_header(filepath: Path) -> bytes:
+    with open(filepath, 'rb') as f:
+        return f.read(12)
 
 async def write_metadata_tags(filepath: Path, metadata: dict):
     try:
-        with open(filepath, 'rb') as f:
-            header = f.read(12)
+        header = await file_workers.run(_read_header, filepath)
         
         is_flac = header[:4] == b'fLaC'
         is_m4a = header[4:8] == b'ftyp' or header[4:12] == b'ftypM4A '
@@ -155,320 +84,230 @@ async def write_metadata_tags(filepath: Path, metadata: dict):
         import traceback
         traceback.print_exc()
 
-async def write_flac_metadata(filepath: Path, metadata: dict):
+# Tag name per metadata key. Vorbis comments are shared by FLAC and Opus.
+VORBIS_FIELDS = [
+    ('title', 'TITLE'),
+    ('artist', 'ARTIST'),
+    ('album', 'ALBUM'),
+    ('album_artist', 'ALBUMARTIST'),
+    ('date', 'DATE'),
+    ('track_number', 'TRACKNUMBER'),
+    ('total_tracks', 'TRACKTOTAL'),
+    ('disc_number', 'DISCNUMBER'),
+    ('total_discs', 'DISCTOTAL'),
+    ('genre', 'GENRE'),
+    ('isrc', 'ISRC'),
+    ('label', 'LABEL'),
+    ('musicbrainz_trackid', 'MUSICBRAINZ_TRACKID'),
+    ('musicbrainz_albumid', 'MUSICBRAINZ_ALBUMID'),
+    ('musicbrainz_artistid', 'MUSICBRAINZ_ARTISTID'),
+    ('musicbrainz_albumartistid', 'MUSICBRAINZ_ALBUMARTISTID'),
+    ('musicbrainz_releasegroupid', 'MUSICBRAINZ_RELEASEGROUPID'),
+    ('tidal_track_id', 'TIDAL_TRACK_ID'),
+    ('tidal_artist_id', 'TIDAL_ARTIST_ID'),
+    ('tidal_album_id', 'TIDAL_ALBUM_ID'),
+]
+
+MP4_TEXT_ATOMS = [
+    ('title', '\xa9nam'),
+    ('artist', '\xa9ART'),
+    ('album', '\xa9alb'),
+    ('album_artist', 'aART'),
+    ('date', '\xa9day'),
+    ('genre', '\xa9gen'),
+]
+
+# Stored as ----:com.apple.iTunes:<name>
+MP4_FREEFORM_ATOMS = [
+    ('musicbrainz_trackid', 'MusicBrainz Track Id'),
+    ('musicbrainz_albumid', 'MusicBrainz Album Id'),
+    ('musicbrainz_artistid', 'MusicBrainz Artist Id'),
+    ('musicbrainz_albumartistid', 'MusicBrainz Album Artist Id'),
+    ('musicbrainz_releasegroupid', 'MusicBrainz Release Group Id'),
+    ('isrc', 'ISRC'),
+    ('label', 'LABEL'),
+    ('tidal_track_id', 'TIDAL_TRACK_ID'),
+    ('tidal_artist_id', 'TIDAL_ARTIST_ID'),
+    ('tidal_album_id', 'TIDAL_ALBUM_ID'),
+]
+
+ID3_TEXT_FRAMES = [
+    ('title', TIT2),
+    ('artist', TPE1),
+    ('album', TALB),
+    ('album_artist', TPE2),
+    ('genre', TCON),
+    ('date', TDRC),
+    ('isrc', TSRC),
+    ('label', TPUB),
+]
+
+ID3_TXXX_FIELDS = [
+    ('musicbrainz_trackid', 'MusicBrainz Release Track Id'),
+    ('musicbrainz_albumid', 'MusicBrainz Album Id'),
+    ('musicbrainz_artistid', 'MusicBrainz Artist Id'),
+    ('musicbrainz_albumartistid', 'MusicBrainz Album Artist Id'),
+    ('musicbrainz_releasegroupid', 'MusicBrainz Release Group Id'),
+    ('tidal_track_id', 'TIDAL_TRACK_ID'),
+    ('tidal_artist_id', 'TIDAL_ARTIST_ID'),
+    ('tidal_album_id', 'TIDAL_ALBUM_ID'),
+]
+
+
+def _numbered(number, total) -> str:
+    return f"{number}/{total}" if total else str(number)
+
+
+def _id3_frames(metadata: dict) -> list:
+    frames = [
+        frame(encoding=3, text=[str(metadata[key])])
+        for key, frame in ID3_TEXT_FRAMES
+        if metadata.get(key)
+    ]
+    if metadata.get('track_number'):
+        frames.append(TRCK(encoding=3, text=[_numbered(metadata['track_number'], metadata.get('total_tracks'))]))
+    if metadata.get('disc_number'):
+        frames.append(TPOS(encoding=3, text=[_numbered(metadata['disc_number'], metadata.get('total_discs'))]))
+    frames.extend(
+        TXXX(encoding=3, desc=desc, text=[str(metadata[key])])
+        for key, desc in ID3_TXXX_FIELDS
+        if metadata.get(key)
+    )
+    return frames
+
+
+async def _cover_art(metadata: dict):
+    if not metadata.get('cover_url'):
+        return None
     try:
-        audio = FLAC(str(filepath))
-        
-        if metadata.get('title'):
-            audio['TITLE'] = metadata['title']
-        if metadata.get('artist'):
-            audio['ARTIST'] = metadata['artist']
-        if metadata.get('album'):
-            audio['ALBUM'] = metadata['album']
-        if metadata.get('album_artist'):
-            audio['ALBUMARTIST'] = metadata['album_artist']
-        if metadata.get('date'):
-            audio['DATE'] = metadata['date']
-        if metadata.get('track_number'):
-            audio['TRACKNUMBER'] = str(metadata['track_number'])
-        if metadata.get('total_tracks'):
-            audio['TRACKTOTAL'] = str(metadata['total_tracks'])
-        if metadata.get('disc_number'):
-            audio['DISCNUMBER'] = str(metadata['disc_number'])
-        if metadata.get('total_discs'):
-            audio['DISCTOTAL'] = str(metadata['total_discs'])
-        if metadata.get('genre'):
-            audio['GENRE'] = metadata['genre']
-        
-        
-        if metadata.get('isrc'):
-            audio['ISRC'] = metadata['isrc']
-        if metadata.get('label'):
-            audio['LABEL'] = metadata['label']
-        
-        
-        if metadata.get('musicbrainz_trackid'):
-            audio['MUSICBRAINZ_TRACKID'] = metadata['musicbrainz_trackid']
-        if metadata.get('musicbrainz_albumid'):
-            audio['MUSICBRAINZ_ALBUMID'] = metadata['musicbrainz_albumid']
-        if metadata.get('musicbrainz_artistid'):
-            audio['MUSICBRAINZ_ARTISTID'] = metadata['musicbrainz_artistid']
-        if metadata.get('musicbrainz_albumartistid'):
-            audio['MUSICBRAINZ_ALBUMARTISTID'] = metadata['musicbrainz_albumartistid']
-        if metadata.get('musicbrainz_releasegroupid'):
-            audio['MUSICBRAINZ_RELEASEGROUPID'] = metadata['musicbrainz_releasegroupid']
+        return await get_cover(metadata['cover_url'])
+    except Exception as e:
+        log_warning(f"Failed to add cover art: {e}")
+        return None
 
-        
-        if metadata.get('tidal_track_id'):
-            audio['TIDAL_TRACK_ID'] = metadata['tidal_track_id']
-        if metadata.get('tidal_artist_id'):
-            audio['TIDAL_ARTIST_ID'] = metadata['tidal_artist_id']
-        if metadata.get('tidal_album_id'):
-            audio['TIDAL_ALBUM_ID'] = metadata['tidal_album_id']
-        
-        await fetch_and_store_lyrics(filepath, metadata, audio)
-        
-        if metadata.get('cover_url'):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(metadata['cover_url']) as response:
-                        if response.status == 200:
-                            image_data = await response.read()
-                            picture = Picture()
-                            picture.type = 3
-                            picture.mime = 'image/jpeg'
-                            picture.desc = 'Cover'
-                            picture.data = image_data
-                            audio.add_picture(picture)
-                            log_success("Added cover art")
-            except Exception as e:
-                log_warning(f"Failed to add cover art: {e}")
-        
-        audio.save()
+# Each writer gathers cover art and lyrics first, then builds the whole tag
+# set on the loaded file and saves it once, so the file is rewritten a single
+# time however many kinds of tags it gets. Loading and saving block, so that
+# part runs on a file worker.
+
+async def write_flac_metadata(filepath: Path, metadata: dict):
+    try:
+        image_data = await _cover_art(metadata)
+        lyrics_result = await fetch_lyrics(metadata)
+        await file_workers.run(_write_flac, filepath, metadata, image_data, lyrics_result)
         log_success("FLAC metadata tags written")
         
     except Exception as e:
         log_warning(f"Failed to write FLAC metadata: {e}")
         raise
 
+def _write_flac(filepath: Path, metadata: dict, image_data, lyrics_result):
+    audio = FLAC(str(filepath))
+    
+    for key, name in VORBIS_FIELDS:
+        if metadata.get(key):
+            audio[name] = str(metadata[key])
+    
+    store_lyrics(filepath, metadata, lyrics_result, audio)
+    
+    if image_data:
+        picture = Picture()
+        picture.type = 3
+        picture.mime = 'image/jpeg'
+        picture.desc = 'Cover'
+        picture.data = image_data
+        audio.clear_pictures()
+        audio.add_picture(picture)
+        log_success("Added cover art")
+    
+    audio.save()
+
 async def write_m4a_metadata(filepath: Path, metadata: dict):
     try:
-        audio = MP4(str(filepath))
-        
-        if metadata.get('title'):
-            audio['\xa9nam'] = metadata['title']
-        if metadata.get('artist'):
-            audio['\xa9ART'] = metadata['artist']
-        if metadata.get('album'):
-            audio['\xa9alb'] = metadata['album']
-        if metadata.get('album_artist'):
-            audio['aART'] = metadata['album_artist']
-        if metadata.get('date'):
-            audio['\xa9day'] = metadata['date']
-        if metadata.get('genre'):
-            audio['\xa9gen'] = metadata['genre']
-        
-        
-        if metadata.get('musicbrainz_trackid'):
-            audio['----:com.apple.iTunes:MusicBrainz Track Id'] = metadata['musicbrainz_trackid'].encode('utf-8')
-        if metadata.get('musicbrainz_albumid'):
-            audio['----:com.apple.iTunes:MusicBrainz Album Id'] = metadata['musicbrainz_albumid'].encode('utf-8')
-        if metadata.get('musicbrainz_artistid'):
-            audio['----:com.apple.iTunes:MusicBrainz Artist Id'] = metadata['musicbrainz_artistid'].encode('utf-8')
-        if metadata.get('musicbrainz_albumartistid'):
-            audio['----:com.apple.iTunes:MusicBrainz Album Artist Id'] = metadata['musicbrainz_albumartistid'].encode('utf-8')
-        if metadata.get('musicbrainz_releasegroupid'):
-            audio['----:com.apple.iTunes:MusicBrainz Release Group Id'] = metadata['musicbrainz_releasegroupid'].encode('utf-8')
-        
-        
-        if metadata.get('isrc'):
-            audio['----:com.apple.iTunes:ISRC'] = metadata['isrc'].encode('utf-8')
-        if metadata.get('label'):
-            audio['----:com.apple.iTunes:LABEL'] = metadata['label'].encode('utf-8')
-
-        
-        if metadata.get('tidal_track_id'):
-            audio['----:com.apple.iTunes:TIDAL_TRACK_ID'] = metadata['tidal_track_id'].encode('utf-8')
-        if metadata.get('tidal_artist_id'):
-            audio['----:com.apple.iTunes:TIDAL_ARTIST_ID'] = metadata['tidal_artist_id'].encode('utf-8')
-        if metadata.get('tidal_album_id'):
-            audio['----:com.apple.iTunes:TIDAL_ALBUM_ID'] = metadata['tidal_album_id'].encode('utf-8')
-        
-        if metadata.get('track_number'):
-            track_num = metadata['track_number']
-            total_tracks = metadata.get('total_tracks') or 0
-            audio['trkn'] = [(track_num, total_tracks)]
-        
-        if metadata.get('disc_number'):
-            disc_num = metadata['disc_number']
-            total_discs = metadata.get('total_discs') or 0
-            audio['disk'] = [(disc_num, total_discs)]
-        
-        await fetch_and_store_lyrics(filepath, metadata, None)
-        
-        if metadata.get('cover_url'):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(metadata['cover_url']) as response:
-                        if response.status == 200:
-                            image_data = await response.read()
-                            audio['covr'] = [MP4Cover(image_data, imageformat=MP4Cover.FORMAT_JPEG)]
-                            log_success("Added cover art")
-            except Exception as e:
-                log_warning(f"Failed to add cover art: {e}")
-        
-        audio.save()
+        image_data = await _cover_art(metadata)
+        lyrics_result = await fetch_lyrics(metadata)
+        await file_workers.run(_write_m4a, filepath, metadata, image_data, lyrics_result)
         log_success("M4A metadata tags written")
         
     except Exception as e:
         log_warning(f"Failed to write M4A metadata: {e}")
         raise
 
+def _write_m4a(filepath: Path, metadata: dict, image_data, lyrics_result):
+    audio = MP4(str(filepath))
+    
+    for key, atom in MP4_TEXT_ATOMS:
+        if metadata.get(key):
+            audio[atom] = str(metadata[key])
+    for key, name in MP4_FREEFORM_ATOMS:
+        if metadata.get(key):
+            audio[f'----:com.apple.iTunes:{name}'] = str(metadata[key]).encode('utf-8')
+    
+    if metadata.get('track_number'):
+        audio['trkn'] = [(metadata['track_number'], metadata.get('total_tracks') or 0)]
+    if metadata.get('disc_number'):
+        audio['disk'] = [(metadata['disc_number'], metadata.get('total_discs') or 0)]
+    
+    store_lyrics(filepath, metadata, lyrics_result, None)
+    
+    if image_data:
+        audio['covr'] = [MP4Cover(image_data, imageformat=MP4Cover.FORMAT_JPEG)]
+        log_success("Added cover art")
+    
+    audio.save()
+
 async def write_mp3_metadata(filepath: Path, metadata: dict):
     try:
-        audio = MP3(str(filepath), ID3=ID3)
-        if audio.tags is None:
-            audio.add_tags()
-            audio.save()
-        
-        try:
-            tags = EasyID3(str(filepath))
-        except ID3NoHeaderError:
-            audio.add_tags()
-            audio.save()
-            tags = EasyID3(str(filepath))
-        
-        if metadata.get('title'):
-            tags['title'] = metadata['title']
-        if metadata.get('artist'):
-            tags['artist'] = metadata['artist']
-        if metadata.get('album'):
-            tags['album'] = metadata['album']
-        if metadata.get('album_artist'):
-            tags['albumartist'] = metadata['album_artist']
-        if metadata.get('genre'):
-            tags['genre'] = metadata['genre']
-        if metadata.get('date'):
-            tags['date'] = metadata['date']
-        if metadata.get('track_number'):
-            track_num = metadata['track_number']
-            total_tracks = metadata.get('total_tracks')
-            if total_tracks:
-                tags['tracknumber'] = f"{track_num}/{total_tracks}"
-            else:
-                tags['tracknumber'] = str(track_num)
-        if metadata.get('disc_number'):
-            disc_num = metadata.get('disc_number')
-            total_discs = metadata.get('total_discs', 0)
-            tags['discnumber'] = f"{disc_num}/{total_discs}" if total_discs else str(disc_num)
-        
-        tags.save()  
-        
-        
-        try:
-            from mutagen.id3 import TXXX, TSRC, TPUB
-            audio = MP3(str(filepath), ID3=ID3)
-            
-            
-            if metadata.get('isrc'):
-                audio.tags.delall('TSRC')
-                audio.tags.add(TSRC(encoding=3, text=[metadata['isrc']]))
-            
-            
-            if metadata.get('label'):
-                audio.tags.delall('TPUB')
-                audio.tags.add(TPUB(encoding=3, text=[metadata['label']]))
-            
-            
-            if metadata.get('musicbrainz_trackid'):
-                audio.tags.add(TXXX(encoding=3, desc='MusicBrainz Release Track Id', text=[metadata['musicbrainz_trackid']]))
-            if metadata.get('musicbrainz_albumid'):
-                audio.tags.add(TXXX(encoding=3, desc='MusicBrainz Album Id', text=[metadata['musicbrainz_albumid']]))
-            if metadata.get('musicbrainz_artistid'):
-                audio.tags.add(TXXX(encoding=3, desc='MusicBrainz Artist Id', text=[metadata['musicbrainz_artistid']]))
-            if metadata.get('musicbrainz_albumartistid'):
-                audio.tags.add(TXXX(encoding=3, desc='MusicBrainz Album Artist Id', text=[metadata['musicbrainz_albumartistid']]))
-            if metadata.get('musicbrainz_releasegroupid'):
-                audio.tags.add(TXXX(encoding=3, desc='MusicBrainz Release Group Id', text=[metadata['musicbrainz_releasegroupid']]))
-            
-            
-            if metadata.get('tidal_track_id'):
-                audio.tags.add(TXXX(encoding=3, desc='TIDAL_TRACK_ID', text=[metadata['tidal_track_id']]))
-            if metadata.get('tidal_artist_id'):
-                audio.tags.add(TXXX(encoding=3, desc='TIDAL_ARTIST_ID', text=[metadata['tidal_artist_id']]))
-            if metadata.get('tidal_album_id'):
-                audio.tags.add(TXXX(encoding=3, desc='TIDAL_ALBUM_ID', text=[metadata['tidal_album_id']]))
-            
-            audio.save()
-        except Exception as e:
-            log_warning(f"Failed to add custom TXXX tags: {e}")
-        
-        await fetch_and_store_lyrics(filepath, metadata, None, is_mp3=True)
-        
-        if metadata.get('cover_url'):
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(metadata['cover_url']) as response:
-                        if response.status == 200:
-                            image_data = await response.read()
-                            audio = MP3(str(filepath), ID3=ID3)
-                            if audio.tags is None:
-                                audio.add_tags()
-                            audio.tags.delall('APIC')
-                            audio.tags.add(APIC(
-                                encoding=3,
-                                mime='image/jpeg',
-                                type=3,
-                                desc='Cover',
-                                data=image_data
-                            ))
-                            audio.save()
-                            log_success("Added cover art")
-            except Exception as e:
-                log_warning(f"Failed to add cover art: {e}")
-        
+        image_data = await _cover_art(metadata)
+        lyrics_result = await fetch_lyrics(metadata)
+        await file_workers.run(_write_mp3, filepath, metadata, image_data, lyrics_result)
         log_success("MP3 metadata tags written")
         
     except Exception as e:
         log_warning(f"Failed to write MP3 metadata: {e}")
         raise
 
+def _write_mp3(filepath: Path, metadata: dict, image_data, lyrics_result):
+    audio = MP3(str(filepath), ID3=ID3)
+    if audio.tags is None:
+        audio.add_tags()
+    
+    # add() replaces any existing frame with the same key (TXXX per description)
+    for frame in _id3_frames(metadata):
+        audio.tags.add(frame)
+    
+    store_lyrics(filepath, metadata, lyrics_result, audio, is_mp3=True)
+    
+    if image_data:
+        audio.tags.delall('APIC')
+        audio.tags.add(APIC(
+            encoding=3,
+            mime='image/jpeg',
+            type=3,
+            desc='Cover',
+            data=image_data
+        ))
+        log_success("Added cover art")
+    
+    audio.save()
+
 async def write_opus_metadata(filepath: Path, metadata: dict):
     try:
-        audio = OggOpus(str(filepath))
-        
-        if metadata.get('title'):
-            audio['TITLE'] = metadata['title']
-        if metadata.get('artist'):
-            audio['ARTIST'] = metadata['artist']
-        if metadata.get('album'):
-            audio['ALBUM'] = metadata['album']
-        if metadata.get('album_artist'):
-            audio['ALBUMARTIST'] = metadata['album_artist']
-        if metadata.get('date'):
-            audio['DATE'] = metadata['date']
-        if metadata.get('track_number'):
-            audio['TRACKNUMBER'] = str(metadata['track_number'])
-        if metadata.get('total_tracks'):
-            audio['TRACKTOTAL'] = str(metadata['total_tracks'])
-        if metadata.get('disc_number'):
-            audio['DISCNUMBER'] = str(metadata['disc_number'])
-        if metadata.get('total_discs'):
-            audio['DISCTOTAL'] = str(metadata['total_discs'])
-        if metadata.get('genre'):
-            audio['GENRE'] = metadata['genre']
-        
-        
-        if metadata.get('isrc'):
-            audio['ISRC'] = metadata['isrc']
-        if metadata.get('label'):
-            audio['LABEL'] = metadata['label']
-        
-        
-        if metadata.get('musicbrainz_trackid'):
-            audio['MUSICBRAINZ_TRACKID'] = metadata['musicbrainz_trackid']
-        if metadata.get('musicbrainz_albumid'):
-            audio['MUSICBRAINZ_ALBUMID'] = metadata['musicbrainz_albumid']
-        if metadata.get('musicbrainz_artistid'):
-            audio['MUSICBRAINZ_ARTISTID'] = metadata['musicbrainz_artistid']
-        if metadata.get('musicbrainz_albumartistid'):
-            audio['MUSICBRAINZ_ALBUMARTISTID'] = metadata['musicbrainz_albumartistid']
-        if metadata.get('musicbrainz_releasegroupid'):
-            audio['MUSICBRAINZ_RELEASEGROUPID'] = metadata['musicbrainz_releasegroupid']
-
-        
-        if metadata.get('tidal_track_id'):
-            audio['TIDAL_TRACK_ID'] = metadata['tidal_track_id']
-        if metadata.get('tidal_artist_id'):
-            audio['TIDAL_ARTIST_ID'] = metadata['tidal_artist_id']
-        if metadata.get('tidal_album_id'):
-            audio['TIDAL_ALBUM_ID'] = metadata['tidal_album_id']
-        
-        await fetch_and_store_lyrics(filepath, metadata, audio)
-        
-        audio.save()
+        lyrics_result = await fetch_lyrics(metadata)
+        await file_workers.run(_write_opus, filepath, metadata, lyrics_result)
         log_success("Opus metadata tags written")
         
     except Exception as e:
         log_warning(f"Failed to write Opus metadata: {e}")
         raise
+
+def _write_opus(filepath: Path, metadata: dict, lyrics_result):
+    audio = OggOpus(str(filepath))
+    
+    for key, name in VORBIS_FIELDS:
+        if metadata.get(key):
+            audio[name] = str(metadata[key])
+    
+    store_lyrics(filepath, metadata, lyrics_result, audio)
+    
+    audio.save()
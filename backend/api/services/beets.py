@@ -3,6 +3,7 @@ import asyncio
 import os
 import sys
 from api.utils.logging import log_info, log_success, log_warning, log_step
+from file_workers import file_workers
 
 async def run_beets_import(path: Path):
     """Run beets import on the downloaded file/directory"""
@@ -22,7 +23,7 @@ async def run_beets_import(path: Path):
             
         # Check if beet is installed/runnable
         try:
-            subprocess.run([beet_cmd, "version"], check=True, capture_output=True)
+            await file_workers.run(subprocess.run, [beet_cmd, "version"], check=True, capture_output=True)
         except (FileNotFoundError, subprocess.CalledProcessError):
             log_warning(f"Beets not found (tried '{beet_cmd}'). Skipping import.")
             return
@@ -33,7 +34,7 @@ async def run_beets_import(path: Path):
         custom_config_path = Path("tidaloader_beets.yaml").resolve()
         
         try:
-            result = subprocess.run([beet_cmd, "config", "-p"], capture_output=True, text=True)
+            result = await file_workers.run(subprocess.run, [beet_cmd, "config", "-p"], capture_output=True, text=True)
             config_path = result.stdout.strip()
             
             if result.returncode != 0 or not config_path or not os.path.exists(config_path):
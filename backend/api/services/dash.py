@@ -0,0 +1,128 @@
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import os
+import asyncio
+import aiohttp
+
+from api.utils.dash import DashManifest
+from api.utils.logging import log_info, log_warning
+from api.services.resumable import DownloadError, part_path, verify_audio_file
+from api.services.write_behind import WriteBehindFile
+from bandwidth import bandwidth
+from file_workers import file_workers
+from transcode_workers import transcode_workers
+
+DASH_CONCURRENCY = int(os.getenv("DASH_SEGMENT_CONCURRENCY", "6"))
+DASH_SEGMENT_RETRIES = 3
+DASH_RETRY_DELAY = 1.0
+DASH_CHUNK_SIZE = 64 * 1024
+
+
+async def fetch_dash(
+    session: aiohttp.ClientSession,
+    manifest: DashManifest,
+    filepath: Path,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    concurrency: int = DASH_CONCURRENCY,
+    remux: bool = True
+) -> Path:
+    """
+    Download every segment of a DASH representation, at most `concurrency`
+    ahead of the one being written, and append them in order to a .part
+    file. The result is remuxed (stream copy) into a plain FLAC or M4A.
+    Returns the path of the finished file.
+    """
+    urls = manifest.urls
+    part = part_path(filepath)
+    part.parent.mkdir(parents=True, exist_ok=True)
+    log_info(f"DASH download: {len(manifest.segment_urls)} segments ({manifest.codecs or 'unknown codec'})")
+
+    downloaded = 0
+
+    def report():
+        if on_progress:
+            # The manifest only gives an estimate; never claim more than 99% before the end
+            total = max(manifest.estimated_size, downloaded + 1)
+            on_progress(downloaded, total)
+
+    async def fetch_segment(index: int) -> bytes:
+        nonlocal downloaded
+        attempt = 0
+        while True:
+            received = 0
+            try:
+                async with session.get(urls[index], timeout=timeout) as response:
+                    if response.status != 200:
+                        raise DownloadError(f"HTTP {response.status} for DASH segment {index}")
+                    buffer = bytearray()
+                    async for chunk in response.content.iter_chunked(DASH_CHUNK_SIZE):
+                        await bandwidth.throttle(len(chunk))
+                        buffer.extend(chunk)
+                        received += len(chunk)
+                        downloaded += len(chunk)
+                        report()
+                    return bytes(buffer)
+            except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+                downloaded -= received
+                attempt += 1
+                if attempt > DASH_SEGMENT_RETRIES:
+                    raise DownloadError(f"DASH segment {index} failed after {DASH_SEGMENT_RETRIES} retries: {e}")
+                log_warning(f"DASH segment {index} failed ({e}), retrying ({attempt}/{DASH_SEGMENT_RETRIES})")
+                await asyncio.sleep(DASH_RETRY_DELAY * attempt)
+
+    pending: Dict[int, asyncio.Task] = {}
+    next_to_start = 0
+    try:
+        async with WriteBehindFile(part) as writer:
+            for index in range(len(urls)):
+                while next_to_start < len(urls) and next_to_start < index + max(1, concurrency):
+                    pending[next_to_start] = asyncio.create_task(fetch_segment(next_to_start))
+                    next_to_start += 1
+                await writer.write(await pending.pop(index))
+    except BaseException:
+        for task in pending.values():
+            task.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+        await file_workers.run(part.unlink, missing_ok=True)
+        raise
+
+    if on_progress:
+        on_progress(downloaded, downloaded)
+
+    if not remux:
+        await file_workers.run(os.replace, part, filepath)
+        return filepath
+
+    target = filepath if manifest.is_flac else filepath.with_suffix('.m4a')
+    try:
+        await remux_audio(part, target)
+    finally:
+        await file_workers.run(part.unlink, missing_ok=True)
+
+    problem = await file_workers.run(verify_audio_file, target, 0)
+    if problem:
+        raise DownloadError(f"Remuxed DASH stream failed verification: {problem}", resumable=False)
+    return target
+
+
+async def remux_audio(source_path: Path, target_path: Path):
+    """Copy the audio stream of a fragmented MP4 into a standalone file"""
+    command = [
+        "ffmpeg",
+        "-y",
+        "-i",
+        str(source_path),
+        "-map",
+        "0:a:0",
+        "-c:a",
+        "copy",
+        str(target_path),
+    ]
+    try:
+        returncode, stderr = await transcode_workers.run(command, "remux", source_path, target_path)
+    except FileNotFoundError:
+        raise DownloadError("FFmpeg is required to remux DASH streams", resumable=False)
+
+    if returncode != 0:
+        raise DownloadError(f"FFmpeg remux failed: {stderr[-500:] if stderr else 'Unknown error'}", resumable=False)
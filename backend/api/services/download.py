@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Awaitable, Callable, Optional
 import asyncio
 import aiohttp
 import traceback
@@ -7,11 +8,56 @@ from api.state import active_downloads
 from download_state import download_state_manager
 from api.utils.logging import log_error, log_info, log_step, log_success, log_warning
 from api.services.audio import transcode_to_mp3, transcode_to_opus, write_metadata_tags
-from api.services.files import organize_file_by_metadata
+from api.services.files import discard_staging, organize_file_by_metadata, promote, release_staging
 from api.services.beets import run_beets_import
 from api.services.lyrics import embed_lyrics_with_ffmpeg
-from api.services.musicbrainz import enhance_metadata_with_musicbrainz
+from api.services.enrichment import apply_musicbrainz, prefetch_enrichment, release_enrichment
+from api.services.resumable import DownloadError, discard_partial, fetch_resumable
+from api.services.dash import fetch_dash
+from api.services.streaming import stream_transcode, streaming_supported
+from api.settings import settings
+from api.utils.dash import DashManifest
 from queue_manager import queue_manager
+from progress_bus import progress_bus
+from http_sessions import http_sessions
+from pipeline import pipeline
+from bandwidth import bandwidth
+from file_workers import file_workers
+
+def report_download_progress(track_id: int, downloaded: int, total_size: int):
+    if total_size <= 0:
+        return
+    progress = int((downloaded / total_size) * 100)
+    progress_bus.report(track_id, progress, 'downloading', downloaded, total_size)
+
+def _apply_progress(batch: dict):
+    """Push coalesced progress to the views the API and frontend poll"""
+    for track_id, event in batch.items():
+        entry = active_downloads.get(track_id)
+        if entry is None:
+            active_downloads[track_id] = {'progress': event['progress'], 'status': event['status']}
+        else:
+            entry['progress'] = event['progress']
+            entry['status'] = event['status']
+        download_state_manager.update_progress(track_id, event['progress'])
+        # Update queue manager for frontend sync
+        queue_manager.update_active_progress(track_id, event['progress'], event['status'])
+
+progress_bus.subscribe(_apply_progress)
+
+# Seconds a finished or failed track stays in active_downloads for the UI
+ACTIVE_DOWNLOAD_LINGER = 5
+
+def _forget_active_later(track_id: int):
+    """Drop the track from active_downloads later, without holding up its worker"""
+    entry = active_downloads.get(track_id)
+
+    def forget():
+        # A new download of the same track may have started meanwhile
+        if entry is not None and active_downloads.get(track_id) is entry:
+            del active_downloads[track_id]
+
+    asyncio.get_running_loop().call_later(ACTIVE_DOWNLOAD_LINGER, forget)
 
 async def download_file_async(
     track_id: int, 
@@ -23,9 +69,22 @@ async def download_file_async(
     group_compilations: bool = True,
     run_beets: bool = False,
     embed_lyrics: bool = False,
-    use_musicbrainz: bool = True
-):
+    use_musicbrainz: bool = True,
+    resolve_url: Optional[Callable[[], Awaitable[Optional[str]]]] = None,
+    dash_manifest: Optional[DashManifest] = None
+) -> bool:
+    """
+    Download, transcode, tag and organize one track. Returns whether it
+    succeeded; a failed transfer keeps its .part file so a retry resumes it.
+    `resolve_url` fetches a fresh stream URL if the signed one has expired.
+    With `dash_manifest` the segments it lists are fetched instead of `stream_url`.
+    With settings.streaming_transcode, MP3/Opus targets are encoded while they download.
+    """
     processed_path = filepath
+    master_path = None
+    streamed = False
+    # Cover art, lyrics and MusicBrainz run alongside the transfer
+    enrichment = prefetch_enrichment(metadata, use_musicbrainz)
     try:
         log_step("3/4", f"Downloading {filename}...")
         
@@ -33,6 +92,7 @@ async def download_file_async(
             active_downloads[track_id] = {'progress': 0, 'status': 'downloading'}
         
         download_state_manager.set_downloading(track_id, 0, metadata)
+        await file_workers.run(filepath.parent.mkdir, parents=True, exist_ok=True)
         
         # Use generous timeouts for large FLAC files
         timeout = aiohttp.ClientTimeout(
@@ -41,94 +101,62 @@ async def download_file_async(
             sock_read=120    # 2 minutes per chunk read
         )
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(stream_url, timeout=timeout) as response:
-                if response.status != 200:
-                    error_msg = f"HTTP {response.status}"
-                    log_error(f"Download failed: {error_msg}")
-                    if track_id in active_downloads:
-                        active_downloads[track_id] = {'progress': 0, 'status': 'failed'}
-                        download_state_manager.set_failed(track_id, error_msg, metadata)
-                        await asyncio.sleep(5)
-                        del active_downloads[track_id]
-                    return
-                
-                # Validate content-type to detect XML error responses
-                content_type = response.headers.get('content-type', '').lower()
-                if 'xml' in content_type or 'text' in content_type:
-                    error_msg = f"Invalid content type: {content_type} (likely quality unavailable)"
-                    log_error(f"Download failed: {error_msg}")
-                    if track_id in active_downloads:
-                        active_downloads[track_id] = {'progress': 0, 'status': 'failed'}
-                        download_state_manager.set_failed(track_id, error_msg, metadata)
-                        await asyncio.sleep(5)
-                        del active_downloads[track_id]
-                    return
-                
-                total_size = int(response.headers.get('content-length', 0))
-                
-                # Additional validation: tiny files are likely errors
-                if total_size > 0 and total_size < 10000:
-                    # Likely an error XML, read and check
-                    content_preview = await response.content.read(500)
-                    if content_preview.startswith(b'<?xml') or b'<Error>' in content_preview:
-                        error_msg = "Received error response instead of audio (quality likely unavailable)"
-                        log_error(f"Download failed: {error_msg}")
-                        if track_id in active_downloads:
-                            active_downloads[track_id] = {'progress': 0, 'status': 'failed'}
-                            download_state_manager.set_failed(track_id, error_msg, metadata)
-                            await asyncio.sleep(5)
-                            del active_downloads[track_id]
-                        return
-                    # If it passed, we need to re-request since we consumed part of the stream
-                    # For now, treat tiny files as suspicious and fail
-                    error_msg = f"File too small ({total_size} bytes), likely invalid"
-                    log_error(f"Download failed: {error_msg}")
-                    if track_id in active_downloads:
-                        active_downloads[track_id] = {'progress': 0, 'status': 'failed'}
-                        download_state_manager.set_failed(track_id, error_msg, metadata)
-                        await asyncio.sleep(5)
-                        del active_downloads[track_id]
-                    return
-                
-                downloaded = 0
-                
-                # Ensure the directory exists
-                filepath.parent.mkdir(parents=True, exist_ok=True)
-                
-                with open(filepath, 'wb') as f:
-                    async for chunk in response.content.iter_chunked(8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            
-                            if total_size > 0:
-                                progress = int((downloaded / total_size) * 100)
-                                active_downloads[track_id] = {
-                                    'progress': progress,
-                                    'status': 'downloading'
-                                }
-                                download_state_manager.update_progress(track_id, progress)
-                                # Update queue manager for frontend sync
-                                queue_manager.update_active_progress(track_id, progress, 'downloading')
-                            
-                            await asyncio.sleep(0.01)
+        # Pooled CDN session: consecutive tracks reuse warm connections
+        session = http_sessions.session("cdn")
+        target_format = metadata.get('target_format') if metadata else None
+        # The bandwidth cap is shared fairly between the tracks fetching right now
+        async with pipeline.stage("fetch"), bandwidth.transfer(track_id):
+            if dash_manifest:
+                filepath = await fetch_dash(
+                    session,
+                    dash_manifest,
+                    filepath,
+                    on_progress=lambda done, total: report_download_progress(track_id, done, total),
+                    timeout=timeout
+                )
+                processed_path = filepath
+            elif settings.streaming_transcode and streaming_supported(target_format):
+                bitrate = metadata.get('bitrate_kbps', 256 if target_format == 'mp3' else 192)
+                processed_path = filepath.with_suffix(f'.{target_format}')
+                if settings.keep_lossless_master:
+                    master_path = filepath
+                log_step("3/4", f"Streaming into the {target_format.upper()} encoder ({bitrate} kbps)...")
+                await stream_transcode(
+                    session,
+                    stream_url,
+                    processed_path,
+                    target_format,
+                    bitrate,
+                    on_progress=lambda done, total: report_download_progress(track_id, done, total),
+                    timeout=timeout,
+                    resolve_url=resolve_url,
+                    master_path=master_path
+                )
+                metadata['file_ext'] = processed_path.suffix
+                streamed = True
+            else:
+                await fetch_resumable(
+                    session,
+                    stream_url,
+                    filepath,
+                    on_progress=lambda done, total: report_download_progress(track_id, done, total),
+                    timeout=timeout,
+                    resolve_url=resolve_url
+                )
+        progress_bus.flush(track_id)
         
-        if metadata:
+        if metadata and not streamed:
             if metadata.get('target_format') == 'mp3':
                 bitrate = metadata.get('bitrate_kbps', 256)
                 mp3_path = filepath.with_suffix('.mp3')
                 log_step("3.5/4", f"Transcoding to MP3 ({bitrate} kbps)...")
-                active_downloads[track_id] = {
-                    'progress': 95,
-                    'status': 'transcoding'
-                }
-                download_state_manager.update_progress(track_id, 95)
+                progress_bus.report(track_id, 95, 'transcoding')
+                progress_bus.flush(track_id)
                 await transcode_to_mp3(filepath, mp3_path, bitrate)
                 processed_path = mp3_path
                 metadata['file_ext'] = '.mp3'
                 try:
-                    filepath.unlink()
+                    await file_workers.run(filepath.unlink)
                 except FileNotFoundError:
                     pass
                 except Exception as exc:
@@ -137,59 +165,79 @@ async def download_file_async(
                 bitrate = metadata.get('bitrate_kbps', 192)
                 opus_path = filepath.with_suffix('.opus')
                 log_step("3.5/4", f"Transcoding to Opus ({bitrate} kbps)...")
-                active_downloads[track_id] = {
-                    'progress': 95,
-                    'status': 'transcoding'
-                }
-                download_state_manager.update_progress(track_id, 95)
+                progress_bus.report(track_id, 95, 'transcoding')
+                progress_bus.flush(track_id)
                 await transcode_to_opus(filepath, opus_path, bitrate)
                 processed_path = opus_path
                 metadata['file_ext'] = '.opus'
                 try:
-                    filepath.unlink()
+                    await file_workers.run(filepath.unlink)
                 except FileNotFoundError:
                     pass
                 except Exception as exc:
                     log_warning(f"Failed to remove intermediate file: {exc}")
             else:
                 processed_path = filepath
-                metadata.setdefault('file_ext', filepath.suffix)
+                if dash_manifest:
+                    # A DASH stream may have been remuxed into a different container
+                    metadata['file_ext'] = filepath.suffix
+                else:
+                    metadata.setdefault('file_ext', filepath.suffix)
         
         if metadata:
             # Enhance metadata with MusicBrainz for comprehensive tagging (if enabled)
             if use_musicbrainz:
                 log_step("4/4", "Enhancing metadata with MusicBrainz...")
                 try:
-                    metadata = await enhance_metadata_with_musicbrainz(metadata)
+                    metadata = await apply_musicbrainz(metadata)
                 except Exception as e:
                     log_warning(f"MusicBrainz enhancement failed: {e}")
             
             log_step("4/4", "Writing metadata tags...")
-            await write_metadata_tags(processed_path, metadata)
+            async with pipeline.stage("tag"):
+                await write_metadata_tags(processed_path, metadata)
+            
+                if embed_lyrics:
+                    await embed_lyrics_with_ffmpeg(processed_path, metadata)
             
-            if embed_lyrics:
-                await embed_lyrics_with_ffmpeg(processed_path, metadata)
+                if master_path and await file_workers.run(master_path.exists):
+                    await write_metadata_tags(master_path, metadata)
         
         # Organize file
-        log_step("4/4", "Organizing file...")
-        final_path = await organize_file_by_metadata(
-            processed_path, 
-            metadata,
-            template=organization_template,
-            group_compilations=group_compilations
-        )
+        async with pipeline.stage("organize"):
+            log_step("4/4", "Organizing file...")
+            final_path = await organize_file_by_metadata(
+                processed_path, 
+                metadata,
+                template=organization_template,
+                group_compilations=group_compilations
+            )
         
-        # Run beets import if requested
-        if run_beets:
-            await run_beets_import(final_path)
+            if master_path and await file_workers.run(master_path.exists):
+                master_target = final_path.with_suffix(master_path.suffix)
+                if master_target == master_path:
+                    pass  # Organizing failed and left everything in place
+                elif await file_workers.run(master_target.exists):
+                    log_warning(f"Lossless master already exists: {master_target.name}")
+                    await file_workers.run(master_path.unlink)
+                else:
+                    await file_workers.run(promote, master_path, master_target)
+                    log_info(f"Lossless master: {master_target}")
+        
+            # Run beets import if requested
+            if run_beets:
+                await run_beets_import(final_path)
             
         # Update state to completed - store the final path for fast file existence checks
         if metadata is None:
             metadata = {}
         metadata['final_path'] = str(final_path)
+        if final_path != processed_path:
+            await file_workers.run(discard_staging, filepath)
+        progress_bus.discard(track_id)
         download_state_manager.set_completed(track_id, final_path.name, metadata)
         
-        file_size_mb = final_path.stat().st_size / 1024 / 1024
+        file_size_mb = (await file_workers.run(final_path.stat)).st_size / 1024 / 1024
         display_name = final_path.name if final_path else filename
         log_success(f"Downloaded: {display_name} ({file_size_mb:.2f} MB)")
         log_info(f"Location: {final_path}")
@@ -197,37 +245,48 @@ async def download_file_async(
         # Invalidate library cache so the new file/tags appear immediately
         try:
              from api.services.library import library_service
-             library_service.invalidate_cache()
+             await file_workers.run(library_service.invalidate_cache)
         except Exception as e:
              log_warning(f"Failed to invalidate library cache: {e}")
 
         print(f"{'='*60}\n")
         
-        await asyncio.sleep(5)
-        
-        if track_id in active_downloads:
-            del active_downloads[track_id]
+        _forget_active_later(track_id)
+        return True
         
     except Exception as e:
-        log_error(f"Download error: {e}")
-        traceback.print_exc()
+        if isinstance(e, DownloadError):
+            log_error(f"Download failed: {e}")
+            if not e.resumable:
+                await file_workers.run(discard_partial, filepath)
+        else:
+            log_error(f"Download error: {e}")
+            traceback.print_exc()
+        if not (isinstance(e, DownloadError) and e.resumable):
+            # Nothing to resume from, so the job's staging directory can go
+            await file_workers.run(discard_staging, filepath)
         
+        progress_bus.discard(track_id)
         if track_id in active_downloads:
             active_downloads[track_id] = {'progress': 0, 'status': 'failed'}
             download_state_manager.set_failed(track_id, str(e), metadata)
-            await asyncio.sleep(5)
-            del active_downloads[track_id]
+            _forget_active_later(track_id)
         
-        if filepath.exists():
+        if await file_workers.run(filepath.exists):
             try:
-                filepath.unlink()
+                await file_workers.run(filepath.unlink)
                 log_info(f"Cleaned up partial file: {filename}")
             except Exception:
                 pass
         
-        if processed_path and processed_path != filepath and processed_path.exists():
+        if processed_path and processed_path != filepath and await file_workers.run(processed_path.exists):
             try:
-                processed_path.unlink()
+                await file_workers.run(processed_path.unlink)
                 log_info(f"Cleaned up partial file: {processed_path.name}")
             except Exception:
                 pass
+        
+        return False
+    finally:
+        release_enrichment(enrichment)
+        release_staging(filepath)
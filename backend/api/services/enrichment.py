@@ -0,0 +1,146 @@
+import asyncio
+from typing import Any, Dict, Hashable, List, Optional
+
+from api.utils.logging import log_info, log_warning
+from api.services.musicbrainz import enhance_metadata_with_musicbrainz
+from cover_cache import cover_cache
+from http_sessions import http_sessions
+from lyrics_client import lyrics_client, LyricsResult
+from pipeline import pipeline
+
+# In-flight or finished enrichment lookups, keyed by what they depend on.
+# Tasks are started when a job starts and kept until every job using them
+# has released them, so tagging only waits for whatever hasn't finished
+# during the download.
+_tasks: Dict[Hashable, asyncio.Task] = {}
+_refs: Dict[Hashable, int] = {}
+
+
+def _cover_key(url: str) -> Hashable:
+    return ('cover', url)
+
+
+def _lyrics_key(metadata: Dict) -> Hashable:
+    return ('lyrics', metadata.get('title'), metadata.get('artist'), metadata.get('album'))
+
+
+def _musicbrainz_key(metadata: Dict) -> Hashable:
+    return ('musicbrainz', metadata.get('title'), metadata.get('artist'), metadata.get('album'))
+
+
+def _start(key: Hashable, coro):
+    if key in _tasks:
+        coro.close()
+    else:
+        _tasks[key] = asyncio.create_task(coro)
+    _refs[key] = _refs.get(key, 0) + 1
+
+
+def prefetch_enrichment(metadata: Optional[Dict], use_musicbrainz: bool = True) -> List[Hashable]:
+    """
+    Start fetching cover art, lyrics and MusicBrainz data for a job. They
+    only depend on metadata known before the download, so they run while
+    the audio is still transferring. Returns the keys to hand to
+    release_enrichment once the job is done.
+    """
+    keys = []
+    if not metadata:
+        return keys
+    if metadata.get('cover_url'):
+        keys.append(_cover_key(metadata['cover_url']))
+        _start(keys[-1], _fetch_cover(metadata['cover_url']))
+    if metadata.get('title') and metadata.get('artist'):
+        keys.append(_lyrics_key(metadata))
+        _start(keys[-1], _fetch_lyrics(dict(metadata)))
+        if use_musicbrainz:
+            keys.append(_musicbrainz_key(metadata))
+            _start(keys[-1], _fetch_musicbrainz(dict(metadata)))
+    if keys:
+        log_info(f"Prefetching {', '.join(key[0] for key in keys)} for {metadata.get('title')}")
+    return keys
+
+
+def release_enrichment(keys: List[Hashable]):
+    """Drop a job's lookups, cancelling any no other job is still waiting on"""
+    for key in keys:
+        refs = _refs.get(key, 0) - 1
+        if refs > 0:
+            _refs[key] = refs
+            continue
+        _refs.pop(key, None)
+        task = _tasks.pop(key, None)
+        if task is not None and not task.done():
+            task.cancel()
+
+
+async def get_cover(url: str) -> Optional[bytes]:
+    """Cover art bytes, from the job's prefetch when there is one"""
+    task = _tasks.get(_cover_key(url))
+    if task is None:
+        return await _fetch_cover(url)
+    return await asyncio.shield(task)
+
+
+async def get_lyrics(metadata: Dict) -> Optional[LyricsResult]:
+    task = _tasks.get(_lyrics_key(metadata))
+    if task is None:
+        return await _fetch_lyrics(metadata)
+    return await asyncio.shield(task)
+
+
+async def apply_musicbrainz(metadata: Dict) -> Dict[str, Any]:
+    """
+    Merge MusicBrainz data into `metadata`. A prefetched lookup ran against
+    a snapshot taken at job start, so only the fields it added or changed
+    are copied over; anything the job set since is kept.
+    """
+    task = _tasks.get(_musicbrainz_key(metadata))
+    if task is None:
+        async with pipeline.stage("enrich"):
+            return await enhance_metadata_with_musicbrainz(metadata)
+    snapshot, enhanced = await asyncio.shield(task)
+    merged = dict(metadata)
+    for key, value in enhanced.items():
+        if snapshot.get(key) != value:
+            merged[key] = value
+    return merged
+
+
+async def _fetch_cover(url: str) -> Optional[bytes]:
+    return await cover_cache.get(url, lambda: _download_cover(url))
+
+
+async def _download_cover(url: str) -> Optional[bytes]:
+    try:
+        session = http_sessions.session("resources")
+        async with session.get(url) as response:
+            if response.status == 200:
+                return await response.read()
+            log_warning(f"Cover art request failed: HTTP {response.status}")
+    except Exception as e:
+        log_warning(f"Failed to fetch cover art: {e}")
+    return None
+
+
+async def _fetch_lyrics(metadata: Dict) -> Optional[LyricsResult]:
+    try:
+        return await lyrics_client.get_lyrics(
+            track_name=metadata['title'],
+            artist_name=metadata['artist'],
+            album_name=metadata.get('album'),
+            duration=metadata.get('duration')
+        )
+    except Exception as e:
+        log_warning(f"Failed to fetch lyrics: {e}")
+        return None
+
+
+async def _fetch_musicbrainz(snapshot: Dict):
+    # Holds an enrich slot like an in-line lookup would, so MusicBrainz's
+    # rate limit is shared the same way however many jobs prefetch
+    async with pipeline.stage("enrich"):
+        try:
+            return snapshot, await enhance_metadata_with_musicbrainz(dict(snapshot))
+        except Exception as e:
+            log_warning(f"MusicBrainz enhancement failed: {e}")
+            return snapshot, snapshot
@@ -1,8 +1,91 @@
 from pathlib import Path
+from typing import Iterable, Optional, Set
+import os
+import uuid
+import errno
 import shutil
-import aiohttp
+import threading
 from api.utils.logging import log_info, log_success, log_warning
 from api.settings import DOWNLOAD_DIR
+from api.services.enrichment import get_cover
+from file_workers import file_workers
+
+# Jobs download and process their file in DOWNLOAD_DIR/.staging/<track_id>-<token>/,
+# on the library's filesystem, so promoting the finished track is a rename.
+# The token keeps two jobs for the same track (the download route and the
+# queue) out of each other's files. A retry takes over a directory an
+# earlier attempt left behind with a .part file, so it resumes.
+STAGING_DIR_NAME = ".staging"
+
+# Staging directories held by a running job
+_claimed: Set[str] = set()
+_claimed_lock = threading.Lock()
+
+def staging_dir() -> Path:
+    return DOWNLOAD_DIR / STAGING_DIR_NAME
+
+def staging_path(track_id: int, filename: str) -> Path:
+    """
+    Claim a staging directory for a job downloading `filename`: an idle one
+    holding a partial download of it, or a new one. Release it with
+    release_staging() or discard_staging().
+    """
+    root = staging_dir()
+    with _claimed_lock:
+        job_dir = None
+        if root.is_dir():
+            for candidate in sorted(root.glob(f"{track_id}-*")):
+                if candidate.name not in _claimed and (candidate / f"{filename}.part").exists():
+                    job_dir = candidate
+                    break
+        if job_dir is None:
+            job_dir = root / f"{track_id}-{uuid.uuid4().hex[:12]}"
+        _claimed.add(job_dir.name)
+    return job_dir / filename
+
+def release_staging(path: Path):
+    """Let a later job take over the staging directory `path` lives in"""
+    with _claimed_lock:
+        _claimed.discard(path.parent.name)
+
+def discard_staging(path: Path):
+    """Remove the staging directory `path` lives in, if it is one"""
+    job_dir = path.parent
+    if job_dir.parent == staging_dir():
+        shutil.rmtree(job_dir, ignore_errors=True)
+        release_staging(path)
+
+def cleanup_staging(keep_track_ids: Iterable[int]) -> int:
+    """Remove staging directories of tracks that will not be resumed"""
+    root = staging_dir()
+    if not root.is_dir():
+        return 0
+    keep = {str(track_id) for track_id in keep_track_ids}
+    removed = 0
+    for job_dir in root.iterdir():
+        if job_dir.is_dir() and job_dir.name.split('-')[0] not in keep:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            removed += 1
+    if removed:
+        log_info(f"Removed {removed} orphaned staging directories")
+    return removed
+
+def promote(source: Path, target: Path):
+    """
+    Move `source` to `target` with a single os.replace, so the target is
+    either absent or complete. Across filesystems the file is copied next to
+    the target first and then renamed into place.
+    """
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        log_warning(f"{source.parent} and {target.parent} are on different filesystems, copying")
+        tmp_target = target.with_name(f".{target.name}.tmp")
+        shutil.copy2(source, tmp_target)
+        os.replace(tmp_target, target)
+        source.unlink()
 
 def sanitize_path_component(name: str) -> str:
     if not name:
@@ -71,79 +154,97 @@ def get_output_relative_path(metadata: dict, template: str = "{Artist}/{Album}/{
 
 async def organize_file_by_metadata(temp_filepath: Path, metadata: dict, template: str = "{Artist}/{Album}/{TrackNumber} - {Title}", group_compilations: bool = True) -> Path:
     try:
-        relative_path_str = get_output_relative_path(metadata, template, group_compilations)
-            
-        final_path = DOWNLOAD_DIR / relative_path_str
-        final_dir = final_path.parent
-        
-        final_dir.mkdir(parents=True, exist_ok=True)
-        
-        if final_path.exists():
-            log_warning(f"File already exists at: {final_path}")
-            if temp_filepath.exists() and temp_filepath != final_path:
-                try:
-                    temp_filepath.unlink()
-                    temp_lrc = temp_filepath.with_suffix('.lrc')
-                    if temp_lrc.exists():
-                        temp_lrc.unlink()
-                    temp_txt = temp_filepath.with_suffix('.txt')
-                    if temp_txt.exists():
-                        temp_txt.unlink()
-                except Exception:
-                    pass
-            return final_path
-        
-        if temp_filepath != final_path:
-            shutil.move(str(temp_filepath), str(final_path))
-            log_success(f"Organized to: {relative_path_str}")
-            
-            temp_lrc_path = temp_filepath.with_suffix('.lrc')
-            if temp_lrc_path.exists():
-                final_lrc_path = final_path.with_suffix('.lrc')
-                shutil.move(str(temp_lrc_path), str(final_lrc_path))
-                log_success("Moved .lrc file to organized location")
-            
-            temp_txt_path = temp_filepath.with_suffix('.txt')
-            if temp_txt_path.exists():
-                final_txt_path = final_path.with_suffix('.txt')
-                shutil.move(str(temp_txt_path), str(final_txt_path))
-                log_success("Moved .txt file to organized location")
-        
-        if metadata.get('synced_lyrics') and metadata.get('target_format') != 'opus':
-            lrc_path = final_path.with_suffix('.lrc')
-            try:
-                with open(lrc_path, 'w', encoding='utf-8') as f:
-                    f.write(metadata['synced_lyrics'])
-                log_success("Saved synced lyrics to .lrc file")
-            except Exception as e:
-                log_warning(f"Failed to save .lrc file: {e}")
-        
-        elif metadata.get('plain_lyrics') and metadata.get('target_format') != 'opus':
-            txt_path = final_path.with_suffix('.txt')
-            try:
-                with open(txt_path, 'w', encoding='utf-8') as f:
-                    f.write(metadata['plain_lyrics'])
-                log_success("Saved plain lyrics to .txt file")
-            except Exception as e:
-                log_warning(f"Failed to save .txt file: {e}")
-        
+        cover_data = None
         if metadata.get('target_format') == 'opus' and metadata.get('cover_url'):
-            cover_path = final_dir / 'cover.jpg'
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(metadata['cover_url']) as response:
-                        if response.status == 200:
-                            image_data = await response.read()
-                            with open(cover_path, 'wb') as f:
-                                 f.write(image_data)
-                            log_success("Saved cover art to cover.jpg")
+                cover_data = await get_cover(metadata['cover_url'])
             except Exception as e:
                 log_warning(f"Failed to save cover art: {e}")
         
-        return final_path
+        return await file_workers.run(
+            _move_into_library, temp_filepath, metadata, template, group_compilations, cover_data
+        )
         
     except Exception as e:
         log_warning(f"Failed to organize file: {e}")
         import traceback
         traceback.print_exc()
+        # The staging directory is removed once the job is done, so the
+        # track has to leave it even though it can't go to its library path
+        return await file_workers.run(_rescue_from_staging, temp_filepath)
+
+def _rescue_from_staging(temp_filepath: Path) -> Path:
+    """Move a staged track that couldn't be organized to the top of DOWNLOAD_DIR"""
+    if temp_filepath.parent.parent != staging_dir():
         return temp_filepath
+    target = DOWNLOAD_DIR / temp_filepath.name
+    if target.exists():
+        target = target.with_name(f"{temp_filepath.stem} ({temp_filepath.parent.name}){temp_filepath.suffix}")
+    promote(temp_filepath, target)
+    log_warning(f"Left unorganized track at: {target}")
+    return target
+
+def _write_sidecar(path: Path, content, label: str):
+    try:
+        if isinstance(content, bytes):
+            path.write_bytes(content)
+        else:
+            path.write_text(content, encoding='utf-8')
+    except Exception as e:
+        log_warning(f"Failed to save {label}: {e}")
+
+def _move_into_library(temp_filepath: Path, metadata: dict, template: str, group_compilations: bool, cover_data: Optional[bytes] = None) -> Path:
+    """
+    Promote a finished track and its sidecars (.lrc/.txt, cover.jpg for
+    Opus) to their library path. Sidecars are written next to the staged
+    track and renamed into place first; the track's own rename comes last
+    and is the commit point, so a library track always has its sidecars.
+    """
+    relative_path_str = get_output_relative_path(metadata, template, group_compilations)
+    
+    final_path = DOWNLOAD_DIR / relative_path_str
+    final_dir = final_path.parent
+    
+    final_dir.mkdir(parents=True, exist_ok=True)
+    
+    if final_path.exists():
+        log_warning(f"File already exists at: {final_path}")
+        if temp_filepath.exists() and temp_filepath != final_path:
+            try:
+                temp_filepath.unlink()
+                temp_lrc = temp_filepath.with_suffix('.lrc')
+                if temp_lrc.exists():
+                    temp_lrc.unlink()
+                temp_txt = temp_filepath.with_suffix('.txt')
+                if temp_txt.exists():
+                    temp_txt.unlink()
+            except Exception:
+                pass
+        return final_path
+    
+    if metadata.get('target_format') != 'opus':
+        if metadata.get('synced_lyrics'):
+            _write_sidecar(temp_filepath.with_suffix('.lrc'), metadata['synced_lyrics'], ".lrc file")
+        elif metadata.get('plain_lyrics'):
+            _write_sidecar(temp_filepath.with_suffix('.txt'), metadata['plain_lyrics'], ".txt file")
+    
+    staged_cover = temp_filepath.parent / 'cover.jpg'
+    if cover_data:
+        _write_sidecar(staged_cover, cover_data, "cover art")
+    
+    if temp_filepath != final_path:
+        for suffix in ('.lrc', '.txt'):
+            sidecar = temp_filepath.with_suffix(suffix)
+            if sidecar.exists():
+                promote(sidecar, final_path.with_suffix(suffix))
+                log_success(f"Moved {suffix} file to organized location")
+    
+    if cover_data and staged_cover.exists():
+        promote(staged_cover, final_dir / 'cover.jpg')
+        log_success("Saved cover art to cover.jpg")
+    
+    if temp_filepath != final_path:
+        promote(temp_filepath, final_path)
+        log_success(f"Organized to: {relative_path_str}")
+    
+    return final_path
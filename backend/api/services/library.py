@@ -12,12 +12,13 @@ from mutagen.flac import FLAC
 from mutagen.mp4 import MP4
 
 from api.settings import DOWNLOAD_DIR
+from api.services.files import STAGING_DIR_NAME
 
 logger = logging.getLogger(__name__)
 
 class LibraryService:
-    def __init__(self):
-        self.cache_file = Path(__file__).parent.parent / ".cache" / "library_cache.json"
+    def __init__(self, cache_file: Optional[Path] = None):
+        self.cache_file = cache_file or Path(__file__).parent.parent / ".cache" / "library_cache.json"
         self.cache_file.parent.mkdir(exist_ok=True)
         self.library_data = self._load_cache()
 
@@ -132,7 +133,9 @@ class LibraryService:
         artists_data = {}
         
         # Walk through the directory
-        for root, _, files in os.walk(DOWNLOAD_DIR):
+        for root, dirs, files in os.walk(DOWNLOAD_DIR):
+            # Tracks still being downloaded and tagged aren't in the library yet
+            dirs[:] = [d for d in dirs if d != STAGING_DIR_NAME]
             for file in files:
                 if file.lower().endswith(('.mp3', '.flac', '.m4a', '.opus')):
                     filepath = Path(root) / file
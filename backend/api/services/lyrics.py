@@ -1,115 +1,112 @@
 from pathlib import Path
 from api.utils.logging import log_info, log_success, log_warning, log_step
-import asyncio
 import shutil
-from lyrics_client import lyrics_client
+from api.services.enrichment import get_lyrics
+from file_workers import file_workers
+from transcode_workers import transcode_workers
 
-async def fetch_and_store_lyrics(filepath: Path, metadata: dict, audio_file=None, is_mp3=False):
+async def fetch_lyrics(metadata: dict):
+    """Lyrics for a track, or None if there are none or the lookup failed"""
+    if not (metadata.get('title') and metadata.get('artist')):
+        return None
+    try:
+        log_info("Fetching lyrics...")
+        return await get_lyrics(metadata)
+    except Exception as e:
+        log_warning(f"Failed to fetch lyrics: {e}")
+        return None
+
+def store_lyrics(filepath: Path, metadata: dict, lyrics_result, audio_file=None, is_mp3=False):
     """
-    Fetch and store lyrics for an audio file.
+    Store fetched lyrics for an audio file.
     - Synced lyrics: Save as .lrc file + SYNCEDLYRICS tag (FLAC/Opus) or SYLT (MP3)
     - Plain lyrics: Embed in LYRICS tag (FLAC/Opus) or USLT (MP3)
+    Tags are added to the open `audio_file`; saving it is up to the caller.
+    Blocking (file I/O), so it runs on a file worker along with the tag writer.
     """
-    if metadata.get('title') and metadata.get('artist'):
-        try:
-            log_info("Fetching lyrics...")
-            lyrics_result = await lyrics_client.get_lyrics(
-                track_name=metadata['title'],
-                artist_name=metadata['artist'],
-                album_name=metadata.get('album'),
-                duration=metadata.get('duration')
-            )
+    if not lyrics_result:
+        return
+    try:
+        if lyrics_result.synced_lyrics:
+            metadata['synced_lyrics'] = lyrics_result.synced_lyrics
+            # Save synced lyrics to .lrc sidecar file (most compatible)
+            lrc_path = filepath.with_suffix('.lrc')
+            try:
+                with open(lrc_path, 'w', encoding='utf-8') as f:
+                    f.write(lyrics_result.synced_lyrics)
+                log_success(f"Saved synced lyrics to {lrc_path.name}")
+            except Exception as e:
+                log_warning(f"Failed to save .lrc file: {e}")
             
-            if lyrics_result:
-                if lyrics_result.synced_lyrics:
-                    metadata['synced_lyrics'] = lyrics_result.synced_lyrics
-                    # Save synced lyrics to .lrc sidecar file (most compatible)
-                    lrc_path = filepath.with_suffix('.lrc')
-                    try:
-                        with open(lrc_path, 'w', encoding='utf-8') as f:
-                            f.write(lyrics_result.synced_lyrics)
-                        log_success(f"Saved synced lyrics to {lrc_path.name}")
-                    except Exception as e:
-                        log_warning(f"Failed to save .lrc file: {e}")
+            # Embed in tags (SYNCEDLYRICS for FLAC/Opus, SYLT for MP3)
+            if is_mp3 and audio_file is not None:
+                try:
+                    from mutagen.id3 import SYLT, Encoding
+                    audio = audio_file
                     
-                    # Embed in tags (SYNCEDLYRICS for FLAC/Opus, SYLT for MP3)
-                    if is_mp3:
-                        try:
-                            from mutagen.mp3 import MP3
-                            from mutagen.id3 import ID3, SYLT, Encoding
-                            audio = MP3(str(filepath), ID3=ID3)
-                            if audio.tags is None:
-                                audio.add_tags()
-                            
-                            # Parse LRC format and create SYLT
-                            lines = []
-                            for line in lyrics_result.synced_lyrics.split('\n'):
-                                # LRC format: [mm:ss.xx]text
-                                if line.startswith('[') and ']' in line:
-                                    timestamp_part = line[1:line.index(']')]
-                                    text_part = line[line.index(']')+1:]
-                                    if ':' in timestamp_part and text_part.strip():
-                                        try:
-                                            parts = timestamp_part.split(':')
-                                            minutes = int(parts[0])
-                                            seconds = float(parts[1])
-                                            milliseconds = int((minutes * 60 + seconds) * 1000)
-                                            lines.append((text_part, milliseconds))
-                                        except (ValueError, IndexError):
-                                            continue
-                            
-                            if lines:
-                                audio.tags.delall('SYLT')
-                                audio.tags.add(SYLT(
-                                    encoding=Encoding.UTF8,
-                                    lang='eng',
-                                    format=2,  # milliseconds
-                                    type=1,    # lyrics
-                                    text=lines
-                                ))
-                                audio.save()
-                                log_success("Embedded synced lyrics in SYLT frame")
-                        except Exception as e:
-                            log_warning(f"Failed to embed MP3 SYLT: {e}")
-                    elif audio_file:
-                        try:
-                            audio_file['SYNCEDLYRICS'] = lyrics_result.synced_lyrics
-                            log_success("Embedded synced lyrics in SYNCEDLYRICS tag")
-                        except Exception as e:
-                            log_warning(f"Failed to embed synced lyrics tag: {e}")
-                            
-                elif lyrics_result.plain_lyrics:
-                    metadata['plain_lyrics'] = lyrics_result.plain_lyrics
+                    # Parse LRC format and create SYLT
+                    lines = []
+                    for line in lyrics_result.synced_lyrics.split('\n'):
+                        # LRC format: [mm:ss.xx]text
+                        if line.startswith('[') and ']' in line:
+                            timestamp_part = line[1:line.index(']')]
+                            text_part = line[line.index(']')+1:]
+                            if ':' in timestamp_part and text_part.strip():
+                                try:
+                                    parts = timestamp_part.split(':')
+                                    minutes = int(parts[0])
+                                    seconds = float(parts[1])
+                                    milliseconds = int((minutes * 60 + seconds) * 1000)
+                                    lines.append((text_part, milliseconds))
+                                except (ValueError, IndexError):
+                                    continue
                     
-                    # Embed plain lyrics
-                    if is_mp3:
-                        try:
-                            from mutagen.mp3 import MP3
-                            from mutagen.id3 import ID3, USLT, Encoding
-                            audio = MP3(str(filepath), ID3=ID3)
-                            if audio.tags is None:
-                                audio.add_tags()
-                            
-                            audio.tags.delall('USLT')
-                            audio.tags.add(USLT(
-                                encoding=Encoding.UTF8,
-                                lang='eng',
-                                desc='',
-                                text=lyrics_result.plain_lyrics
-                            ))
-                            audio.save()
-                            log_success("Embedded plain lyrics in USLT frame")
-                        except Exception as e:
-                            log_warning(f"Failed to embed MP3 USLT: {e}")
-                    elif audio_file:
-                        try:
-                            audio_file['LYRICS'] = lyrics_result.plain_lyrics
-                            log_success("Embedded plain lyrics in LYRICS tag")
-                        except Exception as e:
-                            log_warning(f"Failed to embed plain lyrics tag: {e}")
-                
-        except Exception as e:
-            log_warning(f"Failed to fetch lyrics: {e}")
+                    if lines:
+                        audio.tags.delall('SYLT')
+                        audio.tags.add(SYLT(
+                            encoding=Encoding.UTF8,
+                            lang='eng',
+                            format=2,  # milliseconds
+                            type=1,    # lyrics
+                            text=lines
+                        ))
+                        log_success("Embedded synced lyrics in SYLT frame")
+                except Exception as e:
+                    log_warning(f"Failed to embed MP3 SYLT: {e}")
+            elif audio_file is not None:
+                try:
+                    audio_file['SYNCEDLYRICS'] = lyrics_result.synced_lyrics
+                    log_success("Embedded synced lyrics in SYNCEDLYRICS tag")
+                except Exception as e:
+                    log_warning(f"Failed to embed synced lyrics tag: {e}")
+                    
+        elif lyrics_result.plain_lyrics:
+            metadata['plain_lyrics'] = lyrics_result.plain_lyrics
+            
+            # Embed plain lyrics
+            if is_mp3 and audio_file is not None:
+                try:
+                    from mutagen.id3 import USLT, Encoding
+                    audio = audio_file
+                    
+                    audio.tags.delall('USLT')
+                    audio.tags.add(USLT(
+                        encoding=Encoding.UTF8,
+                        lang='eng',
+                        desc='',
+                        text=lyrics_result.plain_lyrics
+                    ))
+                    log_success("Embedded plain lyrics in USLT frame")
+                except Exception as e:
+                    log_warning(f"Failed to embed MP3 USLT: {e}")
+            elif audio_file is not None:
+                try:
+                    audio_file['LYRICS'] = lyrics_result.plain_lyrics
+                    log_success("Embedded plain lyrics in LYRICS tag")
+                except Exception as e:
+                    log_warning(f"Failed to embed plain lyrics tag: {e}")
+    except Exception as e:
+        log_warning(f"Failed to store lyrics: {e}")
 
 async def embed_lyrics_with_ffmpeg(filepath: Path, metadata: dict):
     """Embed lyrics into the audio file using FFmpeg"""
@@ -118,7 +115,7 @@ async def embed_lyrics_with_ffmpeg(filepath: Path, metadata: dict):
         
 
         try:
-            subprocess.run(["ffmpeg", "-version"], check=True, capture_output=True)
+            await file_workers.run(subprocess.run, ["ffmpeg", "-version"], check=True, capture_output=True)
         except (FileNotFoundError, subprocess.CalledProcessError):
             log_warning("FFmpeg not found. Skipping lyrics embedding.")
             return
@@ -132,8 +129,7 @@ async def embed_lyrics_with_ffmpeg(filepath: Path, metadata: dict):
         
 
         lyrics_path = filepath.with_suffix('.lyrics.txt')
-        with open(lyrics_path, 'w', encoding='utf-8') as f:
-            f.write(lyrics)
+        await file_workers.run(lyrics_path.write_text, lyrics, encoding='utf-8')
             
         output_path = filepath.with_suffix('.temp' + filepath.suffix)
         
@@ -147,25 +143,18 @@ async def embed_lyrics_with_ffmpeg(filepath: Path, metadata: dict):
         
 
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
+        returncode, stderr = await transcode_workers.run(cmd, "lyrics", filepath, output_path)
         
-        if process.returncode == 0:
+        if returncode == 0:
 
-            shutil.move(str(output_path), str(filepath))
+            await file_workers.run(shutil.move, str(output_path), str(filepath))
             log_success("Lyrics embedded with FFmpeg")
         else:
-            log_warning(f"FFmpeg lyrics embedding failed: {stderr.decode()}")
-            if output_path.exists():
-                output_path.unlink()
+            log_warning(f"FFmpeg lyrics embedding failed: {stderr}")
+            await file_workers.run(output_path.unlink, missing_ok=True)
                 
 
-        if lyrics_path.exists():
-            lyrics_path.unlink()
+        await file_workers.run(lyrics_path.unlink, missing_ok=True)
             
     except Exception as e:
         log_warning(f"Failed to embed lyrics with FFmpeg: {e}")
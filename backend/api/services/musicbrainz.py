@@ -11,7 +11,7 @@ Fetches comprehensive metadata including:
 """
 
 import asyncio
-import aiohttp
+from http_sessions import http_sessions
 from typing import Optional, Dict, Any, List
 from api.utils.logging import log_info, log_warning, log_success
 
@@ -88,17 +88,17 @@ async def _make_mb_request(endpoint: str, params: Dict[str, str]) -> Optional[Di
     url = f"{MB_API_BASE}/{endpoint}"
     
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, params=params, headers=headers, timeout=10) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 503:
+        session = http_sessions.session("musicbrainz")
+        async with session.get(url, params=params, headers=headers, timeout=10) as response:
+            if response.status == 200:
+                return await response.json()
+            elif response.status == 503:
                     
-                    log_warning("[MusicBrainz] Rate limited, waiting...")
-                    await asyncio.sleep(MB_RATE_LIMIT_DELAY * 2)
-                    return None
-                else:
-                    return None
+                log_warning("[MusicBrainz] Rate limited, waiting...")
+                await asyncio.sleep(MB_RATE_LIMIT_DELAY * 2)
+                return None
+            else:
+                return None
     except Exception as e:
         log_warning(f"[MusicBrainz] Request failed: {e}")
         return None
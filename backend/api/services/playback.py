@@ -0,0 +1,95 @@
+import os
+import time
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from api.settings import MP3_QUALITY_MAP, OPUS_QUALITY_MAP
+from api.utils.logging import log_info, log_warning
+from api.utils.extraction import extract_dash_manifest, extract_stream_url
+from api.clients import tidal_client
+
+# Resolved stream URLs are signed and short-lived, so prefetched playback
+# info is only kept for a few minutes before it must be resolved again
+PLAYBACK_PREFETCH_TTL = int(os.getenv("PLAYBACK_PREFETCH_TTL", "300"))
+PLAYBACK_PREFETCH_WINDOW = int(os.getenv("PLAYBACK_PREFETCH_WINDOW", "50"))
+
+# (track_id, quality) -> (resolved_at, result)
+_prefetched: Dict[Tuple[int, str], Tuple[float, Dict]] = {}
+_prefetch_task: Optional[asyncio.Task] = None
+
+
+def get_source_quality(requested_quality: str) -> str:
+    """Quality to fetch from Tidal; MP3/Opus targets are transcoded from LOSSLESS"""
+    if requested_quality in MP3_QUALITY_MAP or requested_quality in OPUS_QUALITY_MAP:
+        return 'LOSSLESS'
+    return requested_quality
+
+
+async def resolve_tracks_bulk(track_ids: List[int], quality: str = "LOSSLESS") -> Dict[int, Dict]:
+    """
+    Resolve playback info for many tracks in one batched pass.
+    Returns {track_id: {'track_info', 'stream_url', 'dash_manifest', 'error'}} per track.
+    """
+    results = await tidal_client.get_tracks_bulk(track_ids, quality)
+    resolved = {}
+    for track_id, result in results.items():
+        track_info = result.get('data')
+        dash_manifest = extract_dash_manifest(track_info) if track_info else None
+        stream_url = extract_stream_url(track_info) if track_info and not dash_manifest else None
+        error = result.get('error')
+        if not error and not stream_url and not dash_manifest:
+            error = "Stream URL not found"
+        resolved[track_id] = {
+            'track_info': track_info,
+            'stream_url': stream_url,
+            'dash_manifest': dash_manifest,
+            'error': error
+        }
+    return resolved
+
+
+async def prefetch_playback_info(tracks: Iterable[Tuple[int, str]]):
+    """Resolve and remember playback info for (track_id, requested_quality) pairs"""
+    now = time.time()
+    for key in [key for key, (resolved_at, _) in _prefetched.items() if now - resolved_at >= PLAYBACK_PREFETCH_TTL]:
+        del _prefetched[key]
+
+    by_quality: Dict[str, List[int]] = {}
+    for track_id, requested_quality in tracks:
+        quality = get_source_quality(requested_quality)
+        cached = _prefetched.get((track_id, quality))
+        if cached and now - cached[0] < PLAYBACK_PREFETCH_TTL:
+            continue
+        by_quality.setdefault(quality, []).append(track_id)
+
+    for quality, track_ids in by_quality.items():
+        log_info(f"Prefetching playback info for {len(track_ids)} queued tracks ({quality})")
+        try:
+            resolved = await resolve_tracks_bulk(track_ids, quality)
+        except Exception as e:
+            log_warning(f"Playback prefetch failed: {e}")
+            continue
+        resolved_at = time.time()
+        for track_id, result in resolved.items():
+            # Failures are remembered too so they aren't re-requested every tick;
+            # take_prefetched ignores them and the download resolves on its own
+            _prefetched[(track_id, quality)] = (resolved_at, result)
+
+
+def schedule_prefetch(tracks: List[Tuple[int, str]]):
+    """Start a background prefetch unless one is already running"""
+    global _prefetch_task
+    if not tracks or (_prefetch_task and not _prefetch_task.done()):
+        return
+    _prefetch_task = asyncio.create_task(prefetch_playback_info(tracks[:PLAYBACK_PREFETCH_WINDOW]))
+
+
+def take_prefetched(track_id: int, quality: str) -> Optional[Dict]:
+    """Pop prefetched playback info if it is still fresh"""
+    entry = _prefetched.pop((track_id, quality), None)
+    if entry is None:
+        return None
+    resolved_at, result = entry
+    if result['error'] or time.time() - resolved_at >= PLAYBACK_PREFETCH_TTL:
+        return None
+    return result
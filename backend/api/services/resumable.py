@@ -0,0 +1,332 @@
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+import os
+import json
+import time
+import asyncio
+import aiohttp
+
+from api.utils.logging import log_info, log_warning
+from api.services.segmented import SegmentError, download_segmented, plan_segments, supports_segmented
+from api.services.write_behind import WriteBehindFile, read_size
+from api.settings import settings
+from bandwidth import bandwidth
+from file_workers import file_workers
+
+PART_SUFFIX = ".part"
+SIDECAR_SUFFIX = ".part.json"
+# Bytes downloaded between sidecar checkpoints
+CHECKPOINT_INTERVAL = 1024 * 1024
+# Statuses a signed CDN URL answers with once it has expired
+EXPIRED_URL_STATUSES = {401, 403, 404, 410}
+
+AUDIO_SIGNATURES = (b'fLaC', b'ID3', b'OggS', b'\xff\xfb', b'\xff\xf3', b'\xff\xf2')
+
+
+class DownloadError(Exception):
+    """A failed download; resumable=False means the partial file is worthless"""
+
+    def __init__(self, message: str, resumable: bool = True):
+        super().__init__(message)
+        self.resumable = resumable
+
+
+class _ExpiredURL(Exception):
+    pass
+
+
+class _Restart(Exception):
+    pass
+
+
+def part_path(filepath: Path) -> Path:
+    return filepath.with_name(filepath.name + PART_SUFFIX)
+
+
+def sidecar_path(filepath: Path) -> Path:
+    return filepath.with_name(filepath.name + SIDECAR_SUFFIX)
+
+
+def load_sidecar(filepath: Path) -> Optional[Dict]:
+    """Saved progress for `filepath`, or None if there is nothing to resume"""
+    sidecar = sidecar_path(filepath)
+    if not sidecar.exists() or not part_path(filepath).exists():
+        return None
+    try:
+        with open(sidecar, 'r') as f:
+            state = json.load(f)
+        if not state.get('total_size'):
+            return None
+        return state
+    except (OSError, ValueError):
+        return None
+
+
+def save_sidecar(filepath: Path, state: Dict):
+    sidecar = sidecar_path(filepath)
+    tmp = sidecar.with_name(sidecar.name + ".tmp")
+    try:
+        with open(tmp, 'w') as f:
+            json.dump({**state, 'updated_at': time.time()}, f)
+        os.replace(tmp, sidecar)
+    except OSError as e:
+        log_warning(f"Failed to save download progress: {e}")
+
+
+def discard_partial(filepath: Path):
+    for path in (part_path(filepath), sidecar_path(filepath)):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log_warning(f"Failed to remove {path.name}: {e}")
+
+
+def verify_audio_file(path: Path, expected_size: int) -> Optional[str]:
+    """Why a finished download can't be trusted, or None if it looks complete"""
+    size = path.stat().st_size
+    if expected_size and size != expected_size:
+        return f"size mismatch ({size} of {expected_size} bytes)"
+    with open(path, 'rb') as f:
+        head = f.read(12)
+    if head.startswith(AUDIO_SIGNATURES) or head[4:8] == b'ftyp':
+        return None
+    return "content is not a recognised audio file"
+
+
+async def fetch_resumable(
+    session: aiohttp.ClientSession,
+    stream_url: str,
+    filepath: Path,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    resolve_url: Optional[Callable[[], Awaitable[Optional[str]]]] = None
+):
+    """
+    Download `stream_url` to `filepath` through a .part file and a JSON sidecar
+    recording the URL, validators and progress. An interrupted download picks
+    up where it stopped with a Range request; an expired signed URL is
+    re-resolved once through `resolve_url`. The file only appears at
+    `filepath` after it has been verified.
+    """
+    state = await file_workers.run(load_sidecar, filepath)
+    if state:
+        log_info(f"Resuming {filepath.name} from {state.get('bytes', 0) / 1024 / 1024:.1f} MB")
+    else:
+        await file_workers.run(discard_partial, filepath)
+        state = _new_state(stream_url)
+    # The URL we were just given is fresher than the one in the sidecar
+    state['url'] = stream_url
+
+    url_refreshed = False
+    restarts = 0
+    while True:
+        try:
+            await _transfer(session, state, filepath, on_progress, timeout)
+            break
+        except _ExpiredURL as e:
+            if resolve_url is None or url_refreshed:
+                raise DownloadError(f"Stream URL rejected ({e})")
+            log_warning(f"Stream URL rejected ({e}), resolving a fresh one...")
+            new_url = await resolve_url()
+            if not new_url:
+                raise DownloadError("Stream URL expired and could not be re-resolved")
+            state['url'] = new_url
+            url_refreshed = True
+        except _Restart as e:
+            restarts += 1
+            if restarts > 1:
+                raise DownloadError(f"Cannot resume download: {e}", resumable=False)
+            log_warning(f"Cannot resume download ({e}), starting over")
+            await file_workers.run(discard_partial, filepath)
+            state = _new_state(state['url'])
+
+    part = part_path(filepath)
+    problem = await file_workers.run(verify_audio_file, part, state['total_size'])
+    if problem:
+        raise DownloadError(f"Downloaded file failed verification: {problem}", resumable=False)
+
+    await file_workers.run(os.replace, part, filepath)
+    await file_workers.run(sidecar_path(filepath).unlink, missing_ok=True)
+
+
+def _new_state(url: str) -> Dict:
+    return {'url': url, 'etag': None, 'last_modified': None, 'total_size': 0, 'bytes': 0, 'segments': None}
+
+
+class _Checkpoints:
+    """
+    Sidecar saves for one transfer, made on a file worker. Progress callbacks
+    are synchronous, so a checkpoint is started in the background and skipped
+    while the previous one is still being written; save() waits for it and
+    writes the latest state, so an older snapshot can never land last.
+    """
+
+    def __init__(self, filepath: Path, state: Dict):
+        self.filepath = filepath
+        self.state = state
+        self.last = state.get('bytes', 0)
+        self._pending: Optional[asyncio.Future] = None
+
+    def update(self, done: int):
+        """Record `done` bytes as safely in the .part file"""
+        self.state['bytes'] = done
+        if done - self.last >= CHECKPOINT_INTERVAL and (self._pending is None or self._pending.done()):
+            self.last = done
+            self._pending = asyncio.ensure_future(file_workers.run(save_sidecar, self.filepath, self._snapshot()))
+
+    def save_later(self):
+        """Start a save of the current state without waiting for it"""
+        previous, snapshot = self._pending, self._snapshot()
+
+        async def save():
+            if previous is not None:
+                await previous
+            await file_workers.run(save_sidecar, self.filepath, snapshot)
+
+        self._pending = asyncio.ensure_future(save())
+
+    async def save(self):
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+        await file_workers.run(save_sidecar, self.filepath, self._snapshot())
+
+    def _snapshot(self) -> Dict:
+        # Segment ranges keep moving on the loop while the worker serializes
+        segments = self.state.get('segments')
+        return {**self.state, 'segments': [list(r) for r in segments] if segments else segments}
+
+
+def _resume_offset(part: Path, state: Dict) -> int:
+    """Resume from what the sidecar says was written; anything past it may not have landed"""
+    if not state['total_size'] or not part.exists():
+        return 0
+    return min(part.stat().st_size, state.get('bytes', 0))
+
+
+async def _transfer(session, state: Dict, filepath: Path, on_progress, timeout):
+    part = part_path(filepath)
+    checkpoints = _Checkpoints(filepath, state)
+
+    def progress(done: int, total: int):
+        checkpoints.update(done)
+        if on_progress:
+            on_progress(done, total)
+
+    if state.get('segments'):
+        await _transfer_segments(session, state, filepath, progress, timeout, checkpoints)
+        return
+
+    offset = await file_workers.run(_resume_offset, part, state)
+    await file_workers.run(part.parent.mkdir, parents=True, exist_ok=True)
+    headers = {}
+    if offset:
+        headers['Range'] = f"bytes={offset}-"
+        if state.get('etag'):
+            headers['If-Range'] = state['etag']
+        elif state.get('last_modified'):
+            headers['If-Range'] = state['last_modified']
+
+    use_segments = False
+    async with session.get(state['url'], headers=headers, timeout=timeout) as response:
+        if response.status in EXPIRED_URL_STATUSES:
+            raise _ExpiredURL(f"HTTP {response.status}")
+        if offset and response.status == 416:
+            if offset == state['total_size']:
+                return
+            raise _Restart("server rejected the resume range")
+        if response.status not in (200, 206) or (response.status == 206 and not offset):
+            raise DownloadError(f"HTTP {response.status}")
+
+        if response.status == 206:
+            content_range = response.headers.get('content-range', '')
+            if content_range != f"bytes {offset}-{state['total_size'] - 1}/{state['total_size']}":
+                raise _Restart(f"unexpected Content-Range '{content_range}'")
+            total_size = state['total_size']
+        else:
+            if offset:
+                log_info("Server sent the whole file, restarting from the beginning")
+                offset = 0
+            total_size = validate_audio_response(response)
+            state.update(
+                total_size=total_size,
+                etag=response.headers.get('etag'),
+                last_modified=response.headers.get('last-modified'),
+                bytes=0,
+                segments=None
+            )
+
+            min_segment_size = settings.download_segment_min_mb * 1024 * 1024
+            use_segments = (
+                settings.segmented_downloads
+                and settings.download_segments > 1
+                and supports_segmented(response)
+                and total_size >= 2 * min_segment_size
+            )
+            if use_segments:
+                state['segments'] = [list(r) for r in plan_segments(total_size, settings.download_segments, min_segment_size)]
+
+        # Nothing may await between the response and its first read: aiohttp
+        # drops what it buffered if a truncated connection fails meanwhile
+        checkpoints.save_later()
+
+        if not use_segments:
+            downloaded = offset
+            # Progress follows the socket, checkpoints follow what has reached the file
+            writer = WriteBehindFile(part, offset, total_size, on_flush=checkpoints.update)
+            try:
+                async with writer:
+                    async for chunk in response.content.iter_chunked(read_size(total_size)):
+                        await bandwidth.throttle(len(chunk))
+                        await writer.write(chunk)
+                        downloaded += len(chunk)
+                        if on_progress:
+                            on_progress(downloaded, total_size)
+            finally:
+                state['bytes'] = writer.flushed
+                await checkpoints.save()
+
+            if total_size and downloaded != total_size:
+                raise DownloadError(f"Connection closed after {downloaded} of {total_size} bytes")
+            if not total_size:
+                state['total_size'] = downloaded
+            return
+
+    # The probe response is released above; segments use their own ranged requests
+    await _transfer_segments(session, state, filepath, progress, timeout, checkpoints)
+
+
+async def _transfer_segments(session, state: Dict, filepath: Path, progress, timeout, checkpoints: _Checkpoints):
+    try:
+        await download_segmented(
+            session,
+            state['url'],
+            part_path(filepath),
+            state['total_size'],
+            segments=settings.download_segments,
+            min_segment_size=settings.download_segment_min_mb * 1024 * 1024,
+            on_progress=progress,
+            timeout=timeout,
+            ranges=state['segments']
+        )
+    except SegmentError as e:
+        if e.status in EXPIRED_URL_STATUSES:
+            raise _ExpiredURL(str(e))
+        raise DownloadError(str(e))
+    finally:
+        await checkpoints.save()
+
+
+def validate_audio_response(response: aiohttp.ClientResponse) -> int:
+    """Reject error documents served in place of audio; returns the content length"""
+    content_type = response.headers.get('content-type', '').lower()
+    if 'xml' in content_type or 'text' in content_type:
+        raise DownloadError(f"Invalid content type: {content_type} (likely quality unavailable)", resumable=False)
+
+    total_size = int(response.headers.get('content-length', 0))
+    # Tiny files are error documents, not audio
+    if 0 < total_size < 10000:
+        raise DownloadError(f"File too small ({total_size} bytes), likely invalid", resumable=False)
+    return total_size
@@ -10,7 +10,7 @@ async def search_track_with_fallback(artist: str, title: str, track_obj) -> bool
     log_info(f"Searching: {artist_fixed} - {title_fixed}")
     
     query = f"{artist_fixed} {title_fixed}"
-    result = tidal_client.search_tracks(query)
+    result = await tidal_client.search_tracks(query)
     
     if result:
         tidal_tracks = extract_items(result, 'tracks')
@@ -38,7 +38,7 @@ async def search_track_with_fallback(artist: str, title: str, track_obj) -> bool
         log_info(f"Trying romanized: {search_artist} - {search_title}")
         
         query_romanized = f"{search_artist} {search_title}"
-        result = tidal_client.search_tracks(query_romanized)
+        result = await tidal_client.search_tracks(query_romanized)
         
         if result:
             tidal_tracks = extract_items(result, 'tracks')
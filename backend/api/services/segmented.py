@@ -0,0 +1,201 @@
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+import asyncio
+import aiohttp
+
+from api.utils.logging import log_info, log_warning
+from api.services.write_behind import WRITE_BUFFER_SIZE
+from bandwidth import bandwidth
+from file_workers import file_workers
+
+SEGMENT_CHUNK_SIZE = 64 * 1024
+SEGMENT_RETRIES = 3
+SEGMENT_RETRY_DELAY = 1.0
+
+
+class SegmentError(Exception):
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class SegmentWriter:
+    """
+    Write-behind for one segment: chunks are gathered in memory and written
+    at their offset on a file worker, one write in flight at a time, while
+    the next buffer fills. `segment[0]` only advances once a write has
+    landed, so a checkpoint of the ranges never claims data still in memory.
+    """
+
+    def __init__(self, filepath: Path, segment: List[int], buffer_size: int = WRITE_BUFFER_SIZE):
+        self.filepath = filepath
+        self.segment = segment
+        self.buffer_size = buffer_size
+        self._file = None
+        self._buffer = bytearray()
+        self._pending: Optional[asyncio.Future] = None
+        self._pending_end = segment[0]
+
+    async def __aenter__(self):
+        self._file = await file_workers.run(open, self.filepath, 'r+b')
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self.close()
+        except Exception:
+            # Don't let a failing flush hide the error that got us here
+            if exc_type is None:
+                raise
+        return False
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        if len(self._buffer) >= self.buffer_size:
+            await self._flush()
+
+    async def close(self):
+        if self._file is None:
+            return
+        try:
+            if self._buffer:
+                await self._flush()
+            await self._wait_pending()
+        finally:
+            if self._pending is not None:
+                # Cancelled while a write was running: it still has to finish first
+                try:
+                    await self._pending
+                except Exception:
+                    pass
+                self._pending = None
+            f, self._file = self._file, None
+            await file_workers.run(f.close)
+
+    async def _flush(self):
+        await self._wait_pending()
+        data, self._buffer = self._buffer, bytearray()
+        offset = self.segment[0]
+        self._pending_end = offset + len(data)
+        self._pending = asyncio.ensure_future(file_workers.run(_write_at, self._file, offset, data))
+
+    async def _wait_pending(self):
+        if self._pending is None:
+            return
+        await self._pending
+        self._pending = None
+        self.segment[0] = self._pending_end
+
+
+def _write_at(f, offset: int, data: bytes):
+    f.seek(offset)
+    f.write(data)
+    # On disk (or at least in the OS) before the segment claims it
+    f.flush()
+
+
+def supports_segmented(response: aiohttp.ClientResponse) -> bool:
+    """Whether a response advertises byte ranges and a known length"""
+    return (
+        response.headers.get('accept-ranges', '').lower() == 'bytes'
+        and int(response.headers.get('content-length', 0) or 0) > 0
+    )
+
+
+def _extend(filepath: Path, total_size: int):
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with open(filepath, 'ab') as f:
+        f.truncate(total_size)
+
+
+def plan_segments(total_size: int, segments: int, min_segment_size: int) -> List[Tuple[int, int]]:
+    """
+    Split [0, total_size) into at most `segments` inclusive byte ranges,
+    none smaller than `min_segment_size` (except a single whole-file range).
+    """
+    count = max(1, min(segments, total_size // max(1, min_segment_size)))
+    size = -(-total_size // count)
+    return [(start, min(start + size, total_size) - 1) for start in range(0, total_size, size)]
+
+
+async def download_segmented(
+    session: aiohttp.ClientSession,
+    url: str,
+    filepath: Path,
+    total_size: int,
+    segments: int,
+    min_segment_size: int,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    retries: int = SEGMENT_RETRIES,
+    ranges: Optional[List[List[int]]] = None
+):
+    """
+    Download `url` into `filepath` as concurrent Range requests written into
+    a preallocated file. A failed segment is retried from the byte it got
+    to; the download fails once any segment runs out of retries.
+    
+    `ranges` are [next byte, last byte] pairs, updated in place as data
+    lands so a caller can persist them and resume an interrupted download.
+    """
+    if ranges is None:
+        ranges = [list(r) for r in plan_segments(total_size, segments, min_segment_size)]
+    pending = [r for r in ranges if r[0] <= r[1]]
+    remaining = sum(end - position + 1 for position, end in pending)
+    log_info(f"Segmented download: {len(pending)} segments, {remaining / 1024 / 1024:.1f} MB to fetch")
+
+    # Extends (or creates) the file to its final size without touching data already written
+    await file_workers.run(_extend, filepath, total_size)
+
+    downloaded = total_size - remaining
+
+    async def fetch_segment(index: int, segment: List[int]):
+        nonlocal downloaded
+        end = segment[1]
+        # Next byte to request; runs ahead of segment[0] by what is still buffered
+        position = segment[0]
+        attempt = 0
+        async with SegmentWriter(filepath, segment) as writer:
+            while position <= end:
+                try:
+                    headers = {'Range': f"bytes={position}-{end}"}
+                    async with session.get(url, headers=headers, timeout=timeout) as response:
+                        if response.status != 206:
+                            raise SegmentError(f"HTTP {response.status} for range {position}-{end}", response.status)
+                        content_range = response.headers.get('content-range', '')
+                        if not content_range.startswith(f"bytes {position}-"):
+                            raise SegmentError(f"Unexpected Content-Range '{content_range}'")
+
+                        async for chunk in response.content.iter_chunked(SEGMENT_CHUNK_SIZE):
+                            chunk = chunk[:end + 1 - position]
+                            await bandwidth.throttle(len(chunk))
+                            await writer.write(chunk)
+                            position += len(chunk)
+                            downloaded += len(chunk)
+                            if on_progress:
+                                on_progress(downloaded, total_size)
+                            if position > end:
+                                break
+
+                    if position <= end:
+                        raise SegmentError(f"Segment {index} ended early at byte {position}")
+                except (aiohttp.ClientError, asyncio.TimeoutError, SegmentError) as e:
+                    attempt += 1
+                    if attempt > retries:
+                        raise SegmentError(
+                            f"Segment {index} failed after {retries} retries: {e}", getattr(e, 'status', None)
+                        ) from e
+                    log_warning(f"Segment {index} failed ({e}), retrying from byte {position} ({attempt}/{retries})")
+                    await asyncio.sleep(SEGMENT_RETRY_DELAY * attempt)
+
+    tasks = [asyncio.create_task(fetch_segment(i, segment)) for i, segment in enumerate(pending)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if downloaded != total_size:
+        raise SegmentError(f"Downloaded {downloaded} of {total_size} bytes")
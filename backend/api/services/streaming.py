@@ -0,0 +1,181 @@
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+import os
+import asyncio
+import platform
+import aiohttp
+
+from api.utils.logging import log_info, log_warning
+from api.services.resumable import (
+    DownloadError, EXPIRED_URL_STATUSES, part_path, validate_audio_response, verify_audio_file
+)
+from api.services.write_behind import WriteBehindFile
+from bandwidth import bandwidth
+from file_workers import file_workers
+from transcode_workers import low_priority
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Encoder arguments and output muxer per target format, matching transcode_to_mp3/opus
+ENCODERS = {
+    'mp3': (['-codec:a', 'libmp3lame'], 'mp3'),
+    'opus': (['-codec:a', 'libopus', '-map_metadata', '0'], 'opus'),
+}
+
+
+def streaming_supported(target_format: Optional[str]) -> bool:
+    """
+    Whether a download can be piped into the encoder. Windows runs FFmpeg
+    through subprocess.run (the selector event loop has no async pipes), so
+    it keeps the download-then-transcode path.
+    """
+    return target_format in ENCODERS and platform.system() != "Windows"
+
+
+def encoder_command(target_format: str, bitrate_kbps: int, output: Path) -> List[str]:
+    codec_args, muxer = ENCODERS[target_format]
+    return [
+        "ffmpeg",
+        "-y",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        "pipe:0",
+        "-vn",
+        *codec_args,
+        "-b:a",
+        f"{bitrate_kbps}k",
+        # The output is a .part file, so the container can't come from the extension
+        "-f",
+        muxer,
+        str(output),
+    ]
+
+
+async def stream_transcode(
+    session: aiohttp.ClientSession,
+    stream_url: str,
+    target_path: Path,
+    target_format: str,
+    bitrate_kbps: int,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
+    resolve_url: Optional[Callable[[], Awaitable[Optional[str]]]] = None,
+    master_path: Optional[Path] = None
+):
+    """
+    Feed the HTTP body of `stream_url` to FFmpeg's stdin as it arrives, so
+    encoding finishes right after the last byte instead of after a full
+    write and re-read of the lossless file. Writes wait for FFmpeg to drain
+    its pipe, so a slow encoder slows the download rather than buffering it
+    in memory. With `master_path` the lossless stream is also written there.
+
+    Nothing appears at `target_path` (or `master_path`) unless both the
+    transfer and the encoder succeeded. A piped stream leaves nothing to
+    resume from, so every DownloadError it raises is non-resumable.
+    """
+    output = part_path(target_path)
+    master_part = part_path(master_path) if master_path else None
+    target_path.parent.mkdir(parents=True, exist_ok=True)
+
+    response = await _open_stream(session, stream_url, timeout, resolve_url)
+    process = None
+    stderr_task = None
+    master = None
+    try:
+        total_size = validate_audio_response(response)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *low_priority(encoder_command(target_format, bitrate_kbps, output)),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            raise DownloadError("ffmpeg not found. Please install ffmpeg and ensure it is on the PATH.", resumable=False)
+        # Drain stderr alongside, or a chatty FFmpeg could block on a full pipe
+        stderr_task = asyncio.create_task(process.stderr.read())
+
+        if master_part:
+            master = await WriteBehindFile(master_part, total_size=total_size).open()
+
+        downloaded = 0
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            await bandwidth.throttle(len(chunk))
+            try:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                await process.wait()
+                raise DownloadError(f"FFmpeg stopped reading: {await _stderr_tail(stderr_task)}", resumable=False)
+            if master:
+                await master.write(chunk)
+            downloaded += len(chunk)
+            if on_progress:
+                on_progress(downloaded, total_size)
+
+        if total_size and downloaded != total_size:
+            raise DownloadError(f"Connection closed after {downloaded} of {total_size} bytes", resumable=False)
+
+        process.stdin.close()
+        try:
+            await process.stdin.wait_closed()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        returncode = await process.wait()
+        if returncode != 0:
+            raise DownloadError(f"FFmpeg failed: {await _stderr_tail(stderr_task)}", resumable=False)
+        if master:
+            await master.close()
+    except BaseException:
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        if master:
+            try:
+                await master.close()
+            except Exception:
+                pass
+        for path in (output, master_part):
+            if path is not None:
+                await file_workers.run(path.unlink, missing_ok=True)
+        raise
+    finally:
+        response.release()
+        if stderr_task is not None and not stderr_task.done():
+            stderr_task.cancel()
+
+    await file_workers.run(os.replace, output, target_path)
+    if master_part:
+        problem = await file_workers.run(verify_audio_file, master_part, total_size)
+        if problem:
+            log_warning(f"Not keeping lossless master: {problem}")
+            await file_workers.run(master_part.unlink)
+        else:
+            await file_workers.run(os.replace, master_part, master_path)
+    log_info(f"Streamed {downloaded / 1024 / 1024:.1f} MB into the {target_format} encoder")
+
+
+async def _open_stream(session, stream_url: str, timeout, resolve_url) -> aiohttp.ClientResponse:
+    """GET the stream, re-resolving an expired signed URL once"""
+    response = await session.get(stream_url, timeout=timeout)
+    if response.status in EXPIRED_URL_STATUSES and resolve_url is not None:
+        response.release()
+        log_warning(f"Stream URL rejected (HTTP {response.status}), resolving a fresh one...")
+        fresh_url = await resolve_url()
+        if not fresh_url:
+            raise DownloadError("Stream URL expired and could not be re-resolved", resumable=False)
+        response = await session.get(fresh_url, timeout=timeout)
+    if response.status != 200:
+        response.release()
+        raise DownloadError(f"HTTP {response.status}", resumable=False)
+    return response
+
+
+async def _stderr_tail(stderr_task: asyncio.Task) -> str:
+    try:
+        stderr = await asyncio.wait_for(stderr_task, timeout=5)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        return "Unknown error"
+    return stderr.decode(errors='ignore')[-500:].strip() or "Unknown error"
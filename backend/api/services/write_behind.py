@@ -0,0 +1,150 @@
+from pathlib import Path
+from typing import Callable, Optional
+import os
+import asyncio
+
+from file_workers import file_workers
+
+# Bytes collected in memory before they are handed to a file worker
+WRITE_BUFFER_SIZE = 2 * 1024 * 1024
+# Bounds for a single socket read; see read_size()
+MIN_READ_SIZE = 256 * 1024
+MAX_READ_SIZE = 1024 * 1024
+
+
+def read_size(total_size: int) -> int:
+    """Bytes to ask for per read: about 1/64th of the file, within 256 KB-1 MB"""
+    if not total_size:
+        return MIN_READ_SIZE
+    return max(MIN_READ_SIZE, min(MAX_READ_SIZE, total_size // 64))
+
+
+def preallocate(f, offset: int, total_size: int) -> bool:
+    """
+    Reserve the rest of the file up front so it is laid out in one go rather
+    than grown write by write. Not every filesystem supports it (some network
+    mounts don't), which is fine.
+    """
+    if total_size <= offset or not hasattr(os, 'posix_fallocate'):
+        return False
+    try:
+        os.posix_fallocate(f.fileno(), offset, total_size - offset)
+        return True
+    except OSError:
+        return False
+
+
+class WriteBehindFile:
+    """
+    Sequential writer for the download loop. Chunks are gathered in memory
+    and written WRITE_BUFFER_SIZE at a time on a file worker while the next
+    buffer fills. Only one write is in flight, so memory stays bounded and a
+    slow disk slows the download instead of piling up buffers.
+
+    Writing starts at `offset` (anything after it is cut off). With
+    `total_size` the file is preallocated while the first buffer fills, and
+    closing truncates it back to what was actually written, so its size
+    stays a valid resume offset.
+    `flushed` counts the bytes known to be in the file; `on_flush(flushed)`
+    is called after each write lands.
+
+        async with WriteBehindFile(part, offset, total_size) as writer:
+            async for chunk in response.content.iter_chunked(read_size(total_size)):
+                await writer.write(chunk)
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        offset: int = 0,
+        total_size: int = 0,
+        buffer_size: int = WRITE_BUFFER_SIZE,
+        on_flush: Optional[Callable[[int], None]] = None
+    ):
+        self.path = path
+        self.offset = offset
+        self.total_size = total_size
+        self.buffer_size = buffer_size
+        self.on_flush = on_flush
+        self.flushed = offset
+        self.preallocated = False
+        self._file = None
+        self._buffer = bytearray()
+        self._pending: Optional[asyncio.Future] = None
+        self._pending_size = 0
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def open(self):
+        # Opened on the loop: yielding before the first read lets aiohttp
+        # drop whatever it buffered if the connection fails meanwhile
+        self._file = self._open()
+        if self.total_size > self.offset:
+            self._pending_size = 0
+            self._pending = asyncio.ensure_future(file_workers.run(self._preallocate))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self.close()
+        except Exception:
+            # Don't let a failing flush hide the error that got us here
+            if exc_type is None:
+                raise
+        return False
+
+    async def write(self, chunk: bytes):
+        self._buffer += chunk
+        if len(self._buffer) >= self.buffer_size:
+            await self._flush()
+
+    async def close(self):
+        if self._file is None:
+            return
+        try:
+            if self._buffer:
+                await self._flush()
+            await self._wait_pending()
+        finally:
+            if self._pending is not None:
+                # Cancelled while a write was running: it still has to finish first
+                try:
+                    await self._pending
+                except Exception:
+                    pass
+                self._pending = None
+            f, self._file = self._file, None
+            await file_workers.run(self._close, f)
+
+    async def _flush(self):
+        await self._wait_pending()
+        data, self._buffer = self._buffer, bytearray()
+        self._pending_size = len(data)
+        self._pending = asyncio.ensure_future(file_workers.run(self._file.write, data))
+
+    async def _wait_pending(self):
+        if self._pending is None:
+            return
+        await self._pending
+        self._pending = None
+        self.flushed += self._pending_size
+        if self.on_flush:
+            self.on_flush(self.flushed)
+
+    def _open(self):
+        f = open(self.path, 'r+b' if self.offset else 'wb')
+        if self.offset:
+            f.truncate(self.offset)
+            f.seek(self.offset)
+        return f
+
+    def _preallocate(self):
+        self.preallocated = preallocate(self._file, self.offset, self.total_size)
+
+    def _close(self, f):
+        try:
+            if self.preallocated:
+                f.truncate(self.flushed)
+        finally:
+            f.close()
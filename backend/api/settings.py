@@ -18,6 +18,22 @@ class Settings(BaseSettings):
     run_beets: bool = False
     embed_lyrics: bool = False
     
+    # Segmented downloads: fetch large files over several ranged connections
+    segmented_downloads: bool = False
+    download_segments: int = 4
+    download_segment_min_mb: int = 8
+    
+    # Streaming transcode: pipe MP3/Opus downloads straight into FFmpeg,
+    # optionally keeping the lossless stream next to the encoded file
+    streaming_transcode: bool = False
+    keep_lossless_master: bool = False
+    
+    # Download bandwidth cap in Mbit/s (0 = unlimited), shared fairly between
+    # active downloads; bandwidth_schedule sets other caps by time of day,
+    # e.g. "08:00-23:00=20,23:00-08:00=0"
+    bandwidth_limit_mbps: float = 0
+    bandwidth_schedule: str = ""
+    
     # Jellyfin Integration
     jellyfin_url: Optional[str] = None
     jellyfin_api_key: Optional[str] = None
@@ -0,0 +1,195 @@
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import urljoin
+
+DASH_MIME_TYPE = "application/dash+xml"
+
+
+@dataclass
+class DashManifest:
+    """The segments of the best audio representation in an MPD"""
+    segment_urls: List[str]
+    init_url: Optional[str] = None
+    mime_type: str = "audio/mp4"
+    codecs: str = ""
+    bandwidth: int = 0
+    duration: Optional[float] = None
+    representation_id: str = ""
+
+    @property
+    def urls(self) -> List[str]:
+        return ([self.init_url] if self.init_url else []) + self.segment_urls
+
+    @property
+    def estimated_size(self) -> int:
+        """Expected size in bytes from the advertised bitrate, 0 if unknown"""
+        if self.bandwidth and self.duration:
+            return int(self.bandwidth * self.duration / 8)
+        return 0
+
+    @property
+    def is_flac(self) -> bool:
+        return 'flac' in self.codecs.lower()
+
+
+def is_mpd(text: str) -> bool:
+    head = text.lstrip()[:512]
+    return head.startswith('<MPD') or (head.startswith('<?xml') and '<MPD' in text[:2048])
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in an ISO 8601 duration such as PT3M27.410S"""
+    if not value:
+        return None
+    match = re.fullmatch(r'P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?)?', value.strip())
+    if not match:
+        return None
+    days, hours, minutes, seconds = match.groups()
+    return (
+        int(days or 0) * 86400 + int(hours or 0) * 3600
+        + int(minutes or 0) * 60 + float(seconds or 0)
+    )
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child(element, name: str):
+    for child in element:
+        if _local(child.tag) == name:
+            return child
+    return None
+
+
+def _children(element, name: str):
+    return [child for child in element if _local(child.tag) == name]
+
+
+def _base_url(element, inherited: str) -> str:
+    base = _child(element, 'BaseURL')
+    if base is not None and base.text:
+        return urljoin(inherited, base.text.strip())
+    return inherited
+
+
+def _fill_template(template: str, representation_id: str, bandwidth: int, number: Optional[int] = None, time: Optional[int] = None) -> str:
+    def replace(match):
+        name, fmt = match.group(1), match.group(2)
+        if not name:
+            return '$'
+        value = {
+            'RepresentationID': representation_id,
+            'Bandwidth': bandwidth,
+            'Number': number,
+            'Time': time,
+        }.get(name)
+        if value is None:
+            return match.group(0)
+        if fmt and isinstance(value, int):
+            return fmt % value
+        return str(value)
+
+    return re.sub(r'\$(RepresentationID|Bandwidth|Number|Time|)(%0\d+d)?\$', replace, template)
+
+
+def _template_segments(template, base: str, representation_id: str, bandwidth: int, duration: Optional[float]):
+    start_number = int(template.get('startNumber', 1))
+    timescale = int(template.get('timescale', 1))
+    media = template.get('media')
+    init = template.get('initialization')
+    init_url = urljoin(base, _fill_template(init, representation_id, bandwidth)) if init else None
+    if not media:
+        return init_url, []
+
+    urls = []
+    timeline = _child(template, 'SegmentTimeline')
+    if timeline is not None:
+        number, time = start_number, 0
+        for s in _children(timeline, 'S'):
+            if s.get('t') is not None:
+                time = int(s.get('t'))
+            d = int(s.get('d'))
+            for _ in range(int(s.get('r', 0)) + 1):
+                urls.append(urljoin(base, _fill_template(media, representation_id, bandwidth, number, time)))
+                number += 1
+                time += d
+    elif template.get('duration') and duration:
+        segment_duration = int(template.get('duration')) / timescale
+        count = int(-(-duration // segment_duration))
+        urls = [
+            urljoin(base, _fill_template(media, representation_id, bandwidth, start_number + i))
+            for i in range(count)
+        ]
+    return init_url, urls
+
+
+def parse_mpd(text: str) -> Optional[DashManifest]:
+    """
+    Parse a static MPD into the segment URLs of its highest-bandwidth audio
+    representation. Handles SegmentTemplate (with SegmentTimeline or a fixed
+    duration), SegmentList and single-file BaseURL representations.
+    """
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError:
+        return None
+    if _local(root.tag) != 'MPD':
+        return None
+
+    duration = parse_duration(root.get('mediaPresentationDuration'))
+    root_base = _base_url(root, '')
+    best = None
+
+    for period in _children(root, 'Period'):
+        period_base = _base_url(period, root_base)
+        for adaptation in _children(period, 'AdaptationSet'):
+            mime_type = adaptation.get('mimeType', '')
+            content_type = adaptation.get('contentType', '')
+            if mime_type and not mime_type.startswith('audio') and content_type != 'audio':
+                continue
+            adaptation_base = _base_url(adaptation, period_base)
+            for representation in _children(adaptation, 'Representation'):
+                bandwidth = int(representation.get('bandwidth', 0))
+                if best is not None and bandwidth <= best[0]:
+                    continue
+                best = (bandwidth, adaptation, representation, _base_url(representation, adaptation_base))
+
+    if best is None:
+        return None
+
+    bandwidth, adaptation, representation, base = best
+    representation_id = representation.get('id', '')
+    # Elements without children are falsy, so fall back explicitly
+    template = _child(representation, 'SegmentTemplate')
+    if template is None:
+        template = _child(adaptation, 'SegmentTemplate')
+    segment_list = _child(representation, 'SegmentList')
+    if segment_list is None:
+        segment_list = _child(adaptation, 'SegmentList')
+
+    init_url, urls = None, []
+    if template is not None:
+        init_url, urls = _template_segments(template, base, representation_id, bandwidth, duration)
+    elif segment_list is not None:
+        init = _child(segment_list, 'Initialization')
+        if init is not None and init.get('sourceURL'):
+            init_url = urljoin(base, init.get('sourceURL'))
+        urls = [urljoin(base, s.get('media')) for s in _children(segment_list, 'SegmentURL') if s.get('media')]
+    elif base:
+        urls = [base]
+
+    if not urls:
+        return None
+
+    return DashManifest(
+        segment_urls=urls,
+        init_url=init_url,
+        mime_type=representation.get('mimeType') or adaptation.get('mimeType') or 'audio/mp4',
+        codecs=representation.get('codecs') or adaptation.get('codecs') or '',
+        bandwidth=bandwidth,
+        duration=duration,
+        representation_id=representation_id,
+    )
@@ -1,5 +1,8 @@
+import base64
+import binascii
 from typing import List, Optional
 from api.utils.logging import log_info, log_warning, log_error
+from api.utils.dash import DashManifest, DASH_MIME_TYPE, is_mpd, parse_mpd
 
 def extract_items(result, key: str) -> List:
     # log_info(f"extract_items called for key: {key}")
@@ -78,6 +81,10 @@ def extract_stream_url(track_data) -> Optional[str]:
                 except json.JSONDecodeError:
                     pass
                 
+                # DASH manifests list many segment URLs; see extract_dash_manifest
+                if is_mpd(decoded):
+                    continue
+                
                 import re
                 url_match = re.search(r'https?://[^\s"]+', decoded)
                 if url_match:
@@ -86,3 +93,26 @@ def extract_stream_url(track_data) -> Optional[str]:
                 log_error(f"Failed to decode manifest: {e}")
     
     return None
+
+def extract_dash_manifest(track_data) -> Optional[DashManifest]:
+    """Parsed DASH manifest from playback info, if the stream is segmented"""
+    entries = track_data if isinstance(track_data, list) else [track_data]
+    
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('manifest'):
+            continue
+        mime_type = entry.get('manifestMimeType', '')
+        if mime_type and mime_type != DASH_MIME_TYPE:
+            continue
+        try:
+            decoded = base64.b64decode(entry['manifest']).decode('utf-8')
+        except (binascii.Error, UnicodeDecodeError, TypeError) as e:
+            log_error(f"Failed to decode manifest: {e}")
+            continue
+        if is_mpd(decoded):
+            manifest = parse_mpd(decoded)
+            if manifest:
+                return manifest
+            log_warning("DASH manifest has no usable audio representation")
+    
+    return None
@@ -0,0 +1,216 @@
+"""
+Global bandwidth limit for track downloads.
+
+All transfers share one token bucket refilled at the configured cap, so a
+playlist sync of hundreds of tracks can't saturate the uplink however many
+fetch slots it holds. Tokens are handed out in small quanta, first come
+first served, and a download waits for its previous quantum before asking
+for the next one, so every active download gets the same share: a
+segmented download's connections split one share between them instead of
+taking one each.
+
+The cap is in Mbit/s (0 means unlimited) and can differ by time of day:
+a schedule of `HH:MM-HH:MM=Mbit/s` windows, e.g. "08:00-23:00=20" to hold
+downloads to 20 Mbit/s during the day and run them flat out at night.
+Windows may wrap past midnight; the first match wins and outside every
+window the plain cap applies. Both can be changed at runtime through the
+system settings API.
+
+    async with bandwidth.transfer(track_id):
+        async for chunk in response.content.iter_chunked(size):
+            await bandwidth.throttle(len(chunk))
+"""
+
+import time
+import asyncio
+import contextvars
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+# Bytes granted at a time; small enough that transfers take turns often
+QUANTUM = 64 * 1024
+# Idle time the bucket may bank, so a pause doesn't turn into a burst
+MAX_BURST_SECONDS = 0.25
+BYTES_PER_MBIT = 125_000
+
+
+@dataclass
+class BandwidthWindow:
+    start: int  # minutes after midnight
+    end: int
+    limit_mbps: float
+
+    def contains(self, minute: int) -> bool:
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def __str__(self) -> str:
+        return f"{_format_minutes(self.start)}-{_format_minutes(self.end)}={self.limit_mbps:g}"
+
+
+def _parse_minutes(value: str) -> int:
+    hours, minutes = value.strip().split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"invalid time '{value.strip()}'")
+    return hours * 60 + minutes
+
+
+def _format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_schedule(value: Optional[str]) -> List[BandwidthWindow]:
+    """Parse comma-separated `HH:MM-HH:MM=Mbit/s` windows; raises ValueError"""
+    windows = []
+    for entry in (value or "").split(','):
+        if not entry.strip():
+            continue
+        try:
+            span, limit = entry.split('=')
+            start, end = span.split('-')
+            window = BandwidthWindow(_parse_minutes(start), _parse_minutes(end), float(limit))
+        except ValueError as e:
+            raise ValueError(f"Invalid bandwidth window '{entry.strip()}' (expected HH:MM-HH:MM=Mbit/s): {e}")
+        if window.limit_mbps < 0:
+            raise ValueError(f"Invalid bandwidth window '{entry.strip()}': negative limit")
+        windows.append(window)
+    return windows
+
+
+class Transfer:
+    """One download's share; all of its connections go through it"""
+
+    def __init__(self, key):
+        self.key = key
+        self.connections = 0
+        self.bytes = 0
+        self.throttled_time = 0.0
+        self.started = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+_current: contextvars.ContextVar[Optional[Transfer]] = contextvars.ContextVar("bandwidth_transfer", default=None)
+
+
+class _Registration:
+    """`async with bandwidth.transfer(key):`"""
+
+    def __init__(self, limiter: "BandwidthLimiter", key):
+        self.limiter = limiter
+        self.key = key
+        self.transfer: Optional[Transfer] = None
+        self.token = None
+
+    async def __aenter__(self) -> Transfer:
+        transfer = self.limiter.transfers.get(self.key)
+        if transfer is None:
+            transfer = self.limiter.transfers[self.key] = Transfer(self.key)
+        transfer.connections += 1
+        self.transfer = transfer
+        self.token = _current.set(transfer)
+        return transfer
+
+    async def __aexit__(self, exc_type, exc, tb):
+        transfer = self.transfer
+        _current.reset(self.token)
+        transfer.connections -= 1
+        if transfer.connections == 0 and self.limiter.transfers.get(self.key) is transfer:
+            del self.limiter.transfers[self.key]
+        return False
+
+
+class BandwidthLimiter:
+
+    def __init__(self, limit_mbps: float = 0.0, schedule: Optional[List[BandwidthWindow]] = None):
+        self.limit_mbps = limit_mbps
+        self.schedule = schedule or []
+        self.transfers: Dict[object, Transfer] = {}
+        self.bytes = 0
+        self.throttled_time = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def configure(self, limit_mbps: float, schedule: Optional[List[BandwidthWindow]] = None):
+        self.limit_mbps = max(0.0, limit_mbps)
+        self.schedule = schedule or []
+
+    def current_limit(self, now: Optional[datetime] = None) -> float:
+        """The cap in force now, in Mbit/s (0 = unlimited)"""
+        if self.schedule:
+            now = now or datetime.now()
+            minute = now.hour * 60 + now.minute
+            for window in self.schedule:
+                if window.contains(minute):
+                    return window.limit_mbps
+        return self.limit_mbps
+
+    def transfer(self, key) -> _Registration:
+        """Register a download; throttle() calls inside it share its fair share"""
+        return _Registration(self, key)
+
+    async def throttle(self, nbytes: int):
+        """Account for `nbytes` just received, waiting while over the cap"""
+        self.bytes += nbytes
+        transfer = _current.get()
+        if transfer is not None:
+            transfer.bytes += nbytes
+        if self.current_limit() <= 0:
+            return
+
+        if transfer is None:
+            waited = await self._take(nbytes)
+        else:
+            async with transfer.lock:
+                waited = 0.0
+                for offset in range(0, nbytes, QUANTUM):
+                    waited += await self._take(min(QUANTUM, nbytes - offset))
+            transfer.throttled_time += waited
+
+    async def _take(self, nbytes: int) -> float:
+        async with self._lock:
+            # Re-read per quantum so a changed cap or a new time window applies at once
+            rate = self.current_limit() * BYTES_PER_MBIT
+            if rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            burst = max(QUANTUM, rate * MAX_BURST_SECONDS)
+            self._tokens = min(burst, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            self._tokens -= nbytes
+            if self._tokens >= 0:
+                return 0.0
+            # Sleep holding the lock: the next transfer in line is served after this one
+            wait = -self._tokens / rate
+            self.throttled_time += wait
+            await asyncio.sleep(wait)
+            return wait
+
+    def stats(self) -> Dict:
+        limit = self.current_limit()
+        now = time.monotonic()
+        return {
+            'limit_mbps': self.limit_mbps,
+            'schedule': [str(window) for window in self.schedule],
+            'current_limit_mbps': limit,
+            'fair_share_mbps': round(limit / len(self.transfers), 3) if limit and self.transfers else None,
+            'bytes': self.bytes,
+            'throttled_seconds': round(self.throttled_time, 2),
+            'transfers': [
+                {
+                    'key': transfer.key,
+                    'connections': transfer.connections,
+                    'bytes': transfer.bytes,
+                    'mbps': round(transfer.bytes / BYTES_PER_MBIT / max(now - transfer.started, 1e-3), 3),
+                    'throttled_seconds': round(transfer.throttled_time, 2),
+                }
+                for transfer in self.transfers.values()
+            ],
+        }
+
+
+bandwidth = BandwidthLimiter()
@@ -0,0 +1,187 @@
+"""
+Disk cache for album cover art.
+
+Every track of an album points at the same cover, so it is fetched once
+and then read from `backend/.cache/covers` by every tag writer and for
+every `cover.jpg`, whatever the target format. Tidal covers are stored
+under their cover id and size (`<cover-id>_640x640.jpg`); other URLs under
+a hash of the URL. Concurrent requests for a cover that is still being
+downloaded share that download. The oldest-used covers are evicted once
+the cache grows past COVER_CACHE_MAX_MB.
+"""
+
+import os
+import re
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from file_workers import file_workers
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+COVER_CACHE_ENABLED = os.getenv("COVER_CACHE", "true").lower() == "true"
+COVER_CACHE_MAX_BYTES = int(os.getenv("COVER_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+_TIDAL_COVER = re.compile(r"resources\.tidal\.com/images/(?P<id>[0-9a-fA-F/]+)/(?P<size>\d+x\d+)\.jpg$")
+
+
+def cover_key(url: str) -> str:
+    match = _TIDAL_COVER.search(url)
+    if match:
+        return f"{match.group('id').replace('/', '-').lower()}_{match.group('size')}"
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+class CoverCache:
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_bytes: int = COVER_CACHE_MAX_BYTES,
+        enabled: bool = COVER_CACHE_ENABLED
+    ):
+        self.cache_dir = cache_dir or Path(__file__).parent / ".cache" / "covers"
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.single_flight = SingleFlight()
+
+        # file name -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    async def get(self, url: str, fetch: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """The cover at `url`, calling `fetch` to download it on a miss"""
+        if not self.enabled:
+            return await fetch()
+
+        name = f"{cover_key(url)}.jpg"
+        data = await self._read(name)
+        if data is not None:
+            self._stats['hits'] += 1
+            return data
+
+        self._stats['misses'] += 1
+
+        async def fetch_and_store():
+            data = await fetch()
+            if data:
+                await self._write(name, data)
+            return data
+
+        return await self.single_flight.do(name, fetch_and_store)
+
+    def clear(self) -> int:
+        count = 0
+        for name in list(self._entries):
+            self._remove(name)
+            count += 1
+        return count
+
+    def stats(self) -> Dict:
+        lookups = self._stats['hits'] + self._stats['misses']
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+            'shared_downloads': self.single_flight.stats()['coalesced_requests'],
+            **self._stats
+        }
+
+    def _load_index(self):
+        files = []
+        for path in self.cache_dir.glob("*.jpg"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+        self._evict()
+
+    async def _read(self, name: str) -> Optional[bytes]:
+        # The index stays on the loop; only the file work goes to a worker
+        if name not in self._entries:
+            return None
+        try:
+            data = await file_workers.run(_read_file, self.cache_dir / name)
+        except OSError:
+            self._forget(name)
+            return None
+        if name in self._entries:
+            self._entries.move_to_end(name)
+        return data
+
+    async def _write(self, name: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        try:
+            await file_workers.run(_write_file, self.cache_dir / name, data)
+        except OSError as e:
+            logger.warning(f"Failed to cache cover art: {e}")
+            return
+        self._forget(name)
+        self._entries[name] = len(data)
+        self._bytes += len(data)
+        self._stats['stores'] += 1
+        evicted = self._evict_entries()
+        if evicted:
+            await file_workers.run(self._unlink, evicted)
+
+    def _evict(self):
+        self._unlink(self._evict_entries())
+
+    def _evict_entries(self) -> List[str]:
+        """Drop the least recently used entries from the index; returns their names"""
+        evicted = []
+        while self._bytes > self.max_bytes and self._entries:
+            name = next(iter(self._entries))
+            self._forget(name)
+            evicted.append(name)
+            self._stats['evictions'] += 1
+        return evicted
+
+    def _remove(self, name: str):
+        self._forget(name)
+        self._unlink([name])
+
+    def _unlink(self, names: List[str]):
+        for name in names:
+            try:
+                (self.cache_dir / name).unlink()
+            except OSError:
+                pass
+
+    def _forget(self, name: str):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+
+
+def _read_file(path: Path) -> bytes:
+    data = path.read_bytes()
+    # The mtime orders the index on the next start
+    os.utime(path)
+    return data
+
+
+def _write_file(path: Path, data: bytes):
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+cover_cache = CoverCache()
@@ -1,16 +1,26 @@
+import os
 import json
 import time
+import asyncio
 from pathlib import Path
 from typing import Dict, Optional
 from datetime import datetime, timedelta
 
+# Seconds progress-only changes may wait before the state file is rewritten
+DOWNLOAD_STATE_SAVE_INTERVAL = float(os.getenv("DOWNLOAD_STATE_SAVE_INTERVAL", "2"))
+
 class DownloadStateManager:
     
-    def __init__(self, state_file: Optional[Path] = None):
+    def __init__(self, state_file: Optional[Path] = None, save_interval: float = DOWNLOAD_STATE_SAVE_INTERVAL):
         if state_file is None:
             state_file = Path(__file__).parent / "download_state.json"
         
         self.state_file = state_file
+        self.save_interval = save_interval
+        self.saves = 0
+        self._dirty = False
+        self._last_save = 0.0
+        self._save_timer: Optional[asyncio.TimerHandle] = None
         self.state = self._load_state()
         self._cleanup_old_entries()
     
@@ -28,13 +38,46 @@ class DownloadStateManager:
         }
     
     def _save_state(self):
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.saves += 1
         try:
             self.state_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.state_file, 'w') as f:
+            tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+            with open(tmp, 'w') as f:
                 json.dump(self.state, f, indent=2)
+            os.replace(tmp, self.state_file)
         except Exception as e:
             print(f"Failed to save download state: {e}")
     
+    def _save_debounced(self):
+        """Save at most once per save_interval; the last change always lands"""
+        self._dirty = True
+        if self._save_timer is not None:
+            return
+        delay = self.save_interval - (time.monotonic() - self._last_save)
+        if delay <= 0:
+            self._save_state()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Without a loop to defer to, the next save or flush() picks it up
+            return
+        self._save_timer = loop.call_later(delay, self._on_save_timer)
+    
+    def _on_save_timer(self):
+        self._save_timer = None
+        self.flush()
+    
+    def flush(self):
+        """Write out any progress still waiting for the debounce timer"""
+        if self._dirty:
+            self._save_state()
+    
     def _cleanup_old_entries(self):
         current_time = time.time()
         max_age = 3600
@@ -89,7 +132,8 @@ class DownloadStateManager:
         if track_id_str in self.state["active"]:
             self.state["active"][track_id_str]["progress"] = progress
             self.state["active"][track_id_str]["timestamp"] = time.time()
-            self._save_state()
+            # Progress alone is not worth a rewrite per update; transitions save at once
+            self._save_debounced()
     
     def set_completed(self, track_id: int, filename: str, metadata: Optional[Dict] = None):
         track_id_str = str(track_id)
@@ -0,0 +1,213 @@
+"""
+Health tracking for hifi API endpoints.
+
+Each endpoint is tracked overall and per operation (search_tracks, get_track,
+...). Stats are exponentially weighted so recent behaviour dominates, and a
+circuit breaker takes an endpoint out of rotation after repeated failures,
+letting a single probe through once its cooldown has elapsed (half-open).
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional, Tuple
+
+
+EWMA_ALPHA = 0.3
+FAILURE_THRESHOLD = 3
+OPEN_COOLDOWN = 30.0
+MAX_OPEN_COOLDOWN = 600.0
+DEFAULT_LATENCY = 1.0
+LATENCY_WINDOW = 50
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Failure kinds that count towards tripping the circuit breaker. Empty
+# results are penalised in the score but a genuinely empty search must not
+# take an endpoint out of rotation, and 429s are handled by the per-endpoint
+# token bucket (see rate_limiter.py) honouring Retry-After.
+BREAKER_FAILURES = {"error", "timeout"}
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    if current is None:
+        return sample
+    return EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * current
+
+
+@dataclass
+class HealthStats:
+    """Rolling health of one endpoint, either overall or for one operation"""
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    rate_limited: int = 0
+    ewma_latency: Optional[float] = None
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    consecutive_failures: int = 0
+    state: str = CLOSED
+    opened_at: Optional[float] = None
+    cooldown: float = OPEN_COOLDOWN
+    probe_in_flight: bool = False
+    last_error: Optional[str] = None
+    last_used: Optional[float] = None
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def allows_request(self, now: float) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return now - self.opened_at >= self.cooldown
+        return not self.probe_in_flight
+
+    def begin(self, now: float):
+        self.last_used = now
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            self.probe_in_flight = True
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.successes += 1
+        self.ewma_latency = _ewma(self.ewma_latency, latency)
+        self.latencies.append(latency)
+        self.error_rate = _ewma(self.error_rate, 0.0)
+        self.rate_limit_rate = _ewma(self.rate_limit_rate, 0.0)
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.opened_at = None
+            self.cooldown = OPEN_COOLDOWN
+
+    def record_failure(self, kind: str, now: float, latency: Optional[float] = None, detail: Optional[str] = None):
+        self.requests += 1
+        self.failures += 1
+        self.last_error = detail or kind
+        self.probe_in_flight = False
+        if latency is not None:
+            self.ewma_latency = _ewma(self.ewma_latency, latency)
+        self.error_rate = _ewma(self.error_rate, 1.0)
+        if kind == "rate_limited":
+            self.rate_limited += 1
+            self.rate_limit_rate = _ewma(self.rate_limit_rate, 1.0)
+        else:
+            self.rate_limit_rate = _ewma(self.rate_limit_rate, 0.0)
+
+        if kind not in BREAKER_FAILURES:
+            return
+
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            # The probe failed: stay out of rotation for longer
+            self.state = OPEN
+            self.opened_at = now
+            self.cooldown = min(self.cooldown * 2, MAX_OPEN_COOLDOWN)
+        elif self.state == CLOSED and self.consecutive_failures >= FAILURE_THRESHOLD:
+            self.state = OPEN
+            self.opened_at = now
+
+    def release(self):
+        """Forget an in-flight probe that was cancelled (e.g. a hedging loser)"""
+        self.probe_in_flight = False
+
+    def score(self) -> float:
+        """Lower is better: expected latency inflated by recent error rates"""
+        latency = self.ewma_latency if self.ewma_latency is not None else DEFAULT_LATENCY
+        return latency * (1 + 4 * self.error_rate + 2 * self.rate_limit_rate)
+
+    def latency_p90(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            'state': self.state,
+            'score': round(self.score(), 4),
+            'requests': self.requests,
+            'successes': self.successes,
+            'failures': self.failures,
+            'rate_limited': self.rate_limited,
+            'ewma_latency': round(self.ewma_latency, 4) if self.ewma_latency is not None else None,
+            'p90_latency': round(self.latency_p90(), 4) if self.latencies else None,
+            'error_rate': round(self.error_rate, 4),
+            'rate_limit_rate': round(self.rate_limit_rate, 4),
+            'consecutive_failures': self.consecutive_failures,
+            'retry_in': round(max(0.0, self.opened_at + self.cooldown - now), 1) if self.state == OPEN else None,
+            'last_error': self.last_error,
+        }
+
+
+class EndpointHealthTracker:
+    """Health stats keyed by (endpoint name, operation); operation None is the endpoint overall"""
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, Optional[str]], HealthStats] = {}
+
+    def _get(self, name: str, operation: Optional[str] = None) -> HealthStats:
+        key = (name, operation)
+        if key not in self._stats:
+            self._stats[key] = HealthStats()
+        return self._stats[key]
+
+    def _levels(self, name: str, operation: Optional[str]):
+        levels = [self._get(name)]
+        if operation:
+            levels.append(self._get(name, operation))
+        return levels
+
+    def is_available(self, name: str, operation: Optional[str] = None) -> bool:
+        now = time.time()
+        return all(stats.allows_request(now) for stats in self._levels(name, operation))
+
+    def begin(self, name: str, operation: Optional[str] = None):
+        now = time.time()
+        for stats in self._levels(name, operation):
+            stats.begin(now)
+
+    def record_success(self, name: str, operation: Optional[str], latency: float):
+        for stats in self._levels(name, operation):
+            stats.record_success(latency)
+
+    def record_failure(self, name: str, operation: Optional[str], kind: str, latency: Optional[float] = None, detail: Optional[str] = None):
+        now = time.time()
+        for stats in self._levels(name, operation):
+            stats.record_failure(kind, now, latency, detail)
+
+    def release(self, name: str, operation: Optional[str] = None):
+        for stats in self._levels(name, operation):
+            stats.release()
+
+    def _best_stats(self, name: str, operation: Optional[str]) -> HealthStats:
+        # Prefer what we know about this operation, fall back to the endpoint overall
+        if operation:
+            op_stats = self._stats.get((name, operation))
+            if op_stats and op_stats.requests:
+                return op_stats
+        return self._get(name)
+
+    def score(self, name: str, operation: Optional[str] = None) -> float:
+        return self._best_stats(name, operation).score()
+
+    def latency_p90(self, name: str, operation: Optional[str] = None) -> Optional[float]:
+        return self._best_stats(name, operation).latency_p90()
+
+    def latency_samples(self, name: str, operation: Optional[str] = None) -> int:
+        return len(self._best_stats(name, operation).latencies)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        now = time.time()
+        result: Dict[str, Dict] = {}
+        for (name, operation), stats in sorted(self._stats.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+            entry = result.setdefault(name, {'overall': None, 'operations': {}})
+            if operation is None:
+                entry['overall'] = stats.to_dict(now)
+            else:
+                entry['operations'][operation] = stats.to_dict(now)
+        return result
@@ -0,0 +1,184 @@
+"""
+Local store of Tidal tracks, albums and artists.
+
+Search, album, artist and playlist responses already carry full track and
+album objects. Every response the Tidal client receives is harvested into a
+small SQLite database keyed by entity id, so metadata lookups become local
+reads instead of another round trip. Objects seen in several places (e.g. the
+abbreviated album embedded in a track and the full album response) are
+merged, newer values winning.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+ENTITY_STORE_ENABLED = os.getenv("TIDAL_ENTITY_STORE", "true").lower() == "true"
+
+TRACK = "tracks"
+ALBUM = "albums"
+ARTIST = "artists"
+KINDS = (TRACK, ALBUM, ARTIST)
+
+# Nested listings are stored as entities of their own, not inside their parent
+NESTED_KEYS = ('items', 'tracks', 'albums')
+
+
+def _valid_id(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _classify(obj: Dict, parent_key: Optional[str]) -> Optional[str]:
+    if not _valid_id(obj.get('id')):
+        return None
+    if 'trackNumber' in obj and 'title' in obj:
+        return TRACK
+    if 'title' in obj and ('numberOfTracks' in obj or parent_key in ('album', 'albums')):
+        return ALBUM
+    if 'name' in obj and parent_key in ('artist', 'artists'):
+        return ARTIST
+    return None
+
+
+def iter_entities(data: Any, parent_key: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+    """Yield (kind, object) for every track, album and artist nested in a response"""
+    if isinstance(data, list):
+        for entry in data:
+            yield from iter_entities(entry, parent_key)
+    elif isinstance(data, dict):
+        kind = _classify(data, parent_key)
+        if kind:
+            yield kind, data
+        for key, value in data.items():
+            if isinstance(value, (dict, list)):
+                yield from iter_entities(value, key)
+
+
+class EntityStore:
+
+    def __init__(self, db_path: Path, enabled: bool = ENTITY_STORE_ENABLED):
+        self.db_path = db_path
+        self.enabled = enabled
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'harvested': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily so merely importing the client never creates the file
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for kind in KINDS:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {kind} "
+                    "(id INTEGER PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+                )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def harvest(self, data: Any) -> int:
+        """Store every entity found in a response; returns how many were written"""
+        if not self.enabled or not data:
+            return 0
+
+        found: Dict[str, Dict[int, Dict]] = {kind: {} for kind in KINDS}
+        for kind, obj in iter_entities(data):
+            merged = found[kind].setdefault(obj['id'], {})
+            merged.update((key, value) for key, value in obj.items() if key not in NESTED_KEYS)
+        if not any(found.values()):
+            return 0
+
+        now = time.time()
+        written = 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    for kind, objects in found.items():
+                        if not objects:
+                            continue
+                        ids = list(objects)
+                        existing = self._read_many(conn, kind, ids)
+                        rows = []
+                        for entity_id, obj in objects.items():
+                            merged = existing.get(entity_id, {})
+                            merged.update(obj)
+                            rows.append((entity_id, json.dumps(merged, separators=(',', ':')), now))
+                        conn.executemany(
+                            f"INSERT OR REPLACE INTO {kind} (id, data, updated_at) VALUES (?, ?, ?)", rows
+                        )
+                        written += len(rows)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Failed to store harvested entities: {e}")
+            return 0
+
+        self._stats['harvested'] += written
+        return written
+
+    @staticmethod
+    def _read_many(conn: sqlite3.Connection, kind: str, ids: List[int]) -> Dict[int, Dict]:
+        result = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for entity_id, payload in conn.execute(
+                f"SELECT id, data FROM {kind} WHERE id IN ({placeholders})", chunk
+            ):
+                result[entity_id] = json.loads(payload)
+        return result
+
+    def get(self, kind: str, entity_id: int) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        try:
+            entity_id = int(entity_id)
+            with self._lock:
+                row = self._connect().execute(f"SELECT data FROM {kind} WHERE id = ?", (entity_id,)).fetchone()
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Entity store lookup failed: {e}")
+            row = None
+
+        if row is None:
+            self._stats['misses'] += 1
+            return None
+        self._stats['hits'] += 1
+        return json.loads(row[0])
+
+    def get_track(self, track_id: int) -> Optional[Dict]:
+        return self.get(TRACK, track_id)
+
+    def get_album(self, album_id: int) -> Optional[Dict]:
+        return self.get(ALBUM, album_id)
+
+    def get_artist(self, artist_id: int) -> Optional[Dict]:
+        return self.get(ARTIST, artist_id)
+
+    def stats(self) -> Dict:
+        counts = {}
+        if self.enabled and self.db_path.exists():
+            try:
+                with self._lock:
+                    conn = self._connect()
+                    for kind in KINDS:
+                        counts[kind] = conn.execute(f"SELECT COUNT(*) FROM {kind}").fetchone()[0]
+            except sqlite3.Error as e:
+                logger.warning(f"Entity store stats failed: {e}")
+        return {'enabled': self.enabled, **counts, **self._stats}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,99 @@
+"""
+Bounded thread pool for blocking file work.
+
+Tag writing (mutagen loads and rewrites whole files), moving finished
+tracks into the library (a copy when it crosses devices), library scans
+and other filesystem-heavy calls would otherwise run on the event loop
+and stall every API request while a batch of tracks finalises. They go
+through one shared executor of FILE_WORKERS threads instead:
+
+    final_path = await file_workers.run(shutil.move, src, dst)
+
+Work beyond the pool size waits its turn. `stats()` reports how long jobs
+queued for a thread and how long they ran, so a pool that is too small
+shows up as queue wait rather than as slow API responses.
+"""
+
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+FILE_WORKERS = max(1, int(os.getenv("FILE_WORKERS", str(min(8, (os.cpu_count() or 2) + 2)))))
+
+
+class FileWorkerPool:
+
+    def __init__(self, workers: int = FILE_WORKERS):
+        self.workers = max(1, workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = 0.0
+        self.busy_time = 0.0
+        self.max_wait = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="file-worker")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run `fn(*args, **kwargs)` on a worker thread and await its result.
+        Cancelling the caller doesn't stop a job that has already started.
+        """
+        submitted = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+
+        def call():
+            started = time.perf_counter()
+            wait = started - submitted
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.wait_time += wait
+                self.max_wait = max(self.max_wait, wait)
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.busy_time += time.perf_counter() - started
+                    if failed:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), call)
+
+    def shutdown(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        done = self.completed + self.failed
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'queued': self.queued,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait_seconds': round(self.wait_time / done, 4) if done else 0.0,
+            'max_wait_seconds': round(self.max_wait, 4),
+            'avg_busy_seconds': round(self.busy_time / done, 4) if done else 0.0,
+        }
+
+
+file_workers = FileWorkerPool()
@@ -0,0 +1,154 @@
+"""
+Process-wide pooled aiohttp sessions for outbound HTTP.
+
+Downloads, cover art and MusicBrainz lookups used to open a fresh
+ClientSession per call, paying a new TCP+TLS handshake every time. Here
+each kind of traffic gets one long-lived session per pool ("cdn",
+"resources", "musicbrainz", "default") with its own connection limits,
+DNS cache and keep-alive, so consecutive requests to the same host reuse
+connections. The FastAPI lifespan opens the pools and closes them on
+shutdown; code running outside the app (tests, the stub benchmark) gets
+them created lazily on first use.
+
+A trace config counts, per pool and per host, requests that reused a
+pooled connection (hits) against those that had to open one (misses).
+"""
+
+import os
+import asyncio
+import logging
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "16"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+# Connector and session options per pool; anything missing comes from the defaults above
+POOLS: Dict[str, Dict] = {
+    # Audio files: long transfers, so no total timeout, only connect/read bounds
+    "cdn": {
+        "timeout": aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120),
+    },
+    # Cover art from resources.tidal.com and similar image hosts
+    "resources": {
+        "timeout": aiohttp.ClientTimeout(total=30, connect=10),
+    },
+    # MusicBrainz allows one request per second, so a couple of connections is plenty
+    "musicbrainz": {
+        "limit_per_host": 2,
+        "timeout": aiohttp.ClientTimeout(total=15),
+    },
+    "default": {
+        "timeout": aiohttp.ClientTimeout(total=60),
+    },
+}
+
+
+class SessionRegistry:
+
+    def __init__(self, pools: Optional[Dict[str, Dict]] = None):
+        self.pools = pools or POOLS
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        self._stats: Dict[str, Dict] = {}
+
+    def session(self, pool: str = "default") -> aiohttp.ClientSession:
+        """
+        The shared session for `pool`. Sessions are bound to the loop they were
+        created on, so a different running loop (a test client, a sync shim)
+        gets its own. Callers must not close it.
+        """
+        if pool not in self.pools:
+            pool = "default"
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(pool)
+        if session is None or session.closed or self._loops.get(pool) is not loop:
+            session = self._create(pool)
+            self._sessions[pool] = session
+            self._loops[pool] = loop
+        return session
+
+    async def start(self):
+        """Open every pool on the running loop (called from the app lifespan)"""
+        for pool in self.pools:
+            self.session(pool)
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, {}
+        self._loops = {}
+        for session in sessions.values():
+            if not session.closed:
+                try:
+                    await session.close()
+                except Exception as e:
+                    logger.warning(f"Failed to close HTTP session: {e}")
+
+    def _create(self, pool: str) -> aiohttp.ClientSession:
+        options = self.pools[pool]
+        connector = aiohttp.TCPConnector(
+            limit=options.get("limit", HTTP_POOL_LIMIT),
+            limit_per_host=options.get("limit_per_host", HTTP_POOL_LIMIT_PER_HOST),
+            ttl_dns_cache=options.get("ttl_dns_cache", HTTP_DNS_CACHE_TTL),
+            keepalive_timeout=options.get("keepalive_timeout", HTTP_KEEPALIVE_TIMEOUT),
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers=options.get("headers"),
+            timeout=options.get("timeout", aiohttp.ClientTimeout(total=60)),
+            trace_configs=[self._trace_config(pool)],
+        )
+
+    def _trace_config(self, pool: str) -> aiohttp.TraceConfig:
+        stats = self._stats.setdefault(pool, {"sessions": 0, "requests": 0, "hits": 0, "misses": 0, "hosts": {}})
+        stats["sessions"] += 1
+
+        def host_stats(host: Optional[str]) -> Dict:
+            host = host or "unknown"
+            if host not in stats["hosts"]:
+                stats["hosts"][host] = {"requests": 0, "hits": 0, "misses": 0}
+            return stats["hosts"][host]
+
+        async def on_request_start(session, ctx, params):
+            ctx.host = params.url.host
+            stats["requests"] += 1
+            host_stats(ctx.host)["requests"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            stats["hits"] += 1
+            host_stats(getattr(ctx, "host", None))["hits"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            stats["misses"] += 1
+            host_stats(getattr(ctx, "host", None))["misses"] += 1
+
+        trace = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        return trace
+
+    def stats(self) -> Dict:
+        result = {}
+        for pool, stats in self._stats.items():
+            connections = stats["hits"] + stats["misses"]
+            session = self._sessions.get(pool)
+            result[pool] = {
+                "open": bool(session and not session.closed),
+                "sessions_created": stats["sessions"],
+                "requests": stats["requests"],
+                "connection_hits": stats["hits"],
+                "connection_misses": stats["misses"],
+                "reuse_ratio": round(stats["hits"] / connections, 4) if connections else 0.0,
+                "hosts": {host: dict(counts) for host, counts in stats["hosts"].items()},
+            }
+        return result
+
+
+http_sessions = SessionRegistry()
@@ -0,0 +1,159 @@
+"""
+Stage-pipelined download processing.
+
+A track goes through resolve -> fetch -> transcode -> enrich -> tag ->
+organize. Each stage has its own bounded pool of slots, so a track only
+holds a network slot while it is actually downloading: while one track
+waits on MusicBrainz's one-request-per-second limit, the next can already
+be fetching. The queue admits more tracks than there are fetch slots
+(PIPELINE_MAX_IN_FLIGHT in queue_manager) to keep the stages fed.
+
+The transcode stage is the FFmpeg pool in transcode_workers
+(TRANSCODE_WORKERS), which every FFmpeg job already goes through; its
+stats are reported here alongside the others.
+
+Slots are handed out first come, first served, and a stage's concurrency
+can be changed at runtime. Per stage, `stats()` reports how many tracks are
+running, how many are queued for a slot, and time spent waiting versus working.
+
+    async with pipeline.stage("fetch"):
+        ...
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from queue_manager import MAX_CONCURRENT_DOWNLOADS
+
+
+STAGES = ("resolve", "fetch", "enrich", "tag", "organize")
+
+DEFAULT_CONCURRENCY = {
+    "resolve": 8,
+    "fetch": MAX_CONCURRENT_DOWNLOADS,
+    "enrich": 4,
+    "tag": 4,
+    "organize": 2,
+}
+
+
+def _configured_concurrency(stage: str) -> int:
+    value = os.getenv(f"PIPELINE_{stage.upper()}_CONCURRENCY")
+    try:
+        return max(1, int(value)) if value else DEFAULT_CONCURRENCY[stage]
+    except ValueError:
+        return DEFAULT_CONCURRENCY[stage]
+
+
+class Stage:
+    """A FIFO pool of `concurrency` slots"""
+
+    def __init__(self, name: str, concurrency: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = 0.0
+        self.busy_time = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def set_concurrency(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self._wake()
+
+    async def acquire(self) -> float:
+        """Wait for a slot; returns when it was granted (for release)"""
+        started = time.perf_counter()
+        if self.running < self.concurrency and not self._waiters:
+            self.running += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted a slot just as we were cancelled: hand it on
+                    self.release()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        granted = time.perf_counter()
+        self.wait_time += granted - started
+        return granted
+
+    def release(self, granted: Optional[float] = None, failed: bool = False):
+        self.running -= 1
+        if granted is not None:
+            self.busy_time += time.perf_counter() - granted
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.running < self.concurrency:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.running += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict:
+        done = self.completed + self.failed
+        return {
+            'concurrency': self.concurrency,
+            'running': self.running,
+            'queued': self.queued,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait_seconds': round(self.wait_time / done, 3) if done else 0.0,
+            'avg_busy_seconds': round(self.busy_time / done, 3) if done else 0.0,
+        }
+
+
+class _Slot:
+    """One use of a stage: `async with pipeline.stage(name):`"""
+
+    def __init__(self, stage: Stage):
+        self.stage = stage
+        self.granted: Optional[float] = None
+
+    async def __aenter__(self):
+        self.granted = await self.stage.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.stage.release(self.granted, failed=exc_type is not None)
+        return False
+
+
+class Pipeline:
+
+    def __init__(self, concurrency: Optional[Dict[str, int]] = None):
+        concurrency = concurrency or {}
+        self.stages: Dict[str, Stage] = {
+            name: Stage(name, concurrency.get(name) or _configured_concurrency(name))
+            for name in STAGES
+        }
+
+    def stage(self, name: str) -> _Slot:
+        return _Slot(self.stages[name])
+
+    def stats(self) -> Dict:
+        from transcode_workers import transcode_workers
+
+        stats = {name: stage.stats() for name, stage in self.stages.items()}
+        stats['transcode'] = transcode_workers.stage.stats()
+        return stats
+
+
+pipeline = Pipeline()
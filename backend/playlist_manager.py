@@ -2,7 +2,7 @@
 import json
 import logging
 import asyncio
-import aiohttp
+from http_sessions import http_sessions
 from pathlib import Path
 from typing import List, Dict, Optional, Any
 from datetime import datetime
@@ -174,7 +174,7 @@ class PlaylistManager:
 
     async def _fetch_tidal_items(self, playlist: MonitoredPlaylist) -> List[Dict]:
         try:
-            result = tidal_client.get_playlist_tracks(playlist.uuid)
+            result = await tidal_client.get_playlist_tracks(playlist.uuid)
         except Exception as e:
             logger.error(f"Failed to fetch tracks for playlist {playlist.uuid}: {e}")
             return []
@@ -559,7 +559,7 @@ class PlaylistManager:
             logger.info(f"Downloading cover for playlist {playlist.name}...")
             
             try:
-                pl_info = tidal_client.get_playlist(playlist.uuid)
+                pl_info = await tidal_client.get_playlist(playlist.uuid)
                 if not pl_info:
                     logger.warning(f"No playlist info returned for {playlist.name}")
                     return
@@ -590,16 +590,16 @@ class PlaylistManager:
 
         if image_url:
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(image_url) as resp:
-                        if resp.status == 200:
-                            async with aiofiles.open(cover_path, 'wb') as f:
-                                await f.write(await resp.read())
-                            logger.info(f"Cover saved: {cover_path}")
+                session = http_sessions.session("resources")
+                async with session.get(image_url) as resp:
+                    if resp.status == 200:
+                        async with aiofiles.open(cover_path, 'wb') as f:
+                            await f.write(await resp.read())
+                        logger.info(f"Cover saved: {cover_path}")
                             
-                            # Sync deferred to main process
-                        else:
-                            logger.warning(f"Failed cover download: {resp.status} from {image_url}")
+                        # Sync deferred to main process
+                    else:
+                        logger.warning(f"Failed cover download: {resp.status} from {image_url}")
             except Exception as e:
                  logger.error(f"Error downloading cover: {e}")
 
@@ -0,0 +1,120 @@
+"""
+Coalesced download progress.
+
+Transfers report progress for every chunk they write, far more often than
+anything needs to hear about it. `report` only records the latest value per
+track; subscribers get the accumulated changes at most every
+PROGRESS_PUBLISH_INTERVAL seconds as one batch, so a chunk costs a dict
+assignment instead of a state-file rewrite. `flush` publishes straight away
+(state transitions should not wait for the timer) and `discard` drops
+anything still pending for a track that has finished.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+PROGRESS_PUBLISH_INTERVAL = float(os.getenv("PROGRESS_PUBLISH_INTERVAL", "0.25"))
+
+Subscriber = Callable[[Dict[int, Dict]], None]
+
+
+class ProgressBus:
+
+    def __init__(self, interval: float = PROGRESS_PUBLISH_INTERVAL):
+        self.interval = interval
+        self._latest: Dict[int, Dict] = {}
+        self._pending: Dict[int, Dict] = {}
+        self._subscribers: List[Subscriber] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._reported = 0
+        self._published = 0
+        self._batches = 0
+
+    def subscribe(self, callback: Subscriber):
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Subscriber):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def report(self, track_id: int, progress: int, status: str = 'downloading', downloaded: int = 0, total: int = 0):
+        """Record the latest progress of a track; cheap enough to call per chunk"""
+        self._reported += 1
+        event = self._latest.get(track_id)
+        if event is None:
+            event = {'track_id': track_id}
+            self._latest[track_id] = event
+        elif event.get('progress') == progress and event.get('status') == status:
+            # Byte counts still move, but nobody needs a new batch for them
+            event['downloaded'] = downloaded
+            event['total'] = total
+            return
+        event.update(progress=progress, status=status, downloaded=downloaded, total=total, updated_at=time.time())
+        self._pending[track_id] = event
+        self._schedule()
+
+    def get(self, track_id: int) -> Optional[Dict]:
+        event = self._latest.get(track_id)
+        return dict(event) if event else None
+
+    def flush(self, track_id: Optional[int] = None):
+        """Publish pending progress now, for one track or all of them"""
+        if track_id is None:
+            batch, self._pending = self._pending, {}
+        else:
+            event = self._pending.pop(track_id, None)
+            batch = {track_id: event} if event else {}
+        self._publish(batch)
+
+    def discard(self, track_id: int):
+        """Forget a track so a late batch can't resurrect a finished download"""
+        self._pending.pop(track_id, None)
+        self._latest.pop(track_id, None)
+
+    def _schedule(self):
+        if self._timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (e.g. a synchronous caller): nothing to coalesce against
+            self.flush()
+            return
+        self._timer = loop.call_later(self.interval, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self.flush()
+
+    def _publish(self, batch: Dict[int, Dict]):
+        if not batch:
+            return
+        self._batches += 1
+        self._published += len(batch)
+        snapshot = {track_id: dict(event) for track_id, event in batch.items()}
+        for callback in list(self._subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logger.warning(f"Progress subscriber {callback!r} failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            'tracked': len(self._latest),
+            'pending': len(self._pending),
+            'subscribers': len(self._subscribers),
+            'reports': self._reported,
+            'published_events': self._published,
+            'batches': self._batches,
+            'interval': self.interval,
+        }
+
+
+progress_bus = ProgressBus()
@@ -9,7 +9,7 @@ import os
 import json
 import asyncio
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Set
 from dataclasses import dataclass, asdict
 from datetime import datetime
 from threading import Lock
@@ -19,6 +19,9 @@ from api.utils.logging import log_info, log_error, log_warning, log_step
 
 
 MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "3"))
+# Tracks taken off the queue at once. Only MAX_CONCURRENT_DOWNLOADS of them
+# download at a time (the pipeline's fetch stage); the rest resolve, tag or organize.
+PIPELINE_MAX_IN_FLIGHT = max(MAX_CONCURRENT_DOWNLOADS, int(os.getenv("PIPELINE_MAX_IN_FLIGHT", str(MAX_CONCURRENT_DOWNLOADS * 3))))
 QUEUE_AUTO_PROCESS = os.getenv("QUEUE_AUTO_PROCESS", "true").lower() == "true"
 
 
@@ -110,10 +113,14 @@ class QueueManager:
                 with open(STATE_FILE, 'r') as f:
                     data = json.load(f)
                 
-                # Restore queue
-                self._queue = [QueueItem(**item) for item in data.get('queue', [])]
+                # Restore queue. Downloads that were active when we stopped go
+                # first; their .part files let them resume where they left off.
+                interrupted = [QueueItem(**item) for item in data.get('active', [])]
+                self._queue = interrupted + [QueueItem(**item) for item in data.get('queue', [])]
+                if interrupted:
+                    log_info(f"Re-queued {len(interrupted)} interrupted downloads")
                 
-                # Restore completed/failed (active downloads are reset on restart)
+                # Restore completed/failed
                 self._completed = data.get('completed', [])[-100:]  # Keep last 100
                 self._failed = data.get('failed', [])
                 
@@ -126,6 +133,7 @@ class QueueManager:
         try:
             data = {
                 'queue': [asdict(item) for item in self._queue],
+                'active': [asdict(entry['item']) for entry in self._active.values() if entry.get('item')],
                 'completed': self._completed[-100:],  # Keep last 100
                 'failed': self._failed
             }
@@ -134,8 +142,18 @@ class QueueManager:
         except Exception as e:
             log_error(f"Failed to save queue state: {e}")
     
+    def resumable_track_ids(self) -> Set[int]:
+        """Tracks that may still be downloaded (queued, active or failed and retryable)"""
+        return (
+            {item.track_id for item in self._queue}
+            | set(self._active)
+            | {entry['track_id'] for entry in self._failed if 'track_id' in entry}
+        )
+    
     def get_state(self) -> Dict[str, Any]:
         """Get current queue state for API response"""
+        from pipeline import pipeline
+        
         return {
             'queue': [asdict(item) for item in self._queue],
             'active': [
@@ -151,9 +169,11 @@ class QueueManager:
             'failed': self._failed,
             'settings': {
                 'max_concurrent': MAX_CONCURRENT_DOWNLOADS,
+                'max_in_flight': PIPELINE_MAX_IN_FLIGHT,
                 'auto_process': QUEUE_AUTO_PROCESS,
                 'is_processing': self._processing
-            }
+            },
+            'pipeline': pipeline.stats()
         }
     
     async def add_to_queue(self, item: QueueItem) -> bool:
@@ -344,9 +364,9 @@ class QueueManager:
         
         try:
             while self._processing and (self._queue or self._active):
-                # Fill up to max concurrent
+                # Fill the pipeline; its fetch stage caps concurrent downloads
                 async with self._queue_lock:
-                    while len(self._active) < MAX_CONCURRENT_DOWNLOADS and self._queue:
+                    while len(self._active) < PIPELINE_MAX_IN_FLIGHT and self._queue:
                         item = self._queue.pop(0)
                         self._active[item.track_id] = {
                             'progress': 0,
@@ -357,6 +377,9 @@ class QueueManager:
                         
                         # Start download task
                         asyncio.create_task(self._process_item(item))
+                    
+                    # Resolve playback info for what's queued next in one batch
+                    self._schedule_prefetch()
                 
                 # Wait a bit before checking again
                 await asyncio.sleep(1)
@@ -371,6 +394,12 @@ class QueueManager:
         self._processing = False
         log_info("Queue processing stop requested")
     
+    def _schedule_prefetch(self):
+        """Kick off bulk resolution of stream URLs for upcoming queue items"""
+        from api.services.playback import schedule_prefetch
+        
+        schedule_prefetch([(item.track_id, (item.quality or "LOSSLESS").upper()) for item in self._queue])
+    
     async def _process_item(self, item: QueueItem):
         """Process a single queue item - actual download logic"""
 
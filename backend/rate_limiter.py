@@ -0,0 +1,166 @@
+"""
+Per-endpoint token-bucket rate limiting for hifi API instances.
+
+Every endpoint gets a bucket shared by all callers of the Tidal client. The
+refill rate adapts AIMD-style: a 429 halves it and blocks the bucket for the
+server's Retry-After, and each success nudges it back up towards the
+configured ceiling. Callers wait asynchronously for a token, so throttling
+never blocks the event loop.
+
+Defaults come from TIDAL_RATE_LIMIT / TIDAL_RATE_BURST; individual instances
+can be tuned with TIDAL_RATE_LIMITS, a JSON object keyed by endpoint name,
+e.g. {"triton": {"rate": 2, "burst": 4}}.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RATE = float(os.getenv("TIDAL_RATE_LIMIT", "5"))
+DEFAULT_BURST = float(os.getenv("TIDAL_RATE_BURST", "10"))
+MIN_RATE = 0.2
+RATE_INCREASE = 0.1
+DEFAULT_RETRY_AFTER = 2.0
+MAX_RETRY_AFTER = 300.0
+
+
+def _load_overrides() -> Dict[str, Dict]:
+    raw = os.getenv("TIDAL_RATE_LIMITS")
+    if not raw:
+        return {}
+    try:
+        overrides = json.loads(raw)
+        return overrides if isinstance(overrides, dict) else {}
+    except ValueError:
+        logger.warning("Ignoring TIDAL_RATE_LIMITS: not valid JSON")
+        return {}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, burst: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.rate_limited = 0
+        self.waits = 0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """Seconds until a token is available, without taking it"""
+        now = time.monotonic() if now is None else now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self, now: Optional[float] = None) -> float:
+        """Take a token and return 0, or return how long to wait for one"""
+        now = time.monotonic() if now is None else now
+        wait = self.wait_time(now)
+        if wait == 0:
+            self.tokens -= 1
+        return wait
+
+    def penalize(self, retry_after: Optional[float]):
+        now = time.monotonic()
+        self.rate_limited += 1
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self.tokens = 0
+        delay = min(retry_after if retry_after is not None else DEFAULT_RETRY_AFTER, MAX_RETRY_AFTER)
+        self.blocked_until = max(self.blocked_until, now + delay)
+        self.updated = max(self.updated, self.blocked_until)
+
+    def reward(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+    def to_dict(self) -> Dict:
+        now = time.monotonic()
+        return {
+            'rate': round(self.rate, 3),
+            'max_rate': self.max_rate,
+            'burst': self.burst,
+            'tokens': round(min(self.burst, self.tokens), 2),
+            'blocked_for': round(max(0.0, self.blocked_until - now), 2),
+            'rate_limited': self.rate_limited,
+            'waits': self.waits,
+        }
+
+
+class EndpointRateLimiter:
+
+    def __init__(self, default_rate: float = DEFAULT_RATE, default_burst: float = DEFAULT_BURST, overrides: Optional[Dict[str, Dict]] = None):
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self.overrides = _load_overrides() if overrides is None else overrides
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, name: str) -> TokenBucket:
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            config = self.overrides.get(name, {})
+            bucket = TokenBucket(
+                float(config.get('rate', self.default_rate)),
+                float(config.get('burst', self.default_burst))
+            )
+            self._buckets[name] = bucket
+        return bucket
+
+    def wait_time(self, name: str) -> float:
+        return self.bucket(name).wait_time()
+
+    async def acquire(self, name: str, max_wait: float) -> bool:
+        """Wait for a token; give up if the wait would exceed max_wait"""
+        bucket = self.bucket(name)
+        waited = 0.0
+        while True:
+            wait = bucket.try_acquire()
+            if wait == 0:
+                return True
+            if waited + wait > max_wait:
+                return False
+            bucket.waits += 1
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def record_rate_limited(self, name: str, retry_after: Optional[float] = None):
+        bucket = self.bucket(name)
+        bucket.penalize(retry_after)
+        logger.info(f"Rate limit for {name} lowered to {bucket.rate:.2f} req/s, blocked for {max(0.0, bucket.blocked_until - time.monotonic()):.1f}s")
+
+    def record_success(self, name: str):
+        self.bucket(name).reward()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: bucket.to_dict() for name, bucket in sorted(self._buckets.items())}
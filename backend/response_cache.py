@@ -0,0 +1,272 @@
+"""
+TTL + LRU cache for Tidal catalogue responses.
+
+Entries are keyed on request path and params and stored as serialized JSON,
+so callers always get a fresh copy they are free to mutate and the memory
+bound is measured in bytes. An optional disk tier keeps entries across
+restarts; lookups and stores do its file work on the file workers. Only
+operations with a TTL are cached; stream URL lookups (get_track) return
+signed, short-lived URLs and are never cached.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from file_workers import file_workers
+
+logger = logging.getLogger(__name__)
+
+
+OPERATION_TTLS = {
+    "search_tracks": 600,
+    "search_albums": 600,
+    "search_artists": 600,
+    "search_playlists": 600,
+    "get_album": 86400,
+    "get_album_tracks": 86400,
+    "get_artist": 21600,
+    "get_artist_albums": 21600,
+    "get_playlist": 300,
+    "get_playlist_tracks": 300,
+}
+
+RESPONSE_CACHE_ENABLED = os.getenv("TIDAL_RESPONSE_CACHE", "true").lower() == "true"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("TIDAL_RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024
+RESPONSE_CACHE_DISK = os.getenv("TIDAL_RESPONSE_CACHE_DISK", "false").lower() == "true"
+RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.getenv("TIDAL_RESPONSE_CACHE_DISK_MAX_ENTRIES", "5000"))
+# Minimum seconds between the prunes that stores trigger once the disk tier is over its limit
+DISK_PRUNE_INTERVAL = 60
+
+
+def make_cache_key(path: str, params: Optional[Dict] = None) -> str:
+    if not params:
+        return path
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{path}?{query}"
+
+
+class ResponseCache:
+
+    def __init__(
+        self,
+        disk_dir: Optional[Path] = None,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        use_disk: bool = RESPONSE_CACHE_DISK,
+        disk_max_entries: int = RESPONSE_CACHE_DISK_MAX_ENTRIES,
+        ttls: Optional[Dict[str, int]] = None,
+        disk_prune_interval: float = DISK_PRUNE_INTERVAL
+    ):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.ttls = dict(OPERATION_TTLS if ttls is None else ttls)
+        self.disk_dir = disk_dir if use_disk else None
+        self.disk_max_entries = disk_max_entries
+        self.disk_prune_interval = disk_prune_interval
+
+        # Files in the disk tier: counted by prune_disk, then raised by every store
+        self._disk_entries = 0
+        self._last_prune = float('-inf')
+        self._prune_task: Optional[asyncio.Task] = None
+
+        # key -> (expires_at, serialized payload)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'expired': 0}
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def is_cacheable(self, operation: Optional[str]) -> bool:
+        return self.enabled and bool(operation) and self.ttls.get(operation, 0) > 0
+
+    async def get(self, operation: str, path: str, params: Optional[Dict] = None):
+        if not self.is_cacheable(operation):
+            return None
+
+        key = make_cache_key(path, params)
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return json.loads(payload)
+            self._drop(key)
+            self._stats['expired'] += 1
+
+        entry = await file_workers.run(self._read_disk, key, now) if self.disk_dir is not None else None
+        if entry is not None:
+            expires_at, payload = entry
+            self._store_memory(key, expires_at, payload)
+            self._stats['disk_hits'] += 1
+            return json.loads(payload)
+
+        self._stats['misses'] += 1
+        return None
+
+    async def set(self, operation: str, path: str, params: Optional[Dict], data) -> None:
+        if not self.is_cacheable(operation) or data is None:
+            return
+
+        key = make_cache_key(path, params)
+        try:
+            payload = json.dumps(data, separators=(',', ':'))
+        except (TypeError, ValueError):
+            return
+
+        expires_at = time.time() + self.ttls[operation]
+        self._store_memory(key, expires_at, payload)
+        self._stats['stores'] += 1
+        if self.disk_dir is not None:
+            await file_workers.run(self._write_disk, key, operation, expires_at, payload)
+            # Overwrites count too; the prune recounts
+            self._disk_entries += 1
+            self._schedule_prune()
+
+    async def invalidate(self, path: str, params: Optional[Dict] = None) -> None:
+        key = make_cache_key(path, params)
+        self._drop(key)
+        disk_path = self._disk_path(key)
+        if disk_path is not None:
+            await file_workers.run(_unlink, disk_path)
+
+    async def clear(self) -> int:
+        count = len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        if self.disk_dir is not None:
+            count += await file_workers.run(self._clear_disk)
+            self._disk_entries = 0
+        return count
+
+    def stats(self) -> Dict:
+        lookups = self._stats['hits'] + self._stats['disk_hits'] + self._stats['misses']
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'disk': self.disk_dir is not None,
+            'disk_entries': self._disk_entries,
+            'hit_rate': round((self._stats['hits'] + self._stats['disk_hits']) / lookups, 4) if lookups else 0.0,
+            **self._stats
+        }
+
+    def _schedule_prune(self):
+        """Prune the disk tier in the background once it is over its limit, at most once per interval"""
+        if self._disk_entries <= self.disk_max_entries:
+            return
+        if self._prune_task is not None and not self._prune_task.done():
+            return
+        now = time.monotonic()
+        if now - self._last_prune < self.disk_prune_interval:
+            return
+        self._last_prune = now
+        self._prune_task = asyncio.create_task(file_workers.run(self.prune_disk))
+
+    def _store_memory(self, key: str, expires_at: float, payload: str):
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (expires_at, payload)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            evicted_key = next(iter(self._entries))
+            self._drop(evicted_key)
+            self._stats['evictions'] += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if self.disk_dir is None:
+            return None
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.disk_dir / f"{digest}.json"
+
+    def _clear_disk(self) -> int:
+        return sum(_unlink(path) for path in self.disk_dir.glob("*.json"))
+
+    def _read_disk(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        disk_path = self._disk_path(key)
+        if disk_path is None or not disk_path.exists():
+            return None
+        try:
+            with open(disk_path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+            if record.get('key') != key or record.get('expires_at', 0) <= now:
+                disk_path.unlink()
+                return None
+            return record['expires_at'], record['payload']
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"Discarding unreadable cache entry {disk_path.name}: {e}")
+            return None
+
+    def _write_disk(self, key: str, operation: str, expires_at: float, payload: str):
+        disk_path = self._disk_path(key)
+        if disk_path is None:
+            return
+        try:
+            tmp_path = disk_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': key, 'operation': operation, 'expires_at': expires_at, 'payload': payload}, f)
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            logger.warning(f"Failed to persist cache entry: {e}")
+
+    def prune_disk(self) -> int:
+        """Drop expired entries and the oldest ones beyond the entry limit"""
+        if self.disk_dir is None:
+            return 0
+
+        now = time.time()
+        removed = 0
+        live = []
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    expires_at = json.load(f).get('expires_at', 0)
+            except (OSError, ValueError):
+                expires_at = 0
+            if expires_at <= now:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+            else:
+                live.append((path.stat().st_mtime, path))
+
+        if len(live) > self.disk_max_entries:
+            live.sort()
+            for _, path in live[:len(live) - self.disk_max_entries]:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+        self._disk_entries = min(len(live), self.disk_max_entries)
+
+        if removed:
+            logger.info(f"Pruned {removed} entries from response disk cache")
+        return removed
+
+
+def _unlink(path: Path) -> bool:
+    try:
+        path.unlink()
+        return True
+    except OSError:
+        return False
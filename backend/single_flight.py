@@ -0,0 +1,72 @@
+"""
+Single-flight coalescing for concurrent identical requests.
+
+The first caller for a key starts the work as its own task; callers that
+arrive while it is running await the same task instead of issuing another
+upstream request. The shared task is shielded, so a caller that gets
+cancelled (e.g. a client disconnecting) does not cancel it for the others.
+"""
+
+import copy
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+
+    def __init__(self, max_tracked_keys: int = 500):
+        self.max_tracked_keys = max_tracked_keys
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._key_stats: "OrderedDict[Hashable, Dict[str, int]]" = OrderedDict()
+        self._upstream = 0
+        self._shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        shared = task is not None
+
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self._upstream += 1
+        else:
+            self._shared += 1
+        self._count(key, shared)
+
+        result = await asyncio.shield(task)
+        # Followers get their own copy so no caller can mutate another's result
+        return copy.deepcopy(result) if shared else result
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def _count(self, key: Hashable, shared: bool):
+        stats = self._key_stats.get(key)
+        if stats is None:
+            stats = {'requests': 0, 'shared': 0}
+            self._key_stats[key] = stats
+            while len(self._key_stats) > self.max_tracked_keys:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        stats['requests'] += 1
+        if shared:
+            stats['shared'] += 1
+
+    def stats(self, top: int = 20) -> Dict:
+        busiest = sorted(self._key_stats.items(), key=lambda kv: kv[1]['shared'], reverse=True)[:top]
+        total = self._upstream + self._shared
+        return {
+            'in_flight': len(self._calls),
+            'upstream_requests': self._upstream,
+            'coalesced_requests': self._shared,
+            'coalesced_ratio': round(self._shared / total, 4) if total else 0.0,
+            'top_keys': [
+                {'key': str(key), **stats}
+                for key, stats in busiest
+                if stats['shared']
+            ]
+        }
@@ -0,0 +1,656 @@
+"""
+Deterministic stub of a hifi API instance and its CDN.
+
+Serves the response shapes the Tidal client and download pipeline parse
+(v2 data/version wrapper, search/album/playlist item lists, base64 playback
+manifests, DASH MPDs or OriginalTrackUrl) from a synthetic catalogue, and
+serves synthetic FLAC/M4A payloads with HTTP Range support. Latency, bandwidth and
+failures (429, 500, empty 200s, XML error bodies, truncated bodies) can be
+injected, with a seeded RNG so runs are reproducible.
+
+From pytest:
+
+    async with StubHifiServer(StubConfig(api_latency=0.05)) as stub:
+        client.endpoints = [stub.endpoint()]
+
+From the command line:
+
+    python stub_hifi.py serve --port 8800 --bandwidth 2M --cdn-error truncate=0.1
+    python stub_hifi.py bench --tracks 20 --concurrency 4 --bandwidth 10M
+"""
+
+import sys
+import json
+import time
+import base64
+import random
+import struct
+import asyncio
+import argparse
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from aiohttp import web
+
+
+API_ERROR_KINDS = ("429", "500", "empty", "xml", "truncate")
+CDN_ERROR_KINDS = ("429", "500", "xml", "truncate")
+TRACKS_PER_ALBUM = 10
+STREAM_CHUNK = 64 * 1024
+DASH_INIT_SIZE = 4096
+
+XML_ERROR_BODY = (
+    b'<?xml version="1.0" encoding="UTF-8"?>\n'
+    b'<Error><Code>AccessDenied</Code><Message>Access Denied</Message></Error>'
+)
+
+
+@dataclass
+class StubConfig:
+    api_latency: float = 0.0
+    cdn_latency: float = 0.0
+    # Bytes per second for each CDN response, None for unthrottled
+    bandwidth: Optional[int] = None
+    payload_size: int = 2 * 1024 * 1024
+    # Failure kind -> probability, e.g. {"429": 0.1, "truncate": 0.05}
+    api_errors: Dict[str, float] = field(default_factory=dict)
+    cdn_errors: Dict[str, float] = field(default_factory=dict)
+    retry_after: int = 1
+    wrap_v2: bool = True
+    # "manifest" (base64 JSON manifest), "dash" (base64 MPD) or "original" (OriginalTrackUrl)
+    stream_style: str = "manifest"
+    dash_segment_size: int = 256 * 1024
+    accept_ranges: bool = True
+    seed: int = 0
+
+
+def synthetic_flac(track_id: int, size: int) -> bytes:
+    """A FLAC header (fLaC + STREAMINFO) followed by seeded noise"""
+    sample_rate, channels, bits, total_samples = 44100, 2, 16, 44100 * 180
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | ((bits - 1) << 36) | total_samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + b"\x00" * 6 + packed.to_bytes(8, "big") + b"\x00" * 16
+    header = b"fLaC" + bytes([0x80]) + len(streaminfo).to_bytes(3, "big") + streaminfo
+    return header + random.Random(track_id).randbytes(max(0, size - len(header)))
+
+
+def _atom(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", 8 + len(payload)) + kind + payload
+
+
+def synthetic_m4a(track_id: int, size: int) -> bytes:
+    """A minimal ftyp/moov/mdat MP4 container around seeded noise"""
+    mvhd = _atom(b"mvhd", b"\x00" * 12 + struct.pack(">II", 1000, 180000) + b"\x00" * 80)
+    head = _atom(b"ftyp", b"M4A \x00\x00\x00\x00M4A mp42isom") + _atom(b"moov", mvhd)
+    body_size = max(0, size - len(head) - 8)
+    return head + _atom(b"mdat", random.Random(track_id).randbytes(body_size))
+
+
+def catalogue_track(track_id: int) -> Dict:
+    album_id = track_id // TRACKS_PER_ALBUM
+    artist_id = album_id % 50 + 1
+    return {
+        "id": track_id,
+        "title": f"Track {track_id}",
+        "duration": 180,
+        "trackNumber": track_id % TRACKS_PER_ALBUM + 1,
+        "volumeNumber": 1,
+        "isrc": f"ZZSTB{track_id:07d}",
+        "audioQuality": "LOSSLESS",
+        "streamStartDate": "2020-01-01T00:00:00.000+0000",
+        "artist": {"id": artist_id, "name": f"Artist {artist_id}", "type": "MAIN"},
+        "artists": [{"id": artist_id, "name": f"Artist {artist_id}", "type": "MAIN"}],
+        "album": {"id": album_id, "title": f"Album {album_id}", "cover": f"stub-cover-{album_id}"},
+    }
+
+
+def catalogue_album(album_id: int) -> Dict:
+    artist_id = album_id % 50 + 1
+    return {
+        "id": album_id,
+        "title": f"Album {album_id}",
+        "numberOfTracks": TRACKS_PER_ALBUM,
+        "releaseDate": "2020-01-01",
+        "cover": f"stub-cover-{album_id}",
+        "artist": {"id": artist_id, "name": f"Artist {artist_id}", "type": "MAIN"},
+    }
+
+
+class StubHifiServer:
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self.host = host
+        self.port = port
+        self.rng = random.Random(self.config.seed)
+        self.requests: Dict[str, int] = {}
+        self.injected: Dict[str, int] = {}
+        self.bytes_served = 0
+        self.first_byte_at: Optional[float] = None
+        self.last_byte_at: Optional[float] = None
+        self._payloads: Dict[Tuple[int, str], bytes] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.app = self._build_app()
+
+    def _build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/track/", self.handle_track)
+        app.router.add_get("/search/", self.handle_search)
+        app.router.add_get("/album/", self.handle_album)
+        app.router.add_get("/artist/", self.handle_artist)
+        app.router.add_get("/artist/{artist_id}/albums", self.handle_artist_albums)
+        app.router.add_get("/playlist/", self.handle_playlist)
+        app.router.add_get("/cdn/{name}", self.handle_cdn)
+        app.router.add_get("/cdn/{track_id}/dash/{name}", self.handle_dash_segment)
+        app.router.add_get("/__stats", self.handle_stats)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def endpoint(self, name: str = "stub", priority: int = 1) -> Dict:
+        """An endpoint entry in the shape TidalAPIClient.endpoints expects"""
+        return {"name": name, "url": self.url, "priority": priority, "provider": "stub"}
+
+    def stream_url(self, track_id: int, ext: str = "flac") -> str:
+        return f"{self.url}/cdn/{track_id}.{ext}"
+
+    def dash_segments(self, track_id: int, ext: str = "flac") -> List[bytes]:
+        """The payload cut into DASH media segments (after the init segment)"""
+        body = self.payload(track_id, ext)[DASH_INIT_SIZE:]
+        size = self.config.dash_segment_size
+        return [body[i:i + size] for i in range(0, len(body), size)]
+
+    def dash_mpd(self, track_id: int, ext: str = "flac") -> str:
+        segments = self.dash_segments(track_id, ext)
+        codecs = "mp4a.40.2" if ext == "m4a" else "flac"
+        # Segments are nominally 4s; the last one carries the remainder
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" profiles="urn:mpeg:dash:profile:isoff-main:2011" '
+            f'type="static" mediaPresentationDuration="PT{len(segments) * 4}S" minBufferTime="PT3.993S">'
+            '<Period id="0"><AdaptationSet id="0" contentType="audio" mimeType="audio/mp4" segmentAlignment="true">'
+            f'<Representation id="{ext.upper()},0" codecs="{codecs}" bandwidth="{self.config.dash_segment_size * 2}" audioSamplingRate="44100">'
+            f'<SegmentTemplate timescale="44100" initialization="{self.url}/cdn/{track_id}/dash/init.{ext}?token=stub&amp;v=1" '
+            f'media="{self.url}/cdn/{track_id}/dash/$Number$.{ext}?token=stub&amp;v=1" startNumber="1">'
+            f'<SegmentTimeline><S d="176400" r="{len(segments) - 1}"/></SegmentTimeline>'
+            '</SegmentTemplate></Representation></AdaptationSet></Period></MPD>'
+        )
+
+    def payload(self, track_id: int, ext: str = "flac") -> bytes:
+        key = (track_id, ext)
+        if key not in self._payloads:
+            build = synthetic_m4a if ext == "m4a" else synthetic_flac
+            self._payloads[key] = build(track_id, self.config.payload_size)
+        return self._payloads[key]
+
+    def stats(self) -> Dict:
+        return {'requests': dict(self.requests), 'injected': dict(self.injected), 'bytes_served': self.bytes_served}
+
+    def _count(self, route: str):
+        self.requests[route] = self.requests.get(route, 0) + 1
+
+    def _pick_error(self, rates: Dict[str, float]) -> Optional[str]:
+        for kind, rate in rates.items():
+            if rate and self.rng.random() < rate:
+                self.injected[kind] = self.injected.get(kind, 0) + 1
+                return kind
+        return None
+
+    async def _api_response(self, request: web.Request, route: str, data, empty=None) -> web.StreamResponse:
+        self._count(route)
+        if self.config.api_latency:
+            await asyncio.sleep(self.config.api_latency)
+
+        error = self._pick_error(self.config.api_errors)
+        if error == "429":
+            return web.Response(status=429, headers={"Retry-After": str(self.config.retry_after)})
+        if error == "500":
+            return web.Response(status=500, text="Internal Server Error")
+        if error == "xml":
+            return web.Response(body=XML_ERROR_BODY, content_type="application/xml")
+        if error == "empty":
+            data = {} if empty is None else empty
+
+        body = {"version": "2.0", "data": data} if self.config.wrap_v2 else data
+        encoded = json.dumps(body).encode()
+        if error == "truncate":
+            encoded = encoded[:len(encoded) // 2]
+        return web.Response(body=encoded, content_type="application/json")
+
+    async def handle_track(self, request: web.Request) -> web.StreamResponse:
+        track_id = int(request.query.get("id", 0))
+        quality = request.query.get("quality", "LOSSLESS").upper()
+        lossy = quality in ("LOW", "HIGH")
+        ext = "m4a" if lossy else "flac"
+        url = self.stream_url(track_id, ext)
+
+        data = {
+            "trackId": track_id,
+            "audioQuality": quality,
+            "assetPresentation": "FULL",
+        }
+        if self.config.stream_style == "original":
+            data["OriginalTrackUrl"] = url
+        elif self.config.stream_style == "dash":
+            data["manifestMimeType"] = "application/dash+xml"
+            data["manifest"] = base64.b64encode(self.dash_mpd(track_id, ext).encode()).decode()
+        else:
+            manifest = {
+                "mimeType": "audio/mp4" if lossy else "audio/flac",
+                "codecs": "mp4a.40.2" if lossy else "flac",
+                "encryptionType": "NONE",
+                "urls": [url],
+            }
+            data["manifestMimeType"] = "application/vnd.tidal.bts"
+            data["manifest"] = base64.b64encode(json.dumps(manifest).encode()).decode()
+        return await self._api_response(request, "track", data)
+
+    async def handle_search(self, request: web.Request) -> web.StreamResponse:
+        query = request.query
+        seed = sum(ord(c) for c in "".join(query.values())) or 1
+        if "s" in query:
+            items = [catalogue_track(seed * 10 + i) for i in range(10)]
+            data = {"limit": 25, "offset": 0, "totalNumberOfItems": len(items), "items": items}
+            return await self._api_response(request, "search", data, {"limit": 25, "offset": 0, "items": []})
+
+        section, items = "tracks", []
+        if "al" in query:
+            section, items = "albums", [catalogue_album(seed + i) for i in range(5)]
+        elif "a" in query:
+            section = "artists"
+            items = [{"id": seed + i, "name": f"Artist {seed + i}", "picture": None} for i in range(5)]
+        elif "p" in query:
+            section = "playlists"
+            items = [{"uuid": f"stub-playlist-{seed + i}", "title": f"Playlist {seed + i}", "numberOfTracks": 10} for i in range(5)]
+        return await self._api_response(request, "search", {section: {"items": items}}, {section: {"items": []}})
+
+    async def handle_album(self, request: web.Request) -> web.StreamResponse:
+        album_id = int(request.query.get("id", 0))
+        items = [
+            {"item": catalogue_track(album_id * TRACKS_PER_ALBUM + i), "type": "track"}
+            for i in range(TRACKS_PER_ALBUM)
+        ]
+        return await self._api_response(request, "album", {**catalogue_album(album_id), "items": items})
+
+    async def handle_artist(self, request: web.Request) -> web.StreamResponse:
+        artist_id = int(request.query.get("f") or request.query.get("id") or 0)
+        albums = [catalogue_album(album_id) for album_id in range(artist_id - 1, 500, 50)[:5]]
+        data = {
+            "artist": {"id": artist_id, "name": f"Artist {artist_id}", "picture": None},
+            "albums": {"items": albums},
+            "tracks": [catalogue_track(album["id"] * TRACKS_PER_ALBUM) for album in albums],
+        }
+        return await self._api_response(request, "artist", data)
+
+    async def handle_artist_albums(self, request: web.Request) -> web.StreamResponse:
+        artist_id = int(request.match_info["artist_id"])
+        albums = [catalogue_album(album_id) for album_id in range(artist_id - 1, 500, 50)[:5]]
+        return await self._api_response(request, "artist_albums", {"limit": 50, "offset": 0, "items": albums})
+
+    async def handle_playlist(self, request: web.Request) -> web.StreamResponse:
+        playlist_id = request.query.get("id", "")
+        seed = sum(ord(c) for c in playlist_id) or 1
+        items = [{"item": catalogue_track(seed * 10 + i), "type": "track"} for i in range(10)]
+        data = {
+            "playlist": {"uuid": playlist_id, "title": f"Playlist {playlist_id}", "numberOfTracks": len(items)},
+            "items": items,
+        }
+        return await self._api_response(request, "playlist", data)
+
+    async def handle_stats(self, request: web.Request) -> web.StreamResponse:
+        return web.json_response(self.stats())
+
+    async def handle_cdn(self, request: web.Request) -> web.StreamResponse:
+        self._count("cdn")
+        name = request.match_info["name"]
+        stem, _, ext = name.partition(".")
+        try:
+            track_id = int(stem)
+        except ValueError:
+            return web.Response(status=404)
+        if self.config.cdn_latency:
+            await asyncio.sleep(self.config.cdn_latency)
+
+        error = self._pick_error(self.config.cdn_errors)
+        if error in ("429", "500", "xml"):
+            return self._cdn_error(error)
+        content_type = "audio/mp4" if ext == "m4a" else "audio/flac"
+        return await self._send_body(request, self.payload(track_id, ext), content_type, error)
+
+    async def handle_dash_segment(self, request: web.Request) -> web.StreamResponse:
+        self._count("dash")
+        stem, _, ext = request.match_info["name"].partition(".")
+        try:
+            track_id = int(request.match_info["track_id"])
+            if stem == "init":
+                body = self.payload(track_id, ext)[:DASH_INIT_SIZE]
+            else:
+                number = int(stem)
+                segments = self.dash_segments(track_id, ext)
+                if not 1 <= number <= len(segments):
+                    return web.Response(status=404)
+                body = segments[number - 1]
+        except ValueError:
+            return web.Response(status=404)
+        if self.config.cdn_latency:
+            await asyncio.sleep(self.config.cdn_latency)
+
+        error = self._pick_error(self.config.cdn_errors)
+        if error in ("429", "500", "xml"):
+            return self._cdn_error(error)
+        return await self._send_body(request, body, "audio/mp4", error)
+
+    def _cdn_error(self, error: str) -> web.Response:
+        if error == "429":
+            return web.Response(status=429, headers={"Retry-After": str(self.config.retry_after)})
+        if error == "500":
+            return web.Response(status=500, text="Internal Server Error")
+        return web.Response(status=200, body=XML_ERROR_BODY, content_type="application/xml")
+
+    async def _send_body(self, request: web.Request, payload: bytes, content_type: str, error: Optional[str]) -> web.StreamResponse:
+        """Stream `payload` honouring Range, the bandwidth limit and an injected truncation"""
+        total = len(payload)
+        start, end = 0, total - 1
+        status = 200
+        headers = {"Content-Type": content_type}
+        if self.config.accept_ranges:
+            headers["Accept-Ranges"] = "bytes"
+            byte_range = _parse_range(request.headers.get("Range"), total)
+            if byte_range == "invalid":
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{total}"})
+            if byte_range is not None:
+                start, end = byte_range
+                status = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+
+        length = end - start + 1
+        headers["Content-Length"] = str(length)
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+
+        # A truncated body stops half way and drops the connection
+        stop = start + length // 2 if error == "truncate" else end + 1
+        position = start
+        while position < stop:
+            chunk = payload[position:min(position + STREAM_CHUNK, stop)]
+            try:
+                await response.write(chunk)
+            except ConnectionError:
+                # The client hung up (e.g. a probe request it only needed headers from)
+                return response
+            position += len(chunk)
+            self.bytes_served += len(chunk)
+            self.last_byte_at = time.perf_counter()
+            if self.first_byte_at is None:
+                self.first_byte_at = self.last_byte_at
+            if self.config.bandwidth:
+                await asyncio.sleep(len(chunk) / self.config.bandwidth)
+
+        if error == "truncate":
+            request.transport.close()
+            return response
+        await response.write_eof()
+        return response
+
+
+def _parse_range(header: Optional[str], total: int):
+    """(start, end) for a single 'bytes=' range, None for no range, 'invalid' if unsatisfiable"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            suffix = int(last)
+            if suffix <= 0:
+                return "invalid"
+            return max(0, total - suffix), total - 1
+        start = int(first)
+        end = int(last) if last else total - 1
+    except ValueError:
+        return None
+    if start >= total or end < start:
+        return "invalid"
+    return start, min(end, total - 1)
+
+
+def _parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    value = value.strip().upper()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def _parse_errors(values: List[str], allowed) -> Dict[str, float]:
+    errors = {}
+    for value in values or []:
+        kind, _, rate = value.partition("=")
+        if kind not in allowed:
+            raise argparse.ArgumentTypeError(f"unknown error kind {kind!r}, expected one of {', '.join(allowed)}")
+        errors[kind] = float(rate or 1.0)
+    return errors
+
+
+def _config_from_args(args) -> StubConfig:
+    return StubConfig(
+        api_latency=args.api_latency,
+        cdn_latency=args.cdn_latency,
+        bandwidth=_parse_size(args.bandwidth) if args.bandwidth else None,
+        payload_size=_parse_size(args.payload_size),
+        api_errors=_parse_errors(args.api_error, API_ERROR_KINDS),
+        cdn_errors=_parse_errors(args.cdn_error, CDN_ERROR_KINDS),
+        wrap_v2=not args.no_v2,
+        stream_style=args.stream_style,
+        accept_ranges=not args.no_ranges,
+        seed=args.seed,
+    )
+
+
+async def _serve(args):
+    async with StubHifiServer(_config_from_args(args), host=args.host, port=args.port) as stub:
+        print(f"Stub hifi API and CDN listening on {stub.url}")
+        print(f"Endpoint entry: {json.dumps(stub.endpoint())}")
+        while True:
+            await asyncio.sleep(3600)
+
+
+def _covered_time(spans: List[Tuple[float, float]]) -> float:
+    """Seconds during which at least one of the (start, end) spans was running"""
+    covered, reached = 0.0, None
+    for start, end in sorted(spans):
+        if reached is None or start > reached:
+            covered += end - start
+            reached = end
+        elif end > reached:
+            covered += end - reached
+            reached = end
+    return covered
+
+
+async def _bench(args):
+    from api.services import download, enrichment, files, library
+    from download_state import DownloadStateManager
+
+    async def offline(*args, **kwargs):
+        return None
+
+    track_ids = list(range(args.first_track, args.first_track + args.tracks))
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        # Keep benchmark output and bookkeeping out of the real library and
+        # state files, and never reach for the real lyrics or cover services
+        patches = {
+            (files, "DOWNLOAD_DIR"): tmp_path / "library",
+            (download, "download_state_manager"): DownloadStateManager(state_file=tmp_path / "download_state.json"),
+            (library, "library_service"): library.LibraryService(cache_file=tmp_path / "library_cache.json"),
+            (enrichment, "_fetch_cover"): offline,
+            (enrichment, "_fetch_lyrics"): offline,
+            (enrichment, "_fetch_musicbrainz"): offline,
+        }
+        originals = {target: getattr(*target) for target in patches}
+        for (module, name), value in patches.items():
+            setattr(module, name, value)
+
+        # track id -> [first byte, last byte, bytes in the first chunk, bytes]
+        transfers: Dict[int, List] = {}
+        report_progress = download.report_download_progress
+
+        def record_progress(track_id, downloaded, total_size):
+            now = time.perf_counter()
+            transfer = transfers.setdefault(track_id, [now, now, downloaded, downloaded])
+            transfer[1], transfer[3] = now, downloaded
+            report_progress(track_id, downloaded, total_size)
+
+        download.report_download_progress = record_progress
+        try:
+            await _run_bench(args, track_ids, tmp_path, transfers)
+        finally:
+            download.report_download_progress = report_progress
+            for (module, name), value in originals.items():
+                setattr(module, name, value)
+
+
+async def _run_bench(args, track_ids, tmp_path, transfers):
+    from tidal_client import TidalAPIClient
+    from api.utils.extraction import extract_dash_manifest, extract_stream_url
+    from api.services import download, files
+    from api.state import active_downloads
+    from http_sessions import http_sessions
+
+    async with StubHifiServer(_config_from_args(args)) as stub:
+        client = TidalAPIClient(cache_dir=tmp_path / "cache")
+        client.endpoints = [stub.endpoint()]
+        try:
+            started = time.perf_counter()
+            resolved = await client.get_tracks_bulk(track_ids, args.quality, concurrency=args.concurrency)
+            resolve_time = time.perf_counter() - started
+        finally:
+            await client.close()
+
+        urls = {tid: extract_stream_url(r['data']) for tid, r in resolved.items() if r['data']}
+        manifests = {tid: extract_dash_manifest(r['data']) for tid, r in resolved.items() if r['data']}
+        urls = {tid: url or manifests[tid].init_url for tid, url in urls.items() if url or manifests[tid]}
+        print(f"Resolved {len(urls)}/{len(track_ids)} tracks in {resolve_time:.2f}s "
+              f"({len(track_ids) / resolve_time:.1f} tracks/s)")
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        requested = {}
+        timings = {}
+        state = download.download_state_manager
+        set_completed = state.set_completed
+
+        def record_completed(track_id, *args, **kwargs):
+            # The end of the pipeline; only logging and cache invalidation follow
+            timings[track_id] = time.perf_counter() - requested[track_id]
+            set_completed(track_id, *args, **kwargs)
+
+        state.set_completed = record_completed
+
+        async def fetch(track_id, url):
+            async with semaphore:
+                target = files.staging_path(track_id, f"{track_id}{Path(urlparse(url).path).suffix}")
+                requested[track_id] = time.perf_counter()
+                await download.download_file_async(track_id, url, target, target.name, metadata={
+                    'title': f"Track {track_id}", 'artist': "Stub", 'album': "Stub",
+                    'track_number': 1, 'file_ext': target.suffix,
+                }, use_musicbrainz=False, dash_manifest=manifests.get(track_id))
+                active_downloads.pop(track_id, None)
+
+        bytes_before = stub.bytes_served
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(fetch(tid, url) for tid, url in urls.items()))
+        finally:
+            pools = http_sessions.stats()
+            await http_sessions.close()
+        elapsed = time.perf_counter() - started
+        served = stub.bytes_served - bytes_before
+
+        # Transfer rates only count the time bytes were arriving: per transfer
+        # from its first to its last chunk, and overall while any was running
+        rates = sorted(
+            (received - first_chunk) / (last - first)
+            for first, last, first_chunk, received in transfers.values() if last > first
+        )
+        transfer_time = _covered_time([(first, last) for first, last, _, _ in transfers.values()])
+        received = sum(transfer[3] for transfer in transfers.values())
+        mb = 1024 * 1024
+        print(f"Downloaded {len(transfers)} tracks, {served / mb:.1f} MB in {transfer_time:.2f}s of transfer, "
+              f"{received / mb / transfer_time if transfer_time else 0:.2f} MB/s (concurrency {args.concurrency})")
+        if rates:
+            print(f"Per transfer: median {rates[len(rates) // 2] / mb:.2f} MB/s, slowest {rates[0] / mb:.2f} MB/s")
+        completed = sorted(timings.values())
+        if completed:
+            print(f"Per track, request to completed: median {completed[len(completed) // 2]:.2f}s, "
+                  f"max {completed[-1]:.2f}s")
+        print(f"Wall clock {elapsed:.2f}s")
+        if "cdn" in pools:
+            cdn = pools["cdn"]
+            print(f"CDN pool: {cdn['requests']} requests, {cdn['connection_hits']} reused connections, "
+                  f"{cdn['connection_misses']} new")
+        print(f"Stub stats: {json.dumps(stub.stats())}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Stub hifi API/CDN for offline tests and benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("serve", "bench"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--api-latency", type=float, default=0.0, help="seconds added to each API response")
+        cmd.add_argument("--cdn-latency", type=float, default=0.0, help="seconds before each CDN response starts")
+        cmd.add_argument("--bandwidth", help="per-response CDN bandwidth, e.g. 512K or 4M (bytes/s)")
+        cmd.add_argument("--payload-size", default="2M", help="size of each synthetic audio file")
+        cmd.add_argument("--api-error", action="append", metavar="KIND=RATE",
+                         help=f"inject API failures, KIND in {', '.join(API_ERROR_KINDS)}")
+        cmd.add_argument("--cdn-error", action="append", metavar="KIND=RATE",
+                         help=f"inject CDN failures, KIND in {', '.join(CDN_ERROR_KINDS)}")
+        cmd.add_argument("--stream-style", choices=("manifest", "dash", "original"), default="manifest")
+        cmd.add_argument("--no-v2", action="store_true", help="do not wrap API responses in data/version")
+        cmd.add_argument("--no-ranges", action="store_true", help="CDN ignores Range requests")
+        cmd.add_argument("--seed", type=int, default=0)
+
+    serve = sub.choices["serve"]
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8800)
+
+    bench = sub.choices["bench"]
+    bench.add_argument("--tracks", type=int, default=10)
+    bench.add_argument("--first-track", type=int, default=1000)
+    bench.add_argument("--concurrency", type=int, default=3)
+    bench.add_argument("--quality", default="LOSSLESS")
+
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve(args) if args.command == "serve" else _bench(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,9 @@
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock
 import sys
+import inspect
 from pathlib import Path
 
 # Add backend directory to path so we can import api modules
@@ -9,6 +11,8 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from api.main import app
 from api.clients import tidal_client
+from stub_hifi import StubHifiServer
+from tidal_client import TidalAPIClient
 
 @pytest.fixture
 def client():
@@ -16,15 +20,37 @@ def client():
 
 @pytest.fixture
 def mock_tidal_client(monkeypatch):
-    mock = MagicMock()
+    # Coroutine methods become AsyncMocks and plain ones MagicMocks, as on the real client
+    mock = AsyncMock(spec=TidalAPIClient)
+    # Lookups a test doesn't set up find nothing, like an unknown id would
+    for name, member in inspect.getmembers(TidalAPIClient, inspect.iscoroutinefunction):
+        getattr(mock, name).return_value = None
     # Replace the global tidal_client instance with our mock
     monkeypatch.setattr("api.routers.search.tidal_client", mock)
     monkeypatch.setattr("api.routers.downloads.tidal_client", mock)
+    monkeypatch.setattr("api.routers.playlists.tidal_client", mock)
+    monkeypatch.setattr("api.services.search.tidal_client", mock)
     monkeypatch.setattr("api.clients.tidal_client", mock)
     return mock
 
 @pytest.fixture
 def mock_background_tasks(monkeypatch):
-    # Mock background tasks to prevent actual execution
-    mock = MagicMock()
+    # The download route hands the job to a background task; record it instead of downloading
+    mock = AsyncMock(return_value=True)
+    monkeypatch.setattr("api.routers.downloads.download_file_async", mock)
     return mock
+
+@pytest_asyncio.fixture
+async def stub_hifi():
+    """Offline stub of a hifi API instance and its CDN (see stub_hifi.py)"""
+    async with StubHifiServer() as stub:
+        yield stub
+
+async def _no_remote_endpoints(self):
+    return None
+
+@pytest.fixture
+def offline_client(tmp_path, monkeypatch):
+    """A real TidalAPIClient that never fetches the public instance list"""
+    monkeypatch.setattr(TidalAPIClient, "_fetch_endpoints_from_remote", _no_remote_endpoints)
+    return TidalAPIClient(cache_dir=tmp_path)
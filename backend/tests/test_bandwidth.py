@@ -0,0 +1,69 @@
+import time
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from bandwidth import BYTES_PER_MBIT, BandwidthLimiter, parse_schedule
+
+
+def test_schedule_windows_wrap_past_midnight():
+    limiter = BandwidthLimiter(5, parse_schedule("08:00-23:00=20, 23:00-02:30=0"))
+
+    assert limiter.current_limit(datetime(2024, 1, 1, 12, 0)) == 20
+    assert limiter.current_limit(datetime(2024, 1, 1, 23, 30)) == 0
+    assert limiter.current_limit(datetime(2024, 1, 1, 1, 0)) == 0
+    assert limiter.current_limit(datetime(2024, 1, 1, 4, 0)) == 5
+    assert [str(window) for window in limiter.schedule] == ["08:00-23:00=20", "23:00-02:30=0"]
+
+    for bad in ("08:00-23:00", "25:00-01:00=5", "08:00-09:00=-1", "8-9=5"):
+        with pytest.raises(ValueError):
+            parse_schedule(bad)
+
+
+@pytest.mark.asyncio
+async def test_throttle_holds_downloads_to_the_cap():
+    limiter = BandwidthLimiter(8)  # 1 MB/s
+    started = time.perf_counter()
+    async with limiter.transfer(1):
+        for _ in range(8):
+            await limiter.throttle(64 * 1024)
+    # 512 KB at 1 MB/s, less the quarter second the bucket may bank
+    assert time.perf_counter() - started >= 0.2
+    assert limiter.transfers == {}
+
+    limiter.configure(0)
+    started = time.perf_counter()
+    await limiter.throttle(10 * 1024 * 1024)
+    assert time.perf_counter() - started < 0.05
+
+
+@pytest.mark.asyncio
+async def test_downloads_share_the_cap_fairly_whatever_their_connections():
+    limiter = BandwidthLimiter(16)  # 2 MB/s
+    received = {}
+
+    async def connection(key, chunk_size):
+        async with limiter.transfer(key) as transfer:
+            while True:
+                await limiter.throttle(chunk_size)
+                received[key] = transfer.bytes
+
+    async def segmented():
+        async with limiter.transfer("segmented"):
+            await asyncio.gather(*(connection("segmented", 256 * 1024) for _ in range(4)))
+
+    tasks = [asyncio.create_task(segmented()), asyncio.create_task(connection("single", 64 * 1024))]
+    await asyncio.sleep(0.2)
+    stats = limiter.stats()
+    await asyncio.sleep(0.8)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert stats['fair_share_mbps'] == 8
+    assert {t['key']: t['connections'] for t in stats['transfers']} == {"segmented": 5, "single": 1}
+    total = sum(received.values())
+    assert total <= 2.5 * 16 * BYTES_PER_MBIT
+    assert received["single"] / total == pytest.approx(0.5, abs=0.15)
+    assert limiter.transfers == {}
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+
+from cover_cache import CoverCache, cover_key
+
+ALBUM_COVER = "https://resources.tidal.com/images/ab12cd34/5678/90ef/1234/567890abcdef/640x640.jpg"
+
+
+def test_tidal_covers_are_keyed_by_id_and_size():
+    assert cover_key(ALBUM_COVER) == "ab12cd34-5678-90ef-1234-567890abcdef_640x640"
+    assert cover_key(ALBUM_COVER.replace("640x640", "1280x1280")).endswith("_1280x1280")
+    assert cover_key("https://example.com/art.jpg") != cover_key("https://example.com/other.jpg")
+
+
+@pytest.mark.asyncio
+async def test_album_cover_is_downloaded_once(tmp_path):
+    downloads = 0
+
+    async def fetch():
+        nonlocal downloads
+        downloads += 1
+        await asyncio.sleep(0.05)
+        return b"jpeg"
+
+    cache = CoverCache(tmp_path)
+    results = await asyncio.gather(*(cache.get(ALBUM_COVER, fetch) for _ in range(20)))
+    assert results == [b"jpeg"] * 20
+    assert await cache.get(ALBUM_COVER, fetch) == b"jpeg"
+    assert downloads == 1
+    assert cache.stats()['hits'] == 1
+
+    # Survives a restart
+    assert await CoverCache(tmp_path).get(ALBUM_COVER, fetch) == b"jpeg"
+    assert downloads == 1
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_covers_are_evicted(tmp_path):
+    cache = CoverCache(tmp_path, max_bytes=250)
+
+    async def fetch():
+        return b"x" * 100
+
+    await cache.get("http://covers/1.jpg", fetch)
+    await cache.get("http://covers/2.jpg", fetch)
+    await cache.get("http://covers/1.jpg", fetch)
+    await cache.get("http://covers/3.jpg", fetch)
+
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 200
+    assert not (tmp_path / f"{cover_key('http://covers/2.jpg')}.jpg").exists()
+    assert (tmp_path / f"{cover_key('http://covers/1.jpg')}.jpg").exists()
@@ -0,0 +1,106 @@
+import base64
+import aiohttp
+import pytest
+
+import api.services.dash as dash_service
+from api.services.dash import fetch_dash
+from api.services.resumable import DownloadError, part_path
+from api.utils.dash import parse_mpd, parse_duration
+from api.utils.extraction import extract_dash_manifest, extract_stream_url
+from stub_hifi import StubHifiServer, StubConfig
+
+TIDAL_MPD = """<?xml version='1.0' encoding='UTF-8'?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" profiles="urn:mpeg:dash:profile:isoff-main:2011" type="static" minBufferTime="PT3.993S" mediaPresentationDuration="PT3M27.410S">
+  <Period id="0">
+    <AdaptationSet id="0" contentType="audio" mimeType="audio/mp4" segmentAlignment="true">
+      <Representation id="FLAC,0" codecs="flac" bandwidth="1411000" audioSamplingRate="44100">
+        <SegmentTemplate timescale="44100" initialization="https://sp-ad-cf.audio.tidal.com/mediatracks/abc/0.mp4?token=x&amp;v=1" media="https://sp-ad-cf.audio.tidal.com/mediatracks/abc/$Number$.mp4?token=x&amp;v=1" startNumber="1">
+          <SegmentTimeline>
+            <S d="176128" r="50"/>
+            <S d="139264"/>
+          </SegmentTimeline>
+        </SegmentTemplate>
+      </Representation>
+      <Representation id="AAC,0" codecs="mp4a.40.2" bandwidth="320000">
+        <SegmentTemplate timescale="44100" media="https://example.com/aac/$Number%03d$.mp4">
+          <SegmentTimeline><S d="176128" r="1"/></SegmentTimeline>
+        </SegmentTemplate>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>"""
+
+
+def test_parse_mpd_picks_best_representation():
+    manifest = parse_mpd(TIDAL_MPD)
+
+    assert manifest.representation_id == "FLAC,0"
+    assert manifest.is_flac
+    assert manifest.init_url == "https://sp-ad-cf.audio.tidal.com/mediatracks/abc/0.mp4?token=x&v=1"
+    assert len(manifest.segment_urls) == 52
+    assert manifest.segment_urls[0] == "https://sp-ad-cf.audio.tidal.com/mediatracks/abc/1.mp4?token=x&v=1"
+    assert manifest.segment_urls[-1].startswith("https://sp-ad-cf.audio.tidal.com/mediatracks/abc/52.mp4")
+    assert manifest.duration == pytest.approx(207.41)
+    assert parse_duration("PT1H2M3S") == 3723
+    assert parse_mpd("<Error/>") is None
+
+
+def test_extract_dash_manifest():
+    track = [{"trackId": 1}, {
+        "manifestMimeType": "application/dash+xml",
+        "manifest": base64.b64encode(TIDAL_MPD.encode()).decode(),
+    }]
+
+    assert extract_dash_manifest(track).representation_id == "FLAC,0"
+    # A segmented stream has no single URL to hand out
+    assert extract_stream_url(track) is None
+    assert extract_dash_manifest({"OriginalTrackUrl": "http://example.com/a.flac"}) is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_dash_reassembles_segments(tmp_path, monkeypatch):
+    monkeypatch.setattr(dash_service, "DASH_RETRY_DELAY", 0)
+    config = StubConfig(payload_size=600 * 1024, dash_segment_size=64 * 1024, stream_style="dash",
+                        cdn_errors={"500": 0.2, "truncate": 0.1}, seed=3)
+    async with StubHifiServer(config) as stub:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{stub.url}/track/", params={"id": 5, "quality": "HI_RES_LOSSLESS"}) as response:
+                manifest = extract_dash_manifest((await response.json())["data"])
+            assert len(manifest.segment_urls) == len(stub.dash_segments(5))
+
+            progress = []
+            target = tmp_path / "track.flac"
+            result = await fetch_dash(session, manifest, target, on_progress=lambda d, t: progress.append((d, t)),
+                                      concurrency=4, remux=False)
+
+    assert result == target
+    assert target.read_bytes() == stub.payload(5)
+    assert not part_path(target).exists()
+    assert sum(stub.injected.values()) > 0
+    assert progress[-1] == (len(stub.payload(5)), len(stub.payload(5)))
+    assert all(done <= total for done, total in progress)
+
+
+@pytest.mark.asyncio
+async def test_fetch_dash_gives_up_on_missing_segment(tmp_path, monkeypatch):
+    monkeypatch.setattr(dash_service, "DASH_RETRY_DELAY", 0)
+    config = StubConfig(payload_size=300 * 1024, dash_segment_size=64 * 1024, stream_style="dash")
+    async with StubHifiServer(config) as stub:
+        manifest = parse_mpd(stub.dash_mpd(5))
+        manifest.segment_urls.append(f"{stub.url}/cdn/5/dash/999.flac")
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(DownloadError):
+                await fetch_dash(session, manifest, tmp_path / "track.flac", remux=False)
+
+    assert not part_path(tmp_path / "track.flac").exists()
+
+
+@pytest.mark.asyncio
+async def test_remux_without_ffmpeg_fails_cleanly(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    source = tmp_path / "track.flac.part"
+    source.write_bytes(b"\x00" * 16)
+
+    with pytest.raises(DownloadError) as excinfo:
+        await dash_service.remux_audio(source, tmp_path / "track.flac")
+    assert not excinfo.value.resumable
@@ -1,3 +1,6 @@
+import asyncio
+import pytest
+from api.services.files import staging_dir
 from unittest.mock import MagicMock
 import os
 
@@ -64,4 +67,29 @@ def test_download_track_post(client, mock_tidal_client, mock_background_tasks):
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "downloading"
-    assert "filename" in data
+    assert data["filename"] == "01 - Test Track.flac"
+
+    mock_background_tasks.assert_awaited_once()
+    track_id, stream_url, staged, filename = mock_background_tasks.await_args.args[:4]
+    assert (track_id, stream_url, filename) == (1001, "http://stream.url", data["filename"])
+    assert staged.name == "Test Artist - Test Track.flac"
+    assert staged.parent.parent == staging_dir()
+
+
+@pytest.mark.asyncio
+async def test_finished_tracks_leave_active_downloads_without_holding_the_worker(monkeypatch):
+    from api.services import download
+    from api.state import active_downloads
+
+    monkeypatch.setattr(download, "ACTIVE_DOWNLOAD_LINGER", 0.01)
+    active_downloads[1] = {'progress': 100, 'status': 'downloading'}
+    active_downloads[2] = {'progress': 100, 'status': 'downloading'}
+    download._forget_active_later(1)
+    download._forget_active_later(2)
+    # Track 2 is downloaded again before the old entry expires
+    active_downloads[2] = {'progress': 0, 'status': 'downloading'}
+    assert 1 in active_downloads
+
+    await asyncio.sleep(0.05)
+    assert 1 not in active_downloads
+    assert active_downloads.pop(2) == {'progress': 0, 'status': 'downloading'}
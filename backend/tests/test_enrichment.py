@@ -0,0 +1,74 @@
+import time
+import asyncio
+import pytest
+
+import api.services.enrichment as enrichment
+
+METADATA = {'title': 'Song', 'artist': 'Artist', 'album': 'Album', 'cover_url': 'http://covers/1.jpg'}
+
+
+@pytest.fixture
+def slow_lookups(monkeypatch):
+    calls = {'cover': 0, 'lyrics': 0, 'musicbrainz': 0}
+
+    async def fetch_cover(url):
+        calls['cover'] += 1
+        await asyncio.sleep(0.1)
+        return b'jpeg'
+
+    async def get_lyrics(**kwargs):
+        calls['lyrics'] += 1
+        await asyncio.sleep(0.1)
+        return None
+
+    async def enhance(metadata):
+        calls['musicbrainz'] += 1
+        await asyncio.sleep(0.1)
+        return {**metadata, 'musicbrainz_trackid': 'mbid', 'genre': 'Rock'}
+
+    monkeypatch.setattr(enrichment, "_fetch_cover", fetch_cover)
+    monkeypatch.setattr(enrichment.lyrics_client, "get_lyrics", get_lyrics)
+    monkeypatch.setattr(enrichment, "enhance_metadata_with_musicbrainz", enhance)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_lookups_overlap_the_download(slow_lookups):
+    metadata = dict(METADATA)
+    keys = enrichment.prefetch_enrichment(metadata)
+    try:
+        await asyncio.sleep(0.15)  # the download
+        metadata['file_ext'] = '.flac'  # set after the snapshot, so kept
+
+        started = time.perf_counter()
+        assert await enrichment.get_cover(metadata['cover_url']) == b'jpeg'
+        assert await enrichment.get_lyrics(metadata) is None
+        merged = await enrichment.apply_musicbrainz(metadata)
+        assert time.perf_counter() - started < 0.05
+    finally:
+        enrichment.release_enrichment(keys)
+
+    assert slow_lookups == {'cover': 1, 'lyrics': 1, 'musicbrainz': 1}
+    assert merged['musicbrainz_trackid'] == 'mbid'
+    assert merged['file_ext'] == '.flac'
+    assert merged['genre'] == 'Rock'
+    assert not enrichment._tasks and not enrichment._refs
+
+
+@pytest.mark.asyncio
+async def test_shared_lookups_outlive_the_first_release(slow_lookups):
+    first = enrichment.prefetch_enrichment(dict(METADATA), use_musicbrainz=False)
+    second = enrichment.prefetch_enrichment(dict(METADATA), use_musicbrainz=False)
+    tasks = list(enrichment._tasks.values())
+    await asyncio.sleep(0)
+    assert len(tasks) == 2
+    assert slow_lookups == {'cover': 1, 'lyrics': 1, 'musicbrainz': 0}
+
+    enrichment.release_enrichment(first)
+    await asyncio.sleep(0)
+    assert not any(task.done() for task in tasks)
+
+    enrichment.release_enrichment(second)
+    await asyncio.sleep(0)
+    assert all(task.cancelled() for task in tasks)
+    assert not enrichment._tasks and not enrichment._refs
@@ -0,0 +1,45 @@
+from entity_store import EntityStore, iter_entities
+
+
+ALBUM_RESPONSE = {
+    "id": 10,
+    "title": "Album",
+    "numberOfTracks": 2,
+    "releaseDate": "2020-01-01",
+    "artist": {"id": 7, "name": "Artist", "type": "MAIN"},
+    "items": [
+        {"type": "track", "item": {"id": 1, "title": "One", "trackNumber": 1, "album": {"id": 10, "title": "Album", "cover": "abc"}}},
+        {"type": "track", "item": {"id": 2, "title": "Two", "trackNumber": 2, "artists": [{"id": 7, "name": "Artist"}]}},
+    ],
+}
+
+
+def test_iter_entities_finds_nested_objects():
+    kinds = sorted((kind, obj["id"]) for kind, obj in iter_entities(ALBUM_RESPONSE))
+    assert kinds == [("albums", 10), ("albums", 10), ("artists", 7), ("artists", 7), ("tracks", 1), ("tracks", 2)]
+
+
+def test_harvest_merges_partial_objects(tmp_path):
+    store = EntityStore(tmp_path / "entities.db", enabled=True)
+    store.harvest(ALBUM_RESPONSE)
+
+    album = store.get_album(10)
+    assert album["releaseDate"] == "2020-01-01"
+    assert album["cover"] == "abc"
+    assert "items" not in album
+    assert store.get_track(2)["title"] == "Two"
+    assert store.get_artist(7)["name"] == "Artist"
+
+    # A later, abbreviated copy keeps the fields it does not carry
+    store.harvest({"items": [{"id": 1, "title": "One (Remastered)", "trackNumber": 1, "album": {"id": 10, "title": "Album"}}]})
+    assert store.get_album(10)["releaseDate"] == "2020-01-01"
+    assert store.get_track(1)["title"] == "One (Remastered)"
+    assert store.get_track(99) is None
+    store.close()
+
+
+def test_disabled_store_is_inert(tmp_path):
+    store = EntityStore(tmp_path / "entities.db", enabled=False)
+    assert store.harvest(ALBUM_RESPONSE) == 0
+    assert store.get_track(1) is None
+    assert not (tmp_path / "entities.db").exists()
@@ -0,0 +1,43 @@
+import time
+import asyncio
+import pytest
+
+from file_workers import FileWorkerPool
+
+
+@pytest.mark.asyncio
+async def test_blocking_work_leaves_the_loop_free():
+    pool = FileWorkerPool(workers=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        results = await asyncio.gather(
+            pool.run(time.sleep, 0.1),
+            pool.run(lambda: time.sleep(0.1) or "done"),
+        )
+    finally:
+        task.cancel()
+        pool.shutdown()
+
+    assert results == [None, "done"]
+    assert ticks >= 10
+    stats = pool.stats()
+    assert stats['completed'] == 2
+    assert stats['max_wait_seconds'] >= 0.09  # the second job queued behind the first
+    assert stats['running'] == 0 and stats['queued'] == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_the_caller():
+    pool = FileWorkerPool(workers=2)
+    with pytest.raises(FileNotFoundError):
+        await pool.run(open, "/nonexistent/file")
+    pool.shutdown()
+    assert pool.stats()['failed'] == 1
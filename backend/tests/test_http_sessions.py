@@ -0,0 +1,36 @@
+import pytest
+
+from http_sessions import SessionRegistry
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused_across_requests(stub_hifi):
+    registry = SessionRegistry()
+    try:
+        for _ in range(5):
+            session = registry.session("cdn")
+            async with session.get(stub_hifi.stream_url(1)) as response:
+                await response.read()
+
+        assert registry.session("cdn") is session
+        stats = registry.stats()["cdn"]
+        assert stats["requests"] == 5
+        assert stats["connection_misses"] == 1
+        assert stats["connection_hits"] == 4
+        assert stats["hosts"]["127.0.0.1"]["hits"] == 4
+    finally:
+        await registry.close()
+
+    assert registry.stats()["cdn"]["open"] is False
+
+
+@pytest.mark.asyncio
+async def test_closed_or_unknown_pools_get_a_fresh_session():
+    registry = SessionRegistry()
+    try:
+        first = registry.session("resources")
+        await first.close()
+        assert registry.session("resources") is not first
+        assert registry.session("no-such-pool") is registry.session("default")
+    finally:
+        await registry.close()
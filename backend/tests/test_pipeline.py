@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+
+from pipeline import Pipeline, Stage
+
+
+@pytest.mark.asyncio
+async def test_stage_bounds_concurrency_in_arrival_order():
+    stage = Stage("fetch", 2)
+    order, peak = [], 0
+
+    async def job(n):
+        nonlocal peak
+        granted = await stage.acquire()
+        order.append(n)
+        peak = max(peak, stage.running)
+        await asyncio.sleep(0.01)
+        stage.release(granted)
+
+    tasks = [asyncio.create_task(job(n)) for n in range(6)]
+    await asyncio.sleep(0)
+    assert stage.stats()["queued"] == 4
+    await asyncio.gather(*tasks)
+
+    assert order == list(range(6))
+    assert peak == 2
+    assert stage.stats()["completed"] == 6
+    assert stage.running == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    stage = Stage("tag", 1)
+    granted = await stage.acquire()
+    waiter = asyncio.create_task(stage.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    stage.release(granted)
+
+    assert stage.running == 0 and stage.queued == 0
+    stage.release(await asyncio.wait_for(stage.acquire(), 1))
+
+
+@pytest.mark.asyncio
+async def test_raising_concurrency_wakes_waiters():
+    stage = Stage("transcode", 1)
+    await stage.acquire()
+    waiter = asyncio.create_task(stage.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    stage.set_concurrency(2)
+    await asyncio.wait_for(waiter, 1)
+    assert stage.running == 2
+
+
+@pytest.mark.asyncio
+async def test_next_track_fetches_while_previous_one_enriches():
+    pipeline = Pipeline({"fetch": 1, "enrich": 1})
+    timeline = []
+
+    async def track(n):
+        async with pipeline.stage("fetch"):
+            timeline.append(("fetch", n))
+            await asyncio.sleep(0.01)
+        async with pipeline.stage("enrich"):
+            timeline.append(("enrich", n))
+            await asyncio.sleep(0.05)
+
+    await asyncio.gather(track(1), track(2))
+
+    # Track 2 got the network slot while track 1 was still enriching
+    assert timeline.index(("fetch", 2)) < timeline.index(("enrich", 2))
+    assert timeline[:3] == [("fetch", 1), ("enrich", 1), ("fetch", 2)]
+    stats = pipeline.stats()
+    assert stats["fetch"]["completed"] == 2 and stats["enrich"]["completed"] == 2
@@ -0,0 +1,61 @@
+import json
+import asyncio
+import pytest
+
+from progress_bus import ProgressBus
+from download_state import DownloadStateManager
+
+
+@pytest.mark.asyncio
+async def test_progress_is_coalesced_into_batches():
+    bus = ProgressBus(interval=0.05)
+    batches = []
+    bus.subscribe(batches.append)
+
+    total = 50 * 1024 * 1024
+    for downloaded in range(0, total + 1, 8192):
+        bus.report(1, int(downloaded / total * 100), 'downloading', downloaded, total)
+        bus.report(2, 10)
+    await asyncio.sleep(0.1)
+
+    assert len(batches) == 1
+    assert batches[0][1]['progress'] == 100
+    assert batches[0][2]['progress'] == 10
+    assert bus.stats()['reports'] > 10000
+
+    bus.report(1, 100, 'transcoding')
+    bus.flush(1)
+    assert batches[-1] == {1: bus.get(1)}
+
+
+@pytest.mark.asyncio
+async def test_discarded_track_is_not_published():
+    bus = ProgressBus(interval=0.01)
+    batches = []
+    bus.subscribe(batches.append)
+
+    bus.report(1, 50)
+    bus.discard(1)
+    await asyncio.sleep(0.05)
+
+    assert batches == []
+    assert bus.get(1) is None
+
+
+@pytest.mark.asyncio
+async def test_state_file_saves_are_debounced(tmp_path):
+    state_file = tmp_path / "download_state.json"
+    manager = DownloadStateManager(state_file, save_interval=0.05)
+    manager.set_downloading(1)
+    saves = manager.saves
+
+    for progress in range(100):
+        manager.update_progress(1, progress)
+    assert manager.saves - saves <= 1
+
+    await asyncio.sleep(0.1)
+    assert json.loads(state_file.read_text())["active"]["1"]["progress"] == 99
+
+    # Transitions are written immediately
+    manager.set_completed(1, "track.flac")
+    assert "1" in json.loads(state_file.read_text())["completed"]
@@ -0,0 +1,47 @@
+import pytest
+
+from rate_limiter import TokenBucket, EndpointRateLimiter, parse_retry_after, MIN_RATE
+
+
+def test_parse_retry_after_seconds_and_dates():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("garbage") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=2, burst=2)
+    now = bucket.updated
+    assert bucket.try_acquire(now) == 0
+    assert bucket.try_acquire(now) == 0
+    assert bucket.try_acquire(now) == pytest.approx(0.5)
+    assert bucket.try_acquire(now + 0.5) == 0
+
+
+def test_429_halves_rate_and_blocks_then_recovers():
+    bucket = TokenBucket(rate=4, burst=4)
+    bucket.penalize(retry_after=10)
+    assert bucket.rate == 2
+    assert bucket.wait_time() > 9
+
+    for _ in range(100):
+        bucket.reward()
+    assert bucket.rate == 4
+
+    for _ in range(20):
+        bucket.penalize(retry_after=0)
+    assert bucket.rate == MIN_RATE
+
+
+def test_overrides_are_per_endpoint():
+    limiter = EndpointRateLimiter(default_rate=5, default_burst=10, overrides={"slow": {"rate": 1, "burst": 1}})
+    assert limiter.bucket("slow").max_rate == 1
+    assert limiter.bucket("other").max_rate == 5
+
+
+@pytest.mark.asyncio
+async def test_acquire_gives_up_beyond_max_wait():
+    limiter = EndpointRateLimiter(overrides={})
+    limiter.record_rate_limited("ep", retry_after=60)
+    assert await limiter.acquire("ep", max_wait=0.1) is False
@@ -0,0 +1,68 @@
+import time
+import pytest
+
+from response_cache import ResponseCache
+
+
+@pytest.mark.asyncio
+async def test_cache_returns_independent_copies():
+    cache = ResponseCache(use_disk=False)
+    await cache.set("get_album", "/album/", {"id": 1}, {"title": "Album", "items": [1, 2]})
+
+    first = await cache.get("get_album", "/album/", {"id": 1})
+    first["items"].append(3)
+
+    assert await cache.get("get_album", "/album/", {"id": 1}) == {"title": "Album", "items": [1, 2]}
+    assert cache.stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_stream_urls_are_never_cached():
+    cache = ResponseCache(use_disk=False)
+    await cache.set("get_track", "/track/", {"id": 1, "quality": "LOSSLESS"}, {"OriginalTrackUrl": "http://x"})
+    assert await cache.get("get_track", "/track/", {"id": 1, "quality": "LOSSLESS"}) is None
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_dropped():
+    cache = ResponseCache(use_disk=False, ttls={"get_album": 1})
+    await cache.set("get_album", "/album/", {"id": 1}, {"title": "Album"})
+    cache._entries["/album/?id=1"] = (time.time() - 1, cache._entries["/album/?id=1"][1])
+
+    assert await cache.get("get_album", "/album/", {"id": 1}) is None
+    assert cache.stats()["expired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_respects_byte_bound():
+    cache = ResponseCache(use_disk=False, max_bytes=70)
+    await cache.set("get_album", "/album/", {"id": 1}, {"title": "a" * 20})
+    await cache.set("get_album", "/album/", {"id": 2}, {"title": "b" * 20})
+    await cache.get("get_album", "/album/", {"id": 1})
+    await cache.set("get_album", "/album/", {"id": 3}, {"title": "c" * 20})
+
+    assert await cache.get("get_album", "/album/", {"id": 2}) is None
+    assert await cache.get("get_album", "/album/", {"id": 1}) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_survives_restart(tmp_path):
+    cache = ResponseCache(disk_dir=tmp_path, use_disk=True)
+    await cache.set("get_artist", "/artist/", {"f": 7}, {"name": "Artist"})
+
+    restarted = ResponseCache(disk_dir=tmp_path, use_disk=True)
+    assert await restarted.get("get_artist", "/artist/", {"f": 7}) == {"name": "Artist"}
+    assert restarted.stats()["disk_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_tier_is_pruned_while_running(tmp_path):
+    cache = ResponseCache(disk_dir=tmp_path, use_disk=True, disk_max_entries=2, disk_prune_interval=0)
+    for artist_id in range(4):
+        await cache.set("get_artist", "/artist/", {"f": artist_id}, {"name": f"Artist {artist_id}"})
+        if cache._prune_task is not None:
+            await cache._prune_task
+
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    assert cache.stats()["disk_entries"] == 2
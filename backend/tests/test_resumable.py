@@ -0,0 +1,87 @@
+import json
+import aiohttp
+import pytest
+
+from api.services.resumable import (
+    DownloadError, fetch_resumable, part_path, sidecar_path, verify_audio_file
+)
+from stub_hifi import StubHifiServer, StubConfig
+
+
+@pytest.mark.asyncio
+async def test_interrupted_download_resumes_with_range(tmp_path):
+    size = 256 * 1024
+    target = tmp_path / "track.flac"
+    async with StubHifiServer(StubConfig(payload_size=size, cdn_errors={"truncate": 1.0})) as stub:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises((DownloadError, aiohttp.ClientPayloadError)):
+                await fetch_resumable(session, stub.stream_url(9), target)
+
+            assert not target.exists()
+            written = part_path(target).stat().st_size
+            sidecar = json.loads(sidecar_path(target).read_text())
+            assert sidecar["total_size"] == size
+            assert sidecar["bytes"] == written > 0
+
+            stub.config.cdn_errors = {}
+            served_before = stub.bytes_served
+            await fetch_resumable(session, stub.stream_url(9), target)
+
+        assert target.read_bytes() == stub.payload(9)
+        assert stub.bytes_served - served_before == size - written
+        assert not part_path(target).exists()
+        assert not sidecar_path(target).exists()
+
+
+@pytest.mark.asyncio
+async def test_expired_url_is_re_resolved(tmp_path):
+    target = tmp_path / "track.flac"
+    async with StubHifiServer(StubConfig(payload_size=256 * 1024)) as stub:
+        async def resolve():
+            return stub.stream_url(4)
+
+        async with aiohttp.ClientSession() as session:
+            await fetch_resumable(session, f"{stub.url}/cdn/expired", target, resolve_url=resolve)
+        assert target.read_bytes() == stub.payload(4)
+
+
+@pytest.mark.asyncio
+async def test_error_documents_are_never_promoted(tmp_path):
+    target = tmp_path / "track.flac"
+    async with StubHifiServer(StubConfig(cdn_errors={"xml": 1.0})) as stub:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(DownloadError) as excinfo:
+                await fetch_resumable(session, stub.stream_url(1), target)
+    assert not excinfo.value.resumable
+    assert not target.exists()
+
+
+def test_verify_audio_file(tmp_path):
+    good = tmp_path / "a.flac"
+    good.write_bytes(b"fLaC" + b"\0" * 100)
+    assert verify_audio_file(good, 104) is None
+    assert "size mismatch" in verify_audio_file(good, 200)
+
+    bad = tmp_path / "b.flac"
+    bad.write_bytes(b"<html>" + b"\0" * 100)
+    assert verify_audio_file(bad, 106) is not None
+
+
+def test_interrupted_queue_items_are_restored(tmp_path, monkeypatch):
+    import queue_manager as qm
+
+    state_file = tmp_path / "queue_state.json"
+    state_file.write_text(json.dumps({
+        "queue": [{"track_id": 2, "title": "Queued", "artist": "A"}],
+        "active": [{"track_id": 1, "title": "Active", "artist": "A"}],
+        "completed": [],
+        "failed": []
+    }))
+    monkeypatch.setattr(qm, "STATE_FILE", state_file)
+    manager = qm.queue_manager
+    monkeypatch.setattr(manager, "_queue", [])
+    monkeypatch.setattr(manager, "_completed", [])
+    monkeypatch.setattr(manager, "_failed", [])
+
+    manager._load_state()
+    assert [item.track_id for item in manager._queue] == [1, 2]
@@ -0,0 +1,78 @@
+import aiohttp
+import pytest
+
+from api.services import segmented
+from api.services.segmented import plan_segments, download_segmented, supports_segmented, SegmentError
+from stub_hifi import StubHifiServer, StubConfig
+
+
+def test_plan_segments_covers_file_without_overlap():
+    ranges = plan_segments(10_000_001, segments=4, min_segment_size=1_000_000)
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0 and ranges[-1][1] == 10_000_000
+    assert all(prev[1] + 1 == cur[0] for prev, cur in zip(ranges, ranges[1:]))
+
+
+def test_plan_segments_respects_minimum_size():
+    assert plan_segments(3_000, segments=8, min_segment_size=1_000) == [(0, 999), (1000, 1999), (2000, 2999)]
+    assert plan_segments(500, segments=8, min_segment_size=1_000) == [(0, 499)]
+
+
+@pytest.mark.asyncio
+async def test_segmented_download_matches_payload(tmp_path):
+    async with StubHifiServer(StubConfig(payload_size=1024 * 1024)) as stub:
+        progress = []
+        target = tmp_path / "track.flac"
+        async with aiohttp.ClientSession() as session:
+            async with session.get(stub.stream_url(7)) as probe:
+                assert supports_segmented(probe)
+            await download_segmented(
+                session, stub.stream_url(7), target, 1024 * 1024,
+                segments=4, min_segment_size=128 * 1024,
+                on_progress=lambda done, total: progress.append(done)
+            )
+        assert target.read_bytes() == stub.payload(7)
+        assert progress[-1] == 1024 * 1024
+        assert stub.requests["cdn"] == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_segments_are_retried_from_where_they_stopped(tmp_path, monkeypatch):
+    monkeypatch.setattr(segmented, "SEGMENT_RETRY_DELAY", 0)
+    config = StubConfig(payload_size=1024 * 1024, cdn_errors={"truncate": 0.4, "500": 0.2}, seed=3)
+    async with StubHifiServer(config) as stub:
+        target = tmp_path / "track.flac"
+        async with aiohttp.ClientSession() as session:
+            await download_segmented(
+                session, stub.stream_url(7), target, 1024 * 1024,
+                segments=4, min_segment_size=128 * 1024, retries=10
+            )
+        assert target.read_bytes() == stub.payload(7)
+        assert sum(stub.injected.values()) > 0
+
+
+@pytest.mark.asyncio
+async def test_segment_gives_up_after_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(segmented, "SEGMENT_RETRY_DELAY", 0)
+    async with StubHifiServer(StubConfig(payload_size=512 * 1024, cdn_errors={"500": 1.0})) as stub:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(SegmentError):
+                await download_segmented(
+                    session, stub.stream_url(7), tmp_path / "track.flac", 512 * 1024,
+                    segments=2, min_segment_size=128 * 1024, retries=1
+                )
+
+
+@pytest.mark.asyncio
+async def test_segment_writer_only_claims_bytes_that_landed(tmp_path):
+    target = tmp_path / "track.flac"
+    target.write_bytes(b"\0" * 100)
+    segment = [40, 99]
+    async with segmented.SegmentWriter(target, segment, buffer_size=16) as writer:
+        await writer.write(b"a" * 10)
+        assert segment[0] == 40
+        await writer.write(b"b" * 10)
+        await writer.write(b"c" * 20)
+        assert 40 < segment[0] < 80
+    assert segment == [80, 99]
+    assert target.read_bytes() == b"\0" * 40 + b"a" * 10 + b"b" * 10 + b"c" * 20 + b"\0" * 20
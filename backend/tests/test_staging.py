@@ -0,0 +1,106 @@
+import errno
+import pytest
+
+from api.services import files
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    monkeypatch.setattr(files, "DOWNLOAD_DIR", tmp_path)
+    return tmp_path
+
+
+METADATA = {'title': 'Song', 'artist': 'Artist', 'album': 'Album', 'track_number': 1,
+            'file_ext': '.opus', 'target_format': 'opus'}
+
+
+def test_track_and_sidecars_are_promoted_together(library):
+    staged = files.staging_path(42, "Artist - Song.opus")
+    staged.parent.mkdir(parents=True)
+    staged.write_bytes(b"OggS audio")
+    staged.with_suffix('.lrc').write_text("[00:01.00]la")
+
+    final = files._move_into_library(staged, dict(METADATA), "{Artist}/{Album}/{TrackNumber} - {Title}", True, b"jpeg")
+
+    assert final == library / "Artist" / "Album" / "01 - Song.opus"
+    assert final.read_bytes() == b"OggS audio"
+    assert final.with_suffix('.lrc').read_text() == "[00:01.00]la"
+    assert (final.parent / "cover.jpg").read_bytes() == b"jpeg"
+    assert list(staged.parent.iterdir()) == []
+
+    files.discard_staging(staged)
+    assert not staged.parent.exists()
+
+
+def test_promote_copies_across_filesystems(library, monkeypatch):
+    source, target = library / "a.flac", library / "sub" / "a.flac"
+    source.write_bytes(b"fLaC")
+    target.parent.mkdir()
+    real_replace = files.os.replace
+
+    def replace(src, dst):
+        if src == source:
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(files.os, "replace", replace)
+    files.promote(source, target)
+
+    assert target.read_bytes() == b"fLaC"
+    assert not source.exists()
+    assert list(target.parent.iterdir()) == [target]
+
+
+def test_orphaned_staging_dirs_are_removed(library):
+    for track_id in (1, 2, 3):
+        files.staging_path(track_id, "x.flac.part").parent.mkdir(parents=True)
+
+    assert files.cleanup_staging({2}) == 2
+    assert [d.name.split("-")[0] for d in files.staging_dir().iterdir()] == ["2"]
+
+
+def test_jobs_for_the_same_track_stage_apart(library):
+    first = files.staging_path(7, "Artist - Song.flac")
+    second = files.staging_path(7, "Artist - Song.flac")
+    assert first.parent != second.parent
+
+    first.parent.mkdir(parents=True)
+    (first.parent / "Artist - Song.flac.part").write_bytes(b"fLaC")
+    files.discard_staging(second)
+    assert first.parent.exists()
+
+    # Once the first job lets go, a retry picks up its partial download
+    files.release_staging(first)
+    assert files.staging_path(7, "Artist - Song.flac") == first
+
+
+@pytest.mark.asyncio
+async def test_track_leaves_staging_when_it_cannot_be_organized(library, monkeypatch):
+    staged = files.staging_path(42, "Artist - Song.flac")
+    staged.parent.mkdir(parents=True)
+    staged.write_bytes(b"fLaC")
+
+    def broken(*args):
+        raise OSError("disk on fire")
+
+    monkeypatch.setattr(files, "_move_into_library", broken)
+    final = await files.organize_file_by_metadata(staged, dict(METADATA, target_format=None))
+
+    assert final == library / "Artist - Song.flac"
+    assert final.read_bytes() == b"fLaC"
+    files.discard_staging(staged)
+    assert final.exists()
+
+
+def test_track_is_promoted_after_its_sidecars(library, monkeypatch):
+    staged = files.staging_path(42, "Artist - Song.opus")
+    staged.parent.mkdir(parents=True)
+    staged.write_bytes(b"OggS audio")
+    staged.with_suffix('.lrc').write_text("[00:01.00]la")
+    order = []
+    real_promote = files.promote
+    monkeypatch.setattr(files, "promote", lambda source, target: (order.append(target.name), real_promote(source, target)))
+
+    files._move_into_library(staged, dict(METADATA), "{Artist}/{Album}/{TrackNumber} - {Title}", True, b"jpeg")
+
+    assert order == ["01 - Song.lrc", "cover.jpg", "01 - Song.opus"]
@@ -0,0 +1,78 @@
+import sys
+import aiohttp
+import pytest
+
+import api.services.streaming as streaming
+from api.services.resumable import DownloadError, part_path
+from stub_hifi import StubHifiServer, StubConfig
+
+# Stands in for FFmpeg: copies stdin to the output file, slowly enough to push back
+COPY_ENCODER = (
+    "import sys, time\n"
+    "out = open(sys.argv[1], 'wb')\n"
+    "while True:\n"
+    "    block = sys.stdin.buffer.read(65536)\n"
+    "    if not block: break\n"
+    "    out.write(block); time.sleep(0.001)\n"
+)
+FAILING_ENCODER = "import sys; sys.stderr.write('Invalid data found when processing input'); sys.exit(1)"
+
+
+def use_encoder(monkeypatch, script):
+    monkeypatch.setattr(
+        streaming, "encoder_command",
+        lambda target_format, bitrate, output: [sys.executable, "-c", script, str(output)]
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_is_piped_to_encoder_and_teed(tmp_path, monkeypatch):
+    use_encoder(monkeypatch, COPY_ENCODER)
+    target, master = tmp_path / "track.mp3", tmp_path / "track.flac"
+    progress = []
+    async with StubHifiServer(StubConfig(payload_size=1024 * 1024)) as stub:
+        async with aiohttp.ClientSession() as session:
+            await streaming.stream_transcode(
+                session, stub.stream_url(3), target, "mp3", 256,
+                on_progress=lambda done, total: progress.append(done), master_path=master
+            )
+
+    assert target.read_bytes() == stub.payload(3)
+    assert master.read_bytes() == stub.payload(3)
+    assert progress[-1] == len(stub.payload(3))
+    assert not part_path(target).exists() and not part_path(master).exists()
+
+
+@pytest.mark.asyncio
+async def test_encoder_failure_leaves_nothing_behind(tmp_path, monkeypatch):
+    use_encoder(monkeypatch, FAILING_ENCODER)
+    target, master = tmp_path / "track.opus", tmp_path / "track.flac"
+    async with StubHifiServer(StubConfig(payload_size=1024 * 1024)) as stub:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(DownloadError, match="Invalid data"):
+                await streaming.stream_transcode(session, stub.stream_url(3), target, "opus", 192, master_path=master)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_truncated_download_is_not_encoded(tmp_path, monkeypatch):
+    use_encoder(monkeypatch, COPY_ENCODER)
+    target = tmp_path / "track.mp3"
+    async with StubHifiServer(StubConfig(payload_size=512 * 1024, cdn_errors={"truncate": 1.0})) as stub:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises((DownloadError, aiohttp.ClientPayloadError)):
+                await streaming.stream_transcode(session, stub.stream_url(3), target, "mp3", 256)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_stream_errors_are_not_resumable(tmp_path, monkeypatch):
+    use_encoder(monkeypatch, COPY_ENCODER)
+    async with StubHifiServer(StubConfig(cdn_errors={"500": 1.0})) as stub:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(DownloadError) as error:
+                await streaming.stream_transcode(session, stub.stream_url(3), tmp_path / "track.mp3", "mp3", 256)
+
+    assert not error.value.resumable
@@ -0,0 +1,58 @@
+import aiohttp
+import pytest
+
+from stub_hifi import StubHifiServer, StubConfig
+from api.utils.extraction import extract_stream_url
+
+
+@pytest.mark.asyncio
+async def test_client_resolves_and_fetches_from_stub(offline_client, stub_hifi):
+    offline_client.endpoints = [stub_hifi.endpoint()]
+    try:
+        track = await offline_client.get_track(1234, "LOSSLESS")
+        url = extract_stream_url(track)
+        assert url == stub_hifi.stream_url(1234)
+
+        album = await offline_client.get_album(123)
+        assert len(album["items"]) == 10
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as response:
+                body = await response.read()
+            async with session.get(url, headers={"Range": "bytes=100-199"}) as response:
+                assert response.status == 206
+                assert response.headers["Content-Range"] == f"bytes 100-199/{len(body)}"
+                assert await response.read() == body[100:200]
+        assert body.startswith(b"fLaC")
+        assert body == stub_hifi.payload(1234)
+    finally:
+        await offline_client.close()
+
+
+@pytest.mark.asyncio
+async def test_injected_api_errors_fail_over(offline_client):
+    config = StubConfig(api_errors={"500": 1.0})
+    async with StubHifiServer(config) as broken, StubHifiServer(StubConfig(stream_style="original")) as healthy:
+        offline_client.endpoints = [broken.endpoint("broken", 1), healthy.endpoint("healthy", 2)]
+        try:
+            track = await offline_client.get_track(1, "LOSSLESS")
+            assert track["OriginalTrackUrl"] == healthy.stream_url(1)
+            assert broken.injected == {"500": 1}
+        finally:
+            await offline_client.close()
+
+
+@pytest.mark.asyncio
+async def test_cdn_error_injection():
+    config = StubConfig(cdn_errors={"truncate": 1.0}, payload_size=512 * 1024)
+    async with StubHifiServer(config) as stub:
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(aiohttp.ClientPayloadError):
+                async with session.get(stub.stream_url(1)) as response:
+                    await response.read()
+
+        stub.config.cdn_errors = {"xml": 1.0}
+        async with aiohttp.ClientSession() as session:
+            async with session.get(stub.stream_url(1)) as response:
+                assert "xml" in response.headers["Content-Type"]
+                assert b"<Error>" in await response.read()
@@ -0,0 +1,75 @@
+import pytest
+from mutagen.flac import FLAC
+from mutagen.mp3 import MP3
+
+import api.services.audio as audio
+import api.services.lyrics as lyrics
+from lyrics_client import LyricsResult
+from stub_hifi import synthetic_flac
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417-byte frames
+MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+METADATA = {
+    'title': 'Song', 'artist': 'Artist', 'album': 'Album', 'date': '2020',
+    'track_number': 3, 'total_tracks': 12, 'disc_number': 1,
+    'musicbrainz_trackid': 'mbid', 'tidal_track_id': '123',
+    'cover_url': 'http://covers/1.jpg',
+}
+
+
+@pytest.fixture
+def saves(monkeypatch):
+    counts = {}
+    for cls in (FLAC, MP3):
+        original = cls.save
+
+        def save(self, *args, original=original, **kwargs):
+            counts[type(self).__name__] = counts.get(type(self).__name__, 0) + 1
+            return original(self, *args, **kwargs)
+
+        monkeypatch.setattr(cls, "save", save)
+
+    async def get_cover(url):
+        return b"\xff\xd8jpeg"
+
+    async def get_lyrics(metadata):
+        return LyricsResult(plain_lyrics="la la la")
+
+    monkeypatch.setattr(audio, "get_cover", get_cover)
+    monkeypatch.setattr(lyrics, "get_lyrics", get_lyrics)
+    return counts
+
+
+@pytest.mark.asyncio
+async def test_mp3_tags_are_written_in_one_save(tmp_path, saves):
+    path = tmp_path / "track.mp3"
+    path.write_bytes(MP3_FRAME * 20)
+
+    await audio.write_mp3_metadata(path, dict(METADATA))
+
+    assert saves == {'MP3': 1}
+    tags = MP3(str(path)).tags
+    assert tags['TIT2'].text == ['Song']
+    assert tags['TRCK'].text == ['3/12']
+    assert tags['TPOS'].text == ['1']
+    assert tags['TXXX:MusicBrainz Release Track Id'].text == ['mbid']
+    assert tags['TXXX:TIDAL_TRACK_ID'].text == ['123']
+    assert tags.getall('USLT')[0].text == 'la la la'
+    assert tags.getall('APIC')[0].data == b"\xff\xd8jpeg"
+
+
+@pytest.mark.asyncio
+async def test_flac_retag_replaces_the_cover_in_one_save(tmp_path, saves):
+    path = tmp_path / "track.flac"
+    path.write_bytes(synthetic_flac(1, 4096))
+
+    await audio.write_flac_metadata(path, dict(METADATA))
+    await audio.write_flac_metadata(path, dict(METADATA))
+
+    assert saves == {'FLAC': 2}
+    flac = FLAC(str(path))
+    assert flac['TITLE'] == ['Song']
+    assert flac['TRACKNUMBER'] == ['3']
+    assert flac['LYRICS'] == ['la la la']
+    assert [picture.data for picture in flac.pictures] == [b"\xff\xd8jpeg"]
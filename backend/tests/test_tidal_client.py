@@ -0,0 +1,403 @@
+import time
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from tidal_client import TidalAPIClient, SyncTidalAPIClient
+
+
+def make_endpoint_app(status=200, payload=None, delay=0):
+    async def handler(request):
+        if delay:
+            await asyncio.sleep(delay)
+        if status != 200:
+            return web.Response(status=status)
+        return web.json_response(payload)
+
+    app = web.Application()
+    app.router.add_get("/search/", handler)
+    app.router.add_get("/track/", handler)
+    return app
+
+
+async def no_remote_endpoints(self):
+    return None
+
+
+def endpoint_for(server, name, priority):
+    return {
+        "name": name,
+        "url": str(server.make_url("")).rstrip("/"),
+        "priority": priority,
+        "provider": "test"
+    }
+
+
+@pytest.mark.asyncio
+async def test_make_request_fails_over_to_next_endpoint(offline_client):
+    broken = TestServer(make_endpoint_app(status=500))
+    healthy = TestServer(make_endpoint_app(payload={"version": "2.0", "data": {"OriginalTrackUrl": "http://cdn/x.flac"}}))
+    await broken.start_server()
+    await healthy.start_server()
+    try:
+        offline_client.endpoints = [
+            endpoint_for(broken, "broken", 1),
+            endpoint_for(healthy, "healthy", 2),
+        ]
+        result = await offline_client.get_track(1, "LOSSLESS")
+        assert result == {"OriginalTrackUrl": "http://cdn/x.flac"}
+        assert offline_client.success_history["get_track"]["name"] == "healthy"
+    finally:
+        await offline_client.close()
+        await broken.close()
+        await healthy.close()
+
+
+@pytest.mark.asyncio
+async def test_empty_search_result_is_not_a_success(offline_client):
+    empty = TestServer(make_endpoint_app(payload={"tracks": {"items": []}}))
+    full = TestServer(make_endpoint_app(payload={"tracks": {"items": [{"id": 1}]}}))
+    await empty.start_server()
+    await full.start_server()
+    try:
+        offline_client.endpoints = [
+            endpoint_for(empty, "empty", 1),
+            endpoint_for(full, "full", 2),
+        ]
+        result = await offline_client.search_tracks("anything")
+        assert result == {"tracks": {"items": [{"id": 1}]}}
+    finally:
+        await offline_client.close()
+        await empty.close()
+        await full.close()
+
+
+@pytest.mark.asyncio
+async def test_all_endpoints_failing_returns_none(offline_client):
+    broken = TestServer(make_endpoint_app(status=404))
+    await broken.start_server()
+    try:
+        offline_client.endpoints = [endpoint_for(broken, "broken", 1)]
+        assert await offline_client.get_track(1) is None
+    finally:
+        await offline_client.close()
+        await broken.close()
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_returns_fastest_valid_response(offline_client):
+    slow = TestServer(make_endpoint_app(payload={"tracks": {"items": [{"id": "slow"}]}}, delay=3))
+    fast = TestServer(make_endpoint_app(payload={"tracks": {"items": [{"id": "fast"}]}}))
+    await slow.start_server()
+    await fast.start_server()
+    try:
+        offline_client.hedge_requests = True
+        offline_client.hedge_delay = 0.1
+        offline_client.endpoints = [
+            endpoint_for(slow, "slow", 1),
+            endpoint_for(fast, "fast", 2),
+        ]
+        started = time.monotonic()
+        result = await offline_client.search_tracks("anything")
+        assert result == {"tracks": {"items": [{"id": "fast"}]}}
+        assert time.monotonic() - started < 2
+    finally:
+        await offline_client.close()
+        await slow.close()
+        await fast.close()
+
+
+def test_hedge_delay_uses_p90_latency(offline_client):
+    endpoint = {"name": "ep", "url": "http://ep", "priority": 1}
+    offline_client.hedge_delay = None
+    for elapsed in [0.3] * 9 + [5.0]:
+        offline_client.health.record_success("ep", None, elapsed)
+    assert offline_client._get_hedge_delay(endpoint) == pytest.approx(0.3)
+
+
+def test_failing_endpoint_is_ranked_last_then_skipped(offline_client):
+    offline_client.endpoints = [
+        {"name": "flaky", "url": "http://flaky", "priority": 1},
+        {"name": "steady", "url": "http://steady", "priority": 2},
+    ]
+    assert [ep["name"] for ep in offline_client._rank_endpoints("get_track")] == ["flaky", "steady"]
+
+    offline_client.health.record_failure("flaky", "get_track", "timeout", 10.0)
+    assert [ep["name"] for ep in offline_client._rank_endpoints("get_track")] == ["steady", "flaky"]
+
+    offline_client.health.record_failure("flaky", "get_track", "timeout", 10.0)
+    offline_client.health.record_failure("flaky", "get_track", "timeout", 10.0)
+    assert [ep["name"] for ep in offline_client._rank_endpoints("get_track")] == ["steady"]
+    assert offline_client._last_routing["get_track"]["skipped"] == ["flaky"]
+
+
+def test_circuit_half_opens_after_cooldown(offline_client, monkeypatch):
+    import endpoint_health
+
+    for _ in range(endpoint_health.FAILURE_THRESHOLD):
+        offline_client.health.record_failure("ep", None, "error")
+    assert not offline_client.health.is_available("ep")
+
+    stats = offline_client.health._get("ep")
+    stats.opened_at -= stats.cooldown
+    assert offline_client.health.is_available("ep")
+
+    offline_client.health.begin("ep")
+    assert stats.state == endpoint_health.HALF_OPEN
+    assert not offline_client.health.is_available("ep")
+
+    offline_client.health.record_success("ep", None, 0.2)
+    assert stats.state == endpoint_health.CLOSED
+
+
+def test_last_successful_endpoint_is_preferred_on_ties(offline_client):
+    offline_client.endpoints = [
+        {"name": "first", "url": "http://first", "priority": 1},
+        {"name": "second", "url": "http://second", "priority": 2},
+    ]
+    offline_client._record_success(offline_client.endpoints[1], "get_album")
+    assert offline_client._rank_endpoints("get_album")[0]["name"] == "second"
+
+
+def test_sync_shim_exposes_blocking_methods(tmp_path, monkeypatch):
+    monkeypatch.setattr(TidalAPIClient, "_fetch_endpoints_from_remote", no_remote_endpoints)
+    client = SyncTidalAPIClient(cache_dir=tmp_path)
+    try:
+        client.endpoints = []
+        assert client.get_track(1) is None
+        assert client.get_download_status(1) is None
+    finally:
+        client.close()
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_requests_share_one_upstream_call(offline_client):
+    calls = []
+
+    async def handler(request):
+        calls.append(request.query_string)
+        await asyncio.sleep(0.2)
+        return web.json_response({"OriginalTrackUrl": "http://cdn/x.flac"})
+
+    app = web.Application()
+    app.router.add_get("/track/", handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        offline_client.endpoints = [endpoint_for(server, "only", 1)]
+        results = await asyncio.gather(*(offline_client.get_track(5) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert all(r == {"OriginalTrackUrl": "http://cdn/x.flac"} for r in results)
+        assert len({id(r) for r in results}) == 5
+
+        stats = offline_client.single_flight.stats()
+        assert stats["upstream_requests"] == 1
+        assert stats["coalesced_requests"] == 4
+    finally:
+        await offline_client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_endpoint_is_routed_around(offline_client):
+    limited_calls = []
+
+    async def limited(request):
+        limited_calls.append(1)
+        return web.Response(status=429, headers={"Retry-After": "60"})
+
+    app = web.Application()
+    app.router.add_get("/track/", limited)
+    limited_server = TestServer(app)
+    healthy = TestServer(make_endpoint_app(payload={"OriginalTrackUrl": "http://cdn/x.flac"}))
+    await limited_server.start_server()
+    await healthy.start_server()
+    try:
+        offline_client.endpoints = [
+            endpoint_for(limited_server, "limited", 1),
+            endpoint_for(healthy, "healthy", 2),
+        ]
+        started = time.monotonic()
+        assert await offline_client.get_track(1) is not None
+        assert await offline_client.get_track(2) is not None
+        assert time.monotonic() - started < 2
+
+        # The second request skipped the blocked instance instead of waiting on it
+        assert len(limited_calls) == 1
+        assert offline_client.rate_limiter.wait_time("limited") > 50
+    finally:
+        await offline_client.close()
+        await limited_server.close()
+        await healthy.close()
+
+
+INSTANCES = {"api": {"community": {"urls": ["https://alpha.example/", "https://beta.example"]}}}
+
+
+@pytest.mark.asyncio
+async def test_discovery_uses_conditional_requests(tmp_path, monkeypatch):
+    import tidal_client
+
+    seen_headers = []
+
+    async def instances(request):
+        seen_headers.append(dict(request.headers))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return web.Response(status=304)
+        return web.json_response(INSTANCES, headers={"ETag": '"v1"'})
+
+    app = web.Application()
+    app.router.add_get("/instances.json", instances)
+    server = TestServer(app)
+    await server.start_server()
+    monkeypatch.setattr(tidal_client, "ENDPOINTS_URL", str(server.make_url("/instances.json")))
+    client = TidalAPIClient(cache_dir=tmp_path)
+    try:
+        assert client.endpoints == []
+        await client.refresh_endpoints()
+        assert [ep["name"] for ep in client.endpoints] == ["alpha", "beta"]
+        saved_mtime = client.cache_file.stat().st_mtime_ns
+        saved_content = client.cache_file.read_text()
+
+        await client.refresh_endpoints()
+        assert seen_headers[-1].get("If-None-Match") == '"v1"'
+        assert client.cache_file.read_text() == saved_content
+        assert client.cache_file.stat().st_mtime_ns >= saved_mtime
+    finally:
+        await client.close()
+        await server.close()
+
+    # A restart serves the cached list immediately and keeps the validator
+    restarted = TidalAPIClient(cache_dir=tmp_path)
+    assert [ep["name"] for ep in restarted.endpoints] == ["alpha", "beta"]
+    assert restarted._endpoints_etag == '"v1"'
+
+
+@pytest.mark.asyncio
+async def test_bulk_resolution_reports_per_track_results(offline_client):
+    in_flight = []
+    peak = []
+
+    async def handler(request):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.05)
+        in_flight.pop()
+        if request.query["id"] == "3":
+            return web.Response(status=404)
+        return web.json_response({"OriginalTrackUrl": f"http://cdn/{request.query['id']}.flac"})
+
+    app = web.Application()
+    app.router.add_get("/track/", handler)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        offline_client.endpoints = [endpoint_for(server, "only", 1)]
+        results = await offline_client.get_tracks_bulk([1, 2, 3, 4, 5, 1], concurrency=2)
+
+        assert sorted(results) == [1, 2, 3, 4, 5]
+        assert results[1] == {"data": {"OriginalTrackUrl": "http://cdn/1.flac"}, "error": None}
+        assert results[3]["data"] is None and results[3]["error"]
+        assert max(peak) <= 2
+    finally:
+        await offline_client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_track_metadata_is_served_from_harvested_responses(offline_client):
+    searches = []
+
+    async def search(request):
+        searches.append(request.query_string)
+        return web.json_response({"tracks": {"items": [
+            {"id": 11, "title": "Other", "trackNumber": 1},
+            {"id": 42, "title": "Wanted", "trackNumber": 3, "streamStartDate": "2021-05-01T00:00:00.000+0000"},
+        ]}})
+
+    app = web.Application()
+    app.router.add_get("/search/", search)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        offline_client.endpoints = [endpoint_for(server, "only", 1)]
+        offline_client.cache.enabled = False
+        await offline_client.search_tracks("anything")
+        assert len(searches) == 1
+
+        track = await offline_client.get_track_metadata(42)
+        assert track["title"] == "Wanted"
+        assert track["streamStartDate"].startswith("2021-05-01")
+        assert len(searches) == 1
+    finally:
+        await offline_client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_stored_track_without_a_date_is_searched_again(offline_client):
+    searches = []
+
+    async def search(request):
+        searches.append(request.query_string)
+        track = {"id": 42, "title": "Wanted", "trackNumber": 3}
+        if len(searches) > 1:
+            track["streamStartDate"] = "2021-05-01T00:00:00.000+0000"
+        return web.json_response({"tracks": {"items": [track]}})
+
+    app = web.Application()
+    app.router.add_get("/search/", search)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        offline_client.endpoints = [endpoint_for(server, "only", 1)]
+        offline_client.cache.enabled = False
+        await offline_client.search_tracks("anything")
+        assert "streamStartDate" not in offline_client.entities.get_track(42)
+
+        track = await offline_client.get_track_metadata(42)
+        assert track["streamStartDate"].startswith("2021-05-01")
+        assert len(searches) == 2
+    finally:
+        await offline_client.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_harvesting_does_not_block_the_event_loop(offline_client, monkeypatch):
+    async def search(request):
+        return web.json_response({"tracks": {"items": [{"id": 7, "title": "Slow", "trackNumber": 1}]}})
+
+    app = web.Application()
+    app.router.add_get("/search/", search)
+    server = TestServer(app)
+    await server.start_server()
+    harvest = offline_client.entities.harvest
+
+    def slow_harvest(data):
+        time.sleep(0.3)
+        return harvest(data)
+
+    monkeypatch.setattr(offline_client.entities, "harvest", slow_harvest)
+    ticks = 0
+    stop = asyncio.Event()
+
+    async def tick():
+        nonlocal ticks
+        while not stop.is_set():
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    try:
+        offline_client.endpoints = [endpoint_for(server, "only", 1)]
+        ticker = asyncio.create_task(tick())
+        await offline_client.search_tracks("slow")
+        stop.set()
+        await ticker
+        assert ticks >= 10
+        assert offline_client.entities.get_track(7)["title"] == "Slow"
+    finally:
+        await offline_client.close()
+        await server.close()
@@ -0,0 +1,55 @@
+import os
+import time
+import asyncio
+import pytest
+
+import transcode_workers as tw
+from transcode_workers import TranscodePool
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """An `ffmpeg` that reports its niceness on stderr and takes 0.2s"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "ffmpeg"
+    script.write_text("#!/bin/sh\nnice >&2\nsleep 0.2\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(tw, "TRANSCODE_NICE", 10)
+    return script
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_bounded_and_run_niced(tmp_path, fake_ffmpeg):
+    pool = TranscodePool(workers=2)
+    source = tmp_path / "track.flac"
+    source.write_bytes(b"\x00" * 100)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(pool.run(["ffmpeg", "-i", str(source)], "opus", source) for _ in range(4)))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed >= 0.4
+    base = os.nice(0)
+    assert all(code == 0 and int(stderr) == min(19, base + 10) for code, stderr in results)
+
+    stats = pool.stats()
+    assert stats['concurrency'] == 2
+    assert stats['max_queued'] == 2
+    assert stats['running'] == 0 and stats['queued'] == 0
+    assert stats['completed'] == 4
+    assert stats['kinds']['opus']['jobs'] == 4
+    assert stats['kinds']['opus']['avg_encode_seconds'] >= 0.2
+    assert stats['recent'][0]['input_bytes'] == 100
+
+
+@pytest.mark.asyncio
+async def test_missing_ffmpeg_raises_file_not_found(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", str(tmp_path))
+    pool = TranscodePool(workers=1)
+
+    with pytest.raises(FileNotFoundError):
+        await pool.run(["ffmpeg", "-version"], "mp3")
+    assert pool.stats()['failed'] == 1
+    assert pool.stage.running == 0
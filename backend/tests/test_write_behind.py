@@ -0,0 +1,48 @@
+import pytest
+
+from api.services.write_behind import WriteBehindFile, read_size
+
+
+def test_read_size_scales_with_the_file():
+    assert read_size(0) == 256 * 1024
+    assert read_size(4 * 1024 * 1024) == 256 * 1024
+    assert read_size(32 * 1024 * 1024) == 512 * 1024
+    assert read_size(1024 * 1024 * 1024) == 1024 * 1024
+
+
+@pytest.mark.asyncio
+async def test_buffered_writes_reach_the_file(tmp_path):
+    path = tmp_path / "track.flac.part"
+    flushes = []
+
+    async with WriteBehindFile(path, buffer_size=1000, on_flush=flushes.append) as writer:
+        for i in range(25):
+            await writer.write(bytes([i]) * 100)
+
+    assert path.read_bytes() == b"".join(bytes([i]) * 100 for i in range(25))
+    assert writer.flushed == 2500
+    assert flushes[-1] == 2500
+    assert flushes == sorted(flushes)
+
+
+@pytest.mark.asyncio
+async def test_preallocated_file_is_cut_back_on_an_early_close(tmp_path):
+    path = tmp_path / "track.flac.part"
+
+    async with WriteBehindFile(path, total_size=10000, buffer_size=1000) as writer:
+        await writer.write(b"x" * 3000)
+
+    assert path.stat().st_size == 3000
+    assert writer.flushed == 3000
+
+
+@pytest.mark.asyncio
+async def test_resume_drops_bytes_past_the_offset(tmp_path):
+    path = tmp_path / "track.flac.part"
+    path.write_bytes(b"a" * 500 + b"\x00" * 1500)
+
+    async with WriteBehindFile(path, offset=500, total_size=2000) as writer:
+        await writer.write(b"b" * 700)
+
+    assert path.read_bytes() == b"a" * 500 + b"b" * 700
+    assert writer.flushed == 1200
@@ -1,15 +1,51 @@
+import os
 import json
 import time
+import asyncio
 import logging
 from pathlib import Path
 from typing import List, Dict, Optional
-import requests
+import aiohttp
+
+from endpoint_health import EndpointHealthTracker
+from response_cache import ResponseCache, make_cache_key
+from single_flight import SingleFlight
+from entity_store import EntityStore
+from file_workers import file_workers
+from rate_limiter import EndpointRateLimiter, parse_retry_after
 
 
 ENDPOINTS_URL = "https://raw.githubusercontent.com/EduardPrigoana/hifi-instances/refs/heads/main/instances.json"
 
 
 CACHE_TTL = 3600
+ENDPOINT_RETRY_INTERVAL = 60
+
+REQUEST_TIMEOUT = 10
+POOL_LIMIT = 100
+POOL_LIMIT_PER_HOST = 10
+DNS_CACHE_TTL = 300
+
+# Hedged requests: if the preferred endpoint has not answered after the hedge
+# delay, the same request is also sent to the next endpoint and the first
+# valid response wins. "auto" uses the p90 latency of the preferred endpoint.
+# Opt-in: the instances are run by volunteers, and every hedge is an extra
+# request against their rate limits.
+HEDGE_REQUESTS = os.getenv("TIDAL_HEDGE_REQUESTS", "false").lower() == "true"
+HEDGE_DELAY = os.getenv("TIDAL_HEDGE_DELAY", "auto")
+HEDGE_DEFAULT_DELAY = 1.5
+HEDGE_MIN_DELAY = 0.25
+HEDGE_MAX_IN_FLIGHT = int(os.getenv("TIDAL_HEDGE_MAX_IN_FLIGHT", "3"))
+LATENCY_MIN_SAMPLES = 5
+
+# Concurrent get_track calls made by get_tracks_bulk
+BULK_CONCURRENCY = int(os.getenv("TIDAL_BULK_CONCURRENCY", "8"))
+
+# Longest an attempt will wait for a rate-limit token before giving up on
+# that endpoint.
+RATE_LIMIT_MAX_WAIT = float(os.getenv("TIDAL_RATE_LIMIT_MAX_WAIT", "30"))
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 
 logger = logging.getLogger(__name__)
 
@@ -24,33 +60,59 @@ class TidalAPIClient:
         self.cache_dir.mkdir(exist_ok=True)
         self.cache_file = self.cache_dir / "endpoints_cache.json"
         
-
-        self._endpoints_cache = None
-        self._cache_timestamp = None
-        
-        self.endpoints = self._load_endpoints()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        # Serve whatever the disk cache has straight away, however old; the
+        # list is refreshed in the background (see start_endpoint_refresh).
+        self._cache_timestamp = 0.0
+        self._endpoints_etag: Optional[str] = None
+        self._endpoints_last_modified: Optional[str] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.endpoints = self._load_cached_endpoints() or []
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
         self.success_history = {}
         self.download_status_cache = {}
+        
+        self.hedge_requests = HEDGE_REQUESTS
+        self.hedge_delay = None if HEDGE_DELAY == "auto" else float(HEDGE_DELAY)
+        self.health = EndpointHealthTracker()
+        self.cache = ResponseCache(disk_dir=self.cache_dir / "responses")
+        self.single_flight = SingleFlight()
+        self.entities = EntityStore(self.cache_dir / "entities.db")
+        self.rate_limiter = EndpointRateLimiter()
+        self._last_routing: Dict[str, Dict] = {}
     
-    def _fetch_endpoints_from_remote(self) -> Optional[List[Dict]]:
+    async def _fetch_endpoints_from_remote(self) -> Optional[List[Dict]]:
+        """
+        Conditional GET of the instance list. Returns the parsed endpoints,
+        or None if the list is unchanged (304) or could not be fetched.
+        """
+        headers = {}
+        if self._endpoints_etag:
+            headers['If-None-Match'] = self._endpoints_etag
+        if self._endpoints_last_modified:
+            headers['If-Modified-Since'] = self._endpoints_last_modified
+        
         try:
             logger.info(f"Fetching endpoints from {ENDPOINTS_URL}")
-            response = requests.get(ENDPOINTS_URL, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            session = await self._get_session()
+            async with session.get(ENDPOINTS_URL, headers=headers) as response:
+                if response.status == 304:
+                    logger.info("Endpoint list not modified since last check")
+                    self._mark_endpoints_checked()
+                    return None
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+                self._endpoints_etag = response.headers.get('ETag')
+                self._endpoints_last_modified = response.headers.get('Last-Modified')
             
             endpoints = self._parse_endpoints_json(data)
             logger.info(f"Successfully fetched {len(endpoints)} endpoints from remote")
             return endpoints
             
-        except requests.exceptions.RequestException as e:
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             logger.warning(f"Failed to fetch endpoints from remote: {e}")
             return None
-        except (json.JSONDecodeError, KeyError) as e:
+        except (ValueError, KeyError, AttributeError) as e:
             logger.warning(f"Failed to parse remote endpoints JSON: {e}")
             return None
     
@@ -94,15 +156,16 @@ class TidalAPIClient:
         try:
             with open(self.cache_file, 'r') as f:
                 cache_data = json.load(f)
-                
-            cache_time = cache_data.get('timestamp', 0)
-            if time.time() - cache_time < CACHE_TTL:
-                endpoints = cache_data.get('endpoints', [])
-                logger.info(f"Loaded {len(endpoints)} endpoints from disk cache")
-                return endpoints
-            else:
-                logger.info("Disk cache expired")
-                return None
+            
+            # A 304 only touches the file, so the mtime records the last check
+            self._cache_timestamp = max(cache_data.get('timestamp', 0), self.cache_file.stat().st_mtime)
+            self._endpoints_etag = cache_data.get('etag')
+            self._endpoints_last_modified = cache_data.get('last_modified')
+            
+            endpoints = cache_data.get('endpoints', [])
+            age = time.time() - self._cache_timestamp
+            logger.info(f"Loaded {len(endpoints)} endpoints from disk cache ({'stale' if age >= CACHE_TTL else 'fresh'}, {int(age)}s old)")
+            return endpoints
                 
         except Exception as e:
             logger.warning(f"Failed to load cached endpoints: {e}")
@@ -112,47 +175,93 @@ class TidalAPIClient:
         try:
             cache_data = {
                 'timestamp': time.time(),
+                'etag': self._endpoints_etag,
+                'last_modified': self._endpoints_last_modified,
                 'endpoints': endpoints
             }
-            with open(self.cache_file, 'w') as f:
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
                 json.dump(cache_data, f, indent=2)
+            os.replace(tmp_file, self.cache_file)
             logger.info(f"Saved {len(endpoints)} endpoints to disk cache")
         except Exception as e:
             logger.warning(f"Failed to save endpoints to cache: {e}")
     
-    def _is_cache_valid(self) -> bool:
-        if self._endpoints_cache is None or self._cache_timestamp is None:
-            return False
-        return time.time() - self._cache_timestamp < CACHE_TTL
+    def _mark_endpoints_checked(self):
+        self._cache_timestamp = time.time()
+        try:
+            if self.cache_file.exists():
+                os.utime(self.cache_file)
+        except OSError as e:
+            logger.debug(f"Failed to touch endpoints cache: {e}")
     
-    def _load_endpoints(self) -> List[Dict]:
-        if self._is_cache_valid():
-            logger.info("Using in-memory cached endpoints")
-            return self._endpoints_cache
-        
-        endpoints = self._fetch_endpoints_from_remote()
+    async def refresh_endpoints(self):
+        """Re-check the instance list and only rewrite the cache if it changed"""
+        endpoints = await self._fetch_endpoints_from_remote()
+        if endpoints is None:
+            return
         
         if not endpoints:
-             endpoints = self._load_cached_endpoints()
-            
-        if endpoints:
+            logger.warning("Remote endpoint list is empty, keeping the current list")
+            return
+        
+        if endpoints != self.endpoints or not self.cache_file.exists():
+            self.endpoints = endpoints
             self._save_cached_endpoints(endpoints)
+        else:
+            logger.info("Endpoint list unchanged")
+        self._mark_endpoints_checked()
+    
+    async def _endpoint_refresh_loop(self):
+        while True:
+            age = time.time() - self._cache_timestamp
+            if age >= CACHE_TTL:
+                try:
+                    await self.single_flight.do(('endpoint_discovery',), self.refresh_endpoints)
+                except Exception as e:
+                    logger.warning(f"Endpoint refresh failed: {e}")
             
-        self._endpoints_cache = endpoints or []
-        self._cache_timestamp = time.time()
-        return self._endpoints_cache
+            remaining = CACHE_TTL - (time.time() - self._cache_timestamp)
+            await asyncio.sleep(max(remaining, ENDPOINT_RETRY_INTERVAL))
+    
+    def start_endpoint_refresh(self):
+        """Refresh the instance list now if stale, then every CACHE_TTL seconds"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._endpoint_refresh_loop())
+    
+    async def _ensure_endpoints(self):
+        # Cold start without a disk cache: the first request has to wait for
+        # discovery, concurrent requests share the same fetch.
+        if not self.endpoints:
+            await self.single_flight.do(('endpoint_discovery',), self.refresh_endpoints)
     
-    def _sort_endpoints_by_priority(self, operation: Optional[str] = None) -> List[Dict]:
-        endpoints = self.endpoints.copy()
+    def _rank_endpoints(self, operation: Optional[str] = None) -> List[Dict]:
+        """
+        Order endpoints by health score (lower is better). Endpoints whose
+        circuit is open are skipped; if every circuit is open they are all
+        tried anyway rather than failing without a single attempt.
+        """
+        last_success = self.success_history.get(operation, {}).get('name') if operation else None
         
-        if operation and operation in self.success_history:
-            last_success = self.success_history[operation]
-            for ep in endpoints:
-                if ep['name'] == last_success['name']:
-                    ep = ep.copy()
-                    ep['priority'] = 0
+        def sort_key(ep):
+            priority = 0 if ep['name'] == last_success else ep.get('priority', 999)
+            return (round(self.health.score(ep['name'], operation), 3), priority, ep['name'])
         
-        return sorted(endpoints, key=lambda x: (x.get('priority', 999), x['name']))
+        ranked = sorted(self.endpoints, key=sort_key)
+        available = [ep for ep in ranked if self.health.is_available(ep['name'], operation)]
+        skipped = [ep['name'] for ep in ranked if ep not in available]
+        
+        if skipped:
+            logger.debug(f"Skipping endpoints with open circuit for {operation}: {skipped}")
+        
+        self._last_routing[operation or 'unknown'] = {
+            'order': [ep['name'] for ep in (available or ranked)],
+            'skipped': skipped if available else [],
+            'scores': {ep['name']: round(self.health.score(ep['name'], operation), 4) for ep in ranked},
+            'winner': None,
+            'timestamp': time.time()
+        }
+        return available or ranked
     
     def _record_success(self, endpoint: Dict, operation: str):
         self.success_history[operation] = {
@@ -160,129 +269,315 @@ class TidalAPIClient:
             'url': endpoint['url'],
             'timestamp': time.time()
         }
+        if operation in self._last_routing:
+            self._last_routing[operation]['winner'] = endpoint['name']
+    
+    def get_endpoint_health(self) -> Dict:
+        return {
+            'endpoints': [
+                {
+                    'name': ep['name'],
+                    'url': ep['url'],
+                    'priority': ep.get('priority'),
+                    'provider': ep.get('provider'),
+                    'available': self.health.is_available(ep['name']),
+                }
+                for ep in self.endpoints
+            ],
+            'health': self.health.snapshot(),
+            'rate_limits': self.rate_limiter.stats(),
+            'routing': self._last_routing,
+        }
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # The session is bound to the loop it was created on, so a new loop
+        # (e.g. a sync shim or a test client) gets its own pooled session.
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=POOL_LIMIT,
+                limit_per_host=POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+            self._session_loop = loop
+        return self._session
+    
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+        self.entities.close()
+    
+    @staticmethod
+    def _is_empty_response(data, operation: Optional[str]) -> bool:
+        if not isinstance(data, dict):
+            return False
+        
+        if 'items' in data and 'limit' in data:
+            return not data.get('items')
+        
+        search_keys = {
+            "search_albums": 'albums',
+            "search_tracks": 'tracks',
+            "search_artists": 'artists',
+            "search_playlists": 'playlists',
+        }
+        key = search_keys.get(operation)
+        if key:
+            section = data.get(key, {})
+            if isinstance(section, dict) and not section.get('items'):
+                return True
+        
+        return False
     
-    def _make_request(self, path: str, params: Optional[Dict] = None, operation: Optional[str] = None) -> Optional[Dict]:
-        sorted_endpoints = self._sort_endpoints_by_priority(operation)
+    def _get_hedge_delay(self, endpoint: Dict) -> float:
+        if self.hedge_delay is not None:
+            return self.hedge_delay
         
-        logger.info(f"Starting request for {operation or path} with params: {params}")
-        logger.debug(f"Trying {len(sorted_endpoints)} endpoints in order: {[ep['name'] for ep in sorted_endpoints]}")
+        if self.health.latency_samples(endpoint['name']) < LATENCY_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        
+        return max(self.health.latency_p90(endpoint['name']), HEDGE_MIN_DELAY)
+    
+    async def _request_endpoint(self, session: aiohttp.ClientSession, endpoint: Dict, path: str, params: Optional[Dict], operation: Optional[str], label: str) -> Optional[Dict]:
+        url = f"{endpoint['url']}{path}"
+        name = endpoint['name']
+        health_op = operation or path
+        
+        if not await self.rate_limiter.acquire(name, RATE_LIMIT_MAX_WAIT):
+            logger.warning(f"{label} {name} is rate limited for more than {RATE_LIMIT_MAX_WAIT}s, trying next endpoint")
+            return None
         
-        for idx, endpoint in enumerate(sorted_endpoints, 1):
-            url = f"{endpoint['url']}{path}"
+        started = time.monotonic()
+        
+        def failed(kind: str, detail: str) -> None:
+            self.health.record_failure(name, health_op, kind, time.monotonic() - started, detail)
+            return None
+        
+        self.health.begin(name, health_op)
+        try:
+            logger.debug(f"{label} Attempting {name}: {url}")
+            async with session.get(url, params=params) as response:
+                if response.status == 429:
+                    retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                    logger.warning(f"{label} {name} returned 429 (rate limited, retry after {retry_after if retry_after is not None else 'unknown'}s), trying next endpoint")
+                    self.rate_limiter.record_rate_limited(name, retry_after)
+                    return failed("rate_limited", "HTTP 429")
+                
+                if response.status == 404:
+                    logger.warning(f"{label} {name} returned 404, trying next endpoint")
+                    return failed("not_found", "HTTP 404")
+                
+                if response.status != 200:
+                    logger.warning(f"{label} {name} returned status {response.status}, trying next endpoint")
+                    return failed("error", f"HTTP {response.status}")
+                
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:
+                    logger.warning(f"{label} {name} returned invalid JSON, trying next endpoint")
+                    return failed("error", "invalid JSON")
+            
+            if isinstance(data, dict) and 'data' in data and 'version' in data:
+                data = data['data']
             
-            try:
-                logger.debug(f"[{idx}/{len(sorted_endpoints)}] Attempting {endpoint['name']}: {url}")
-                response = self.session.get(url, params=params, timeout=10)
+            if self._is_empty_response(data, operation):
+                logger.warning(f"{label} {name} returned 200 OK but empty content for {operation}. Trying next...")
+                return failed("empty", "empty result")
+            
+            self.health.record_success(name, health_op, time.monotonic() - started)
+            self.rate_limiter.record_success(name)
+            return data
+        
+        except asyncio.CancelledError:
+            self.health.release(name, health_op)
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"{label} {name} timed out after {REQUEST_TIMEOUT}s")
+            return failed("timeout", f"timed out after {REQUEST_TIMEOUT}s")
+        except aiohttp.ClientConnectionError as e:
+            logger.warning(f"{label} {name} connection failed: {e}")
+            return failed("error", f"connection failed: {e}")
+        except aiohttp.ClientError as e:
+            logger.warning(f"{label} {name} request failed: {e}")
+            return failed("error", f"request failed: {e}")
+    
+    async def _make_request(self, path: str, params: Optional[Dict] = None, operation: Optional[str] = None) -> Optional[Dict]:
+        cached = await self.cache.get(operation, path, params)
+        if cached is not None:
+            logger.debug(f"Cache hit for {operation} with params: {params}")
+            return cached
+        
+        key = (operation or path, make_cache_key(path, params))
+        data = await self.single_flight.do(
+            key, lambda: self._fetch_and_harvest(path, params, operation)
+        )
+        if data is not None:
+            await self.cache.set(operation, path, params, data)
+        return data
+    
+    async def _fetch_and_harvest(self, path: str, params: Optional[Dict], operation: Optional[str]) -> Optional[Dict]:
+        data = await self._request_with_failover(path, params, operation)
+        if data is not None:
+            # A SQLite transaction per response; keep it off the event loop
+            await file_workers.run(self.entities.harvest, data)
+        return data
+    
+    def _next_endpoint_with_capacity(self, remaining: List) -> tuple:
+        """
+        Pop the best-ranked endpoint that has a rate-limit token available.
+        If none has capacity, take the one whose bucket frees up soonest.
+        """
+        for i, (_, endpoint) in enumerate(remaining):
+            if self.rate_limiter.wait_time(endpoint['name']) == 0:
+                return remaining.pop(i)
+        soonest = min(range(len(remaining)), key=lambda i: self.rate_limiter.wait_time(remaining[i][1]['name']))
+        return remaining.pop(soonest)
+    
+    async def _request_with_failover(self, path: str, params: Optional[Dict] = None, operation: Optional[str] = None) -> Optional[Dict]:
+        await self._ensure_endpoints()
+        sorted_endpoints = self._rank_endpoints(operation or path)
+        session = await self._get_session()
+        total = len(sorted_endpoints)
+        
+        logger.info(f"Starting request for {operation or path} with params: {params}")
+        logger.debug(f"Trying {total} endpoints in order: {[ep['name'] for ep in sorted_endpoints]}")
+        
+        # Endpoints are launched in priority order. Without hedging a new
+        # attempt only starts once the previous one failed; with hedging the
+        # next endpoint is also started when the hedge delay expires.
+        remaining = list(enumerate(sorted_endpoints, 1))
+        in_flight: Dict[asyncio.Task, Dict] = {}
+        
+        try:
+            while remaining or in_flight:
+                max_in_flight = HEDGE_MAX_IN_FLIGHT if self.hedge_requests else 1
+                if remaining and len(in_flight) < max_in_flight:
+                    idx, endpoint = self._next_endpoint_with_capacity(remaining)
+                    if in_flight:
+                        logger.info(f"Hedging {operation or path}: also trying {endpoint['name']}")
+                    task = asyncio.create_task(self._request_endpoint(
+                        session, endpoint, path, params, operation, f"[{idx}/{total}]"
+                    ))
+                    in_flight[task] = endpoint
                 
-                if response.status_code == 429:
-                    logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} returned 429 (rate limited), sleeping 2s")
-                    time.sleep(2)
-                    continue
+                timeout = None
+                if self.hedge_requests and remaining and len(in_flight) < max_in_flight:
+                    timeout = self._get_hedge_delay(in_flight[next(iter(in_flight))])
                 
-                if response.status_code in [500, 404]:
-                    logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} returned {response.status_code}, trying next endpoint")
-                    continue
+                done, _ = await asyncio.wait(in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
                 
-                if response.status_code == 200:
-                    try:
-                        data = response.json()
-                        
-
-                        if isinstance(data, dict) and 'data' in data and 'version' in data:
-                             data = data['data']
-                        
-                        if isinstance(data, dict):
-                            is_empty = False
-                            
-                            if 'items' in data and 'limit' in data:
-                                if not data.get('items'):
-                                    is_empty = True
-                            else:
-                                if operation == "search_albums":
-                                    albums_data = data.get('albums', {})
-                                    if isinstance(albums_data, dict) and not albums_data.get('items'):
-                                        is_empty = True
-                                elif operation == "search_tracks":
-                                    tracks_data = data.get('tracks', {})
-                                    if isinstance(tracks_data, dict) and not tracks_data.get('items'):
-                                        is_empty = True
-                                elif operation == "search_artists":
-                                    artists_data = data.get('artists', {})
-                                    if isinstance(artists_data, dict) and not artists_data.get('items'):
-                                        is_empty = True
-                                elif operation == "search_playlists":
-                                    playlists_data = data.get('playlists', {})
-                                    if isinstance(playlists_data, dict) and not playlists_data.get('items'):
-                                        is_empty = True
-
-                            
-                            if is_empty:
-                                logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} returned 200 OK but empty content for {operation}. Trying next...")
-                                continue
-                                
+                for task in done:
+                    endpoint = in_flight.pop(task)
+                    data = task.result()
+                    if data is not None:
                         logger.info(f"✓ Successfully got response from {endpoint['name']} ({endpoint['url']})")
                         self._record_success(endpoint, operation or path)
                         return data
-                    except ValueError:
-                        logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} returned invalid JSON, trying next endpoint")
-                        continue
-                else:
-                    logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} returned unexpected status {response.status_code}")
-            
-            except requests.exceptions.Timeout:
-                logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} timed out after 10s")
-                continue
-            except requests.exceptions.ConnectionError as e:
-                logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} connection failed: {e}")
-                continue
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"[{idx}/{len(sorted_endpoints)}] {endpoint['name']} request failed: {e}")
-                continue
-    
-        logger.error(f"✗ All {len(sorted_endpoints)} endpoints failed for {operation or path}")
+        finally:
+            for task in in_flight:
+                task.cancel()
+    
+        logger.error(f"✗ All {total} endpoints failed for {operation or path}")
         return None
     
-    def search_tracks(self, query: str) -> Optional[Dict]:
-        return self._make_request("/search/", {"s": query}, operation="search_tracks")
+    async def search_tracks(self, query: str) -> Optional[Dict]:
+        return await self._make_request("/search/", {"s": query}, operation="search_tracks")
     
-    def search_albums(self, query: str) -> Optional[Dict]:
-        return self._make_request("/search/", {"al": query}, operation="search_albums")
+    async def search_albums(self, query: str) -> Optional[Dict]:
+        return await self._make_request("/search/", {"al": query}, operation="search_albums")
     
-    def search_artists(self, query: str) -> Optional[Dict]:
-        return self._make_request("/search/", {"a": query}, operation="search_artists")
+    async def search_artists(self, query: str) -> Optional[Dict]:
+        return await self._make_request("/search/", {"a": query}, operation="search_artists")
 
-    def search_playlists(self, query: str) -> Optional[Dict]:
-        return self._make_request("/search/", {"p": query}, operation="search_playlists")
-    
-    def get_track(self, track_id: int, quality: str = "LOSSLESS") -> Optional[Dict]:
-        return self._make_request("/track/", {"id": track_id, "quality": quality}, operation="get_track")
-    
-    def get_track_metadata(self, track_id: int) -> Optional[Dict]:
-        result = self.search_tracks(str(track_id))
-        if result and result.get('items'):
-            for item in result.get('items', []):
-                if item.get('id') == track_id:
-                    return item
-            return result['items'][0] if result['items'] else None
-        return None
+    async def search_playlists(self, query: str) -> Optional[Dict]:
+        return await self._make_request("/search/", {"p": query}, operation="search_playlists")
+    
+    async def get_track(self, track_id: int, quality: str = "LOSSLESS") -> Optional[Dict]:
+        return await self._make_request("/track/", {"id": track_id, "quality": quality}, operation="get_track")
+    
+    async def get_tracks_bulk(self, track_ids: List[int], quality: str = "LOSSLESS", concurrency: int = BULK_CONCURRENCY) -> Dict[int, Dict]:
+        """
+        Resolve playback info for many tracks at once, at most `concurrency`
+        in flight. Returns {track_id: {'data': ..., 'error': ...}} so one bad
+        track never fails the batch.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def resolve(track_id: int):
+            async with semaphore:
+                try:
+                    data = await self.get_track(track_id, quality)
+                except Exception as e:
+                    logger.warning(f"Bulk resolve failed for track {track_id}: {e}")
+                    return track_id, {'data': None, 'error': str(e)}
+            if not data:
+                return track_id, {'data': None, 'error': "Track not found (Playback Info)"}
+            return track_id, {'data': data, 'error': None}
+        
+        unique_ids = list(dict.fromkeys(track_ids))
+        logger.info(f"Resolving {len(unique_ids)} tracks at {quality} (concurrency {concurrency})")
+        results = await asyncio.gather(*(resolve(track_id) for track_id in unique_ids))
+        return dict(results)
+    
+    async def get_track_metadata(self, track_id: int) -> Optional[Dict]:
+        """
+        Full track object, read from the entity store or found by searching for
+        its id. Callers want the release date, so a stored copy without one
+        (harvested from a partial response) is searched for again.
+        """
+        track = await file_workers.run(self.entities.get_track, track_id)
+        if track is not None and ('streamStartDate' in track or 'releaseDate' in (track.get('album') or {})):
+            return track
+        
+        result = await self.search_tracks(str(track_id))
+        track = await file_workers.run(self.entities.get_track, track_id)
+        if track is not None:
+            return track
+        items = (result.get('tracks') or result).get('items') if isinstance(result, dict) else None
+        return items[0] if items else None
     
-    def get_album(self, album_id: int) -> Optional[Dict]:
-        return self._make_request("/album/", {"id": album_id}, operation="get_album")
+    async def get_album_metadata(self, album_id: int) -> Optional[Dict]:
+        """Album object without its track listing, fetched only if not stored yet"""
+        album = await file_workers.run(self.entities.get_album, album_id)
+        if album is None or 'releaseDate' not in album:
+            await self.get_album(album_id)
+            album = await file_workers.run(self.entities.get_album, album_id)
+        return album
     
-    def get_album_tracks(self, album_id: int) -> Optional[Dict]:
-        return self._make_request("/album/", {"id": album_id}, operation="get_album_tracks")
+    async def get_artist_metadata(self, artist_id: int) -> Optional[Dict]:
+        artist = await file_workers.run(self.entities.get_artist, artist_id)
+        if artist is None:
+            await self.get_artist(artist_id)
+            artist = await file_workers.run(self.entities.get_artist, artist_id)
+        return artist
     
-    def get_artist(self, artist_id: int) -> Optional[Dict]:
-        return self._make_request("/artist/", {"f": artist_id}, operation="get_artist")
+    async def get_album(self, album_id: int) -> Optional[Dict]:
+        return await self._make_request("/album/", {"id": album_id}, operation="get_album")
+    
+    async def get_album_tracks(self, album_id: int) -> Optional[Dict]:
+        return await self._make_request("/album/", {"id": album_id}, operation="get_album_tracks")
+    
+    async def get_artist(self, artist_id: int) -> Optional[Dict]:
+        return await self._make_request("/artist/", {"f": artist_id}, operation="get_artist")
 
-    def get_playlist(self, playlist_id: str) -> Optional[Dict]:
-        return self._make_request("/playlist/", {"id": playlist_id}, operation="get_playlist")
+    async def get_playlist(self, playlist_id: str) -> Optional[Dict]:
+        return await self._make_request("/playlist/", {"id": playlist_id}, operation="get_playlist")
 
-    def get_playlist_tracks(self, playlist_id: str) -> Optional[Dict]:
-        return self._make_request("/playlist/", {"id": playlist_id}, operation="get_playlist_tracks")
+    async def get_playlist_tracks(self, playlist_id: str) -> Optional[Dict]:
+        return await self._make_request("/playlist/", {"id": playlist_id}, operation="get_playlist_tracks")
 
-    def get_artist_albums(self, artist_id: int) -> Optional[Dict]:
-        return self._make_request(f"/artist/{artist_id}/albums", operation="get_artist_albums")
+    async def get_artist_albums(self, artist_id: int) -> Optional[Dict]:
+        return await self._make_request(f"/artist/{artist_id}/albums", operation="get_artist_albums")
     
     def get_download_status(self, track_id: int) -> Optional[Dict]:
         if track_id in self.download_status_cache:
@@ -308,4 +603,32 @@ class TidalAPIClient:
             if current_time - data['timestamp'] > 300
         ]
         for track_id in expired_keys:
-            del self.download_status_cache[track_id]
\ No newline at end of file
+            del self.download_status_cache[track_id]
+
+
+class SyncTidalAPIClient:
+    """
+    Blocking facade over TidalAPIClient for scripts and one-off tooling.
+    
+    Every coroutine method of the async client is exposed as a plain method
+    that runs to completion on a private event loop. Do not use this from
+    inside the API process; await the async client instead.
+    """
+    
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self._client = TidalAPIClient(cache_dir)
+        self._loop = asyncio.new_event_loop()
+    
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if asyncio.iscoroutinefunction(attr):
+            def run_blocking(*args, **kwargs):
+                return self._loop.run_until_complete(attr(*args, **kwargs))
+            return run_blocking
+        return attr
+    
+    def close(self):
+        if self._loop.is_closed():
+            return
+        self._loop.run_until_complete(self._client.close())
+        self._loop.close()
@@ -0,0 +1,155 @@
+"""
+Bounded pool for FFmpeg jobs, run at low CPU and I/O priority.
+
+MP3/Opus transcodes, DASH remuxes and lyrics embedding each start an
+FFmpeg child. Unbounded, a burst of them after a playlist sync takes every
+core away from the API process. Jobs instead wait for one of
+TRANSCODE_WORKERS slots (one per core by default), and every child runs
+under `nice` (TRANSCODE_NICE) and, where available, `ionice` in the lowest
+best-effort class, so the API stays responsive while encoding soaks up
+whatever CPU is left. On Windows the child gets the below-normal priority
+class instead.
+
+    returncode, stderr = await transcode_workers.run(command, "opus", source, target)
+
+`stats()` reports queue depth, wait and encode times per kind of job, and
+the most recent jobs.
+"""
+
+import os
+import time
+import shutil
+import asyncio
+import platform
+import subprocess
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from pipeline import Stage
+
+
+TRANSCODE_WORKERS = max(1, int(os.getenv("TRANSCODE_WORKERS", str(os.cpu_count() or 2))))
+TRANSCODE_NICE = int(os.getenv("TRANSCODE_NICE", "10"))
+TRANSCODE_IONICE = os.getenv("TRANSCODE_IONICE", "true").lower() == "true"
+RECENT_JOBS = 50
+
+
+def low_priority(command: List[str]) -> List[str]:
+    """
+    `command` prefixed with nice/ionice where they exist. The program is
+    resolved first, so a missing FFmpeg still raises FileNotFoundError
+    rather than failing inside the wrapper.
+    """
+    if platform.system() == "Windows":
+        return command
+    program = shutil.which(command[0])
+    if program is None:
+        raise FileNotFoundError(f"{command[0]} not found")
+    prefix = []
+    if TRANSCODE_NICE > 0 and shutil.which("nice"):
+        prefix += ["nice", "-n", str(TRANSCODE_NICE)]
+    if TRANSCODE_IONICE and shutil.which("ionice"):
+        prefix += ["ionice", "-c", "2", "-n", "7"]
+    return [*prefix, program, *command[1:]]
+
+
+def _size(path: Optional[Path]) -> Optional[int]:
+    try:
+        return path.stat().st_size if path else None
+    except OSError:
+        return None
+
+
+class TranscodePool:
+
+    def __init__(self, workers: int = TRANSCODE_WORKERS):
+        self.stage = Stage("ffmpeg", workers)
+        self.max_queued = 0
+        self.recent: Deque[Dict] = deque(maxlen=RECENT_JOBS)
+        self.kinds: Dict[str, Dict] = {}
+
+    async def run(
+        self,
+        command: List[str],
+        kind: str,
+        source: Optional[Path] = None,
+        target: Optional[Path] = None
+    ) -> Tuple[int, str]:
+        """
+        Run an FFmpeg `command` once a slot is free; returns its exit code and
+        stderr. Raises FileNotFoundError if FFmpeg isn't installed.
+        """
+        queued_at = time.perf_counter()
+        if self.stage.running >= self.stage.concurrency:
+            self.max_queued = max(self.max_queued, self.stage.queued + 1)
+        granted = await self.stage.acquire()
+        returncode = None
+        try:
+            returncode, stderr = await self._spawn(command)
+            return returncode, stderr
+        finally:
+            self.stage.release(granted, failed=returncode != 0)
+            self._record(kind, source, target, granted - queued_at, time.perf_counter() - granted, returncode)
+
+    async def _spawn(self, command: List[str]) -> Tuple[int, str]:
+        if platform.system() == "Windows":
+            # The selector event loop has no async pipes; block a thread instead
+            result = await asyncio.to_thread(
+                subprocess.run,
+                command,
+                capture_output=True,
+                creationflags=subprocess.BELOW_NORMAL_PRIORITY_CLASS
+            )
+            return result.returncode, result.stderr.decode(errors='ignore')
+
+        process = await asyncio.create_subprocess_exec(
+            *low_priority(command),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        return process.returncode, stderr.decode(errors='ignore')
+
+    def _record(self, kind: str, source, target, wait: float, encode: float, returncode: Optional[int]):
+        totals = self.kinds.setdefault(kind, {'jobs': 0, 'failed': 0, 'wait_seconds': 0.0, 'encode_seconds': 0.0})
+        totals['jobs'] += 1
+        totals['failed'] += returncode != 0
+        totals['wait_seconds'] += wait
+        totals['encode_seconds'] += encode
+        self.recent.append({
+            'kind': kind,
+            'file': source.name if source else None,
+            'returncode': returncode,
+            'wait_seconds': round(wait, 3),
+            'encode_seconds': round(encode, 3),
+            'input_bytes': _size(source),
+            'output_bytes': _size(target),
+        })
+
+    def stats(self) -> Dict:
+        return {
+            **self.stage.stats(),
+            'max_queued': self.max_queued,
+            'nice': TRANSCODE_NICE,
+            'ionice': TRANSCODE_IONICE,
+            'kinds': {
+                kind: {
+                    'jobs': totals['jobs'],
+                    'failed': totals['failed'],
+                    'avg_wait_seconds': round(totals['wait_seconds'] / totals['jobs'], 3),
+                    'avg_encode_seconds': round(totals['encode_seconds'] / totals['jobs'], 3),
+                }
+                for kind, totals in sorted(self.kinds.items())
+            },
+            'recent': list(self.recent),
+        }
+
+
+transcode_workers = TranscodePool()